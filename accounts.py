@@ -0,0 +1,110 @@
+"""
+User registration and bulk provisioning.
+
+bcrypt hashing is deliberately slow, so it runs on a small pool of
+``PASSWORD_HASH_WORKERS`` threads: a registration wave then uses at most
+that many cores and leaves the rest to bookings. Users are inserted once,
+and the unique constraints on username and email reject duplicates, which
+also settles concurrent registrations of the same name.
+
+``provision`` creates many users for an admin in batches of
+``BULK_USERS_BATCH_SIZE``, one ``INSERT OR IGNORE ... RETURNING`` and one
+commit per batch. Later batches are hashed while earlier ones are written.
+Users may come with a bcrypt ``password_hash`` (e.g. exported from a
+directory), which skips hashing entirely.
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from models import db, User
+
+BCRYPT_HASH = re.compile(r'^\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}$')
+
+_hashers = ThreadPoolExecutor(max_workers=config.PASSWORD_HASH_WORKERS, thread_name_prefix='bcrypt')
+
+def hash_password(password):
+    """Hash a password on the hashing pool and wait for it"""
+    return _hashers.submit(User.hash_password, password).result()
+
+def duplicate_message(error):
+    """Message for an IntegrityError raised by a taken username or email, else None"""
+    detail = str(error.orig)
+    if 'user.username' in detail:
+        return 'Username already exists'
+    if 'user.email' in detail:
+        return 'Email already exists'
+    return None
+
+def parse_users(items, max_users):
+    """Validate the users of a bulk request; returns user dicts or raises ValueError"""
+    if not isinstance(items, list) or not items:
+        raise ValueError('users must be a non-empty list')
+    if len(items) > max_users:
+        raise ValueError(f'At most {max_users} users per request')
+    users = []
+    usernames = set()
+    emails = set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('username') or not item.get('email'):
+            raise ValueError(f'User {index} needs a username and an email')
+        username = str(item['username'])
+        email = str(item['email'])
+        if len(username) > 80 or len(email) > 120:
+            raise ValueError(f'Username or email too long for user {index}')
+        if username in usernames:
+            raise ValueError(f'Duplicate username in request: {username}')
+        if email in emails:
+            raise ValueError(f'Duplicate email in request: {email}')
+        usernames.add(username)
+        emails.add(email)
+
+        password = item.get('password')
+        password_hash = item.get('password_hash')
+        if bool(password) == bool(password_hash):
+            raise ValueError(f'User {username} needs exactly one of password or password_hash')
+        if password_hash and not BCRYPT_HASH.match(str(password_hash)):
+            raise ValueError(f'password_hash of user {username} is not a bcrypt hash')
+        users.append({'username': username, 'email': email, 'is_admin': bool(item.get('is_admin', False)),
+                      'password': str(password) if password else None, 'password_hash': password_hash})
+    return users
+
+def _skip_reasons(rows):
+    """(username, message) for rows the unique constraints rejected"""
+    taken = set(db.session.execute(
+        db.select(User.username).where(User.username.in_([row['username'] for row in rows]))
+    ).scalars())
+    return [(row['username'], 'Username already exists' if row['username'] in taken
+             else 'Email already exists') for row in rows]
+
+def provision(users, batch_size, workers=config.PASSWORD_HASH_WORKERS):
+    """Insert parsed users in batches; returns (created [(id, username, email)], skipped [(username, message)])"""
+    created = []
+    skipped = []
+    # A pool of its own, so a large import does not queue ahead of single registrations
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt-bulk') as pool:
+        hashes = [pool.submit(User.hash_password, user['password']) if user['password'] else None
+                  for user in users]
+        try:
+            for start in range(0, len(users), batch_size):
+                rows = [{'username': user['username'], 'email': user['email'], 'is_admin': user['is_admin'],
+                         'password_hash': user['password_hash'] or hashes[start + offset].result()}
+                        for offset, user in enumerate(users[start:start + batch_size])]
+                inserted = db.session.execute(
+                    db.insert(User.__table__).prefix_with('OR IGNORE')
+                    .returning(User.id, User.username, User.email),
+                    rows
+                ).all()
+                if len(inserted) < len(rows):
+                    usernames = {row.username for row in inserted}
+                    skipped.extend(_skip_reasons([row for row in rows if row['username'] not in usernames]))
+                db.session.commit()
+                created.extend(tuple(row) for row in inserted)
+        except Exception:
+            db.session.rollback()
+            for future in hashes:
+                if future is not None:
+                    future.cancel()
+            raise
+    return created, skipped
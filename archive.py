@@ -0,0 +1,122 @@
+"""
+Archival of past events.
+
+Events more than ``ARCHIVE_AFTER_DAYS`` past their date are moved, with
+their bookings, from the live tables into ``ArchivedEvent`` and
+``ArchivedBooking`` on the ``archive`` bind (a separate SQLite file by
+default), so listings, booking scans and the ledger only carry events that
+can still change. Their tickets, price tiers, ledger history and
+purchase-limit counters are dropped; the archived rows keep the final
+availability and amounts.
+
+Each batch is deleted from the live tables with ``RETURNING``, written to
+the archive and committed there, and only then committed on the live
+database. The archive write is an upsert, so a run interrupted between the
+two commits just moves the same batch again.
+
+The archive tables are created (if missing) on every new connection to the
+archive database, so a fresh or replaced archive file never breaks the
+routes that read it.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from models import (db, Event, Booking, Ticket, PriceTier, LedgerEntry, EventSnapshot, UserEventQuota,
+                    ArchivedEvent, ArchivedBooking, ARCHIVE_BIND)
+
+def create_tables_on_connect(engine):
+    """Run CREATE TABLE / INDEX IF NOT EXISTS for the archive tables on each new connection of engine"""
+    statements = []
+    for table in (ArchivedEvent.__table__, ArchivedBooking.__table__):
+        statements.append(CreateTable(table, if_not_exists=True))
+        statements.extend(CreateIndex(index, if_not_exists=True) for index in table.indexes)
+    ddl = [str(statement.compile(dialect=engine.dialect)) for statement in statements]
+
+    @event.listens_for(engine, 'connect')
+    def create_tables(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in ddl:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+def _held_event_ids():
+    """Events holding the highest event, booking or ticket id.
+
+    New rows take max(id) + 1 (from SQLite and from sharding.next_id), so
+    removing the newest row would hand its id, and with it old ticket codes,
+    to a new row. These events wait until something newer exists.
+    """
+    held = set()
+    for model, column in ((Event, Event.id), (Booking, Booking.event_id), (Ticket, Ticket.event_id)):
+        event_id = db.session.execute(
+            db.select(column).order_by(model.id.desc()).limit(1)
+        ).scalar()
+        if event_id is not None:
+            held.add(event_id)
+    return held
+
+def _move(model, condition):
+    """Delete the matching rows of model and return them as dicts"""
+    return [dict(row._mapping) for row in db.session.execute(
+        db.delete(model).where(condition).returning(*model.__table__.columns)
+    )]
+
+def _archived(rows, model, archived_at):
+    """Rows shaped for model's archive table (live-only columns such as Event.version are dropped)"""
+    columns = [key for key in model.__table__.columns.keys() if key != 'archived_at']
+    return [dict({key: row[key] for key in columns}, archived_at=archived_at) for row in rows]
+
+def archive_batch(cutoff, batch_size):
+    """Move up to batch_size events dated before cutoff; returns (event_ids, booking_count)"""
+    held = _held_event_ids()
+    event_ids = db.session.execute(
+        db.select(Event.id)
+        .where(Event.event_date < cutoff, Event.id.not_in(held))
+        .order_by(Event.id).limit(batch_size)
+    ).scalars().all()
+    if not event_ids:
+        return [], 0
+
+    try:
+        for model in (Ticket, PriceTier, LedgerEntry, EventSnapshot, UserEventQuota):
+            db.session.execute(db.delete(model).where(model.event_id.in_(event_ids)))
+        bookings = _move(Booking, Booking.event_id.in_(event_ids))
+        events = _move(Event, Event.id.in_(event_ids))
+
+        archived_at = datetime.now(timezone.utc)
+        with db.engines[ARCHIVE_BIND].begin() as connection:
+            connection.execute(db.insert(ArchivedEvent).prefix_with('OR REPLACE'),
+                               _archived(events, ArchivedEvent, archived_at))
+            if bookings:
+                connection.execute(db.insert(ArchivedBooking).prefix_with('OR REPLACE'),
+                                   _archived(bookings, ArchivedBooking, archived_at))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return event_ids, len(bookings)
+
+def archive_past_events(after_days, batch_size, now=None):
+    """Archive every event more than after_days past its date; returns (event_ids, booking_count)"""
+    cutoff = (now or datetime.now()) - timedelta(days=after_days)
+    archived_ids = []
+    archived_bookings = 0
+    while True:
+        event_ids, booking_count = archive_batch(cutoff, batch_size)
+        if not event_ids:
+            return archived_ids, archived_bookings
+        archived_ids.extend(event_ids)
+        archived_bookings += booking_count
+
+def totals_query():
+    """(events, confirmed bookings, revenue in cents) of the archive, for the stats routes"""
+    return db.select(
+        db.select(db.func.count(ArchivedEvent.id)).scalar_subquery(),
+        db.func.count(ArchivedBooking.id),
+        db.func.coalesce(db.func.sum(ArchivedBooking.total_cents), 0)
+    ).where(ArchivedBooking.status == 'confirmed')
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Asyncio variant of the Ticket Reservation Server for read-heavy traffic.
+
+Serves the read routes of server.py (event listing, search and detail, the
+caller's bookings and tickets, stats) plus login from a single event loop,
+so slow clients cost a coroutine instead of a pinned worker thread. Queries run on
+SQLAlchemy's asyncio engine over aiosqlite against the same database, and
+the statements, encoders, cache keys, rate-limit budgets and token checks
+are shared with the Flask app. Bookings and other writes stay on server.py,
+which owns the reservation, ledger and outbox transactions; login only
+stores the refresh token it hands out, and refreshing goes to server.py.
+
+Requires the optional ``aiohttp``, ``aiosqlite`` and ``greenlet`` packages.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from functools import wraps
+
+from aiohttp import web
+from sqlalchemy import select, insert, func, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.http import parse_accept_header
+
+import config
+import tickets
+import search
+import archive
+import logs
+import refresh_tokens
+from auth import (bearer_token, issue_token, decode_token, token_user, revocations_query,
+                  TokenRevocations)
+from cache import create_cache
+from compression import COMPRESSIBLE_MIMETYPES, compress_body
+from https_server import create_ssl_context
+from models import User, Event, Booking, Ticket, RefreshToken
+from money import from_cents
+from rate_limit import TokenBucketLimiter, retry_after_header
+from schema import SCHEMA_VERSION
+from serialization import (encode_events, encode_event, encode_bookings, encode_search_results,
+                           events_query, bookings_query, user_from_row, dumps, USER_FIELDS)
+
+DEFAULT_DATABASE_URI = 'sqlite:///ticket_system.db'
+
+def async_database_url(uri):
+    """aiosqlite URL for a server.py database URI.
+
+    Relative SQLite paths are resolved against the instance folder, as
+    Flask-SQLAlchemy does for the Flask app.
+    """
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite':
+        return url
+    database = url.database
+    if database and database != ':memory:' and not os.path.isabs(database):
+        database = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', database)
+    return url.set(drivername='sqlite+aiosqlite', database=database)
+
+engine = create_async_engine(
+    async_database_url(os.environ.get('TICKET_DATABASE_URI', DEFAULT_DATABASE_URI)),
+    pool_size=config.SERVER_THREADS
+)
+
+# Archived events and bookings, counted into the stats
+archive_engine = create_async_engine(
+    async_database_url(os.environ.get('TICKET_ARCHIVE_DATABASE_URI', config.ARCHIVE_DATABASE_URI))
+)
+archive.create_tables_on_connect(archive_engine.sync_engine)
+
+# Same key layout as server.py, so a redis:// cache is shared with (and invalidated by) it
+cache = create_cache(os.environ.get('TICKET_CACHE_URL', config.CACHE_URL), config.CACHE_TTL_SECONDS,
+                     config.CACHE_INVALIDATION_CHANNEL,
+                     prefix=f"ticket:{int(os.environ.get('TICKET_SHARD_INDEX', 0))}:")
+
+rate_limiter = TokenBucketLimiter(config.RATE_LIMIT_MAX_BUCKETS)
+
+# Token epochs of users who revoked their sessions, reloaded from the database
+revocations = TokenRevocations(config.REVOCATION_REFRESH_SECONDS)
+
+def json_response(body, status=200):
+    """Build a JSON response from a payload or already-encoded bytes"""
+    if not isinstance(body, (bytes, bytearray)):
+        body = dumps(body)
+    return web.Response(body=body, status=status, content_type='application/json')
+
+async def execute(statement):
+    """Run a read-only statement and return all rows"""
+    async with engine.connect() as connection:
+        return (await connection.execute(statement)).all()
+
+async def cache_call(method, *args):
+    """Call a cache method, in a worker thread when the backend does network I/O"""
+    if cache.blocking:
+        # A redis:// round-trip would otherwise stall every request on the event loop
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+async def cached(key, build):
+    """Return the cached value for key, storing await build() on a miss"""
+    value, generation = await cache_call(cache.lookup, key)
+    if value is None:
+        value = await build()
+        await cache_call(cache.store, key, value, generation)
+    return value
+
+def rate_limited(budget):
+    """Limit a handler using the RATE_LIMITS budget of that name (per IP and user)"""
+    def decorator(f):
+        @wraps(f)
+        async def decorated(request, *args):
+            if config.RATE_LIMIT_ENABLED:
+                per_minute, burst = config.RATE_LIMITS.get(budget, config.RATE_LIMITS['default'])
+                keys = [(budget, 'ip', request.remote)]
+                if args:
+                    keys.append((budget, 'user', args[0].id))
+                for key in keys:
+                    wait = rate_limiter.consume(key, per_minute / 60.0, burst)
+                    if wait:
+                        return web.json_response({'message': 'Too many requests'}, status=429,
+                                                 headers={'Retry-After': retry_after_header(wait)})
+            return await f(request, *args)
+        return decorated
+    return decorator
+
+def token_required(f):
+    @wraps(f)
+    async def decorated(request):
+        token = bearer_token(request.headers.get('Authorization'))
+        if not token:
+            return web.json_response({'message': 'Token is missing'}, status=401)
+        try:
+            claims = decode_token(token, config.SECRET_KEY)
+            if revocations.stale():
+                revocations.load(await execute(revocations_query()))
+        except Exception:
+            return web.json_response({'message': 'Token is invalid'}, status=401)
+        if not revocations.accepts(claims):
+            return web.json_response({'message': 'Token has been revoked'}, status=401)
+        request['user_id'] = claims['user_id']
+        return await f(request, token_user(claims))
+    return decorated
+
+@web.middleware
+async def access_log(request, handler):
+    """Log every request to the access log (see logs.py)"""
+    started = time.perf_counter()
+    response = await handler(request)
+    logs.access(request.method, request.path, response.status, time.perf_counter() - started,
+                request.remote, request.get('user_id'), response.content_length,
+                config.ACCESS_LOG_SAMPLE_RATE)
+    return response
+
+@web.middleware
+async def http_tuning(request, handler):
+    """Compress large responses and advertise the keep-alive window"""
+    response = await handler(request)
+    if (isinstance(response, web.Response) and response.body is not None
+            and response.status not in (204, 304) and 'Content-Encoding' not in response.headers
+            and response.content_type in COMPRESSIBLE_MIMETYPES):
+        response.headers.add('Vary', 'Accept-Encoding')
+        data, encoding = compress_body(
+            bytes(response.body), parse_accept_header(request.headers.get('Accept-Encoding')),
+            config.COMPRESSION_MIN_SIZE, config.COMPRESSION_LEVEL)
+        if encoding is not None:
+            response.body = data
+            response.headers['Content-Encoding'] = encoding
+    response.headers['Keep-Alive'] = f'timeout={config.KEEP_ALIVE_TIMEOUT}'
+    return response
+
+routes = web.RouteTableDef()
+
+@routes.post('/api/login')
+@rate_limited('login')
+async def login(request):
+    """Login user and return JWT token"""
+    try:
+        data = await request.json()
+        if not isinstance(data, dict) or not data.get('username') or not data.get('password'):
+            return web.json_response({'message': 'Username and password required'}, status=400)
+
+        rows = await execute(select(User.password_hash, User.token_epoch,
+                                    *(getattr(User, name) for name in USER_FIELDS))
+                             .where(User.username == data['username']))
+        user = (User(password_hash=rows[0][0], token_epoch=rows[0][1], **dict(zip(USER_FIELDS, rows[0][2:])))
+                if rows else None)
+        # bcrypt is deliberately slow; keep it off the event loop
+        if not user or not await asyncio.to_thread(user.check_password, data['password']):
+            logs.audit('login.failure', username=data['username'], ip=request.remote)
+            return web.json_response({'message': 'Invalid credentials'}, status=401)
+
+        refresh_token, values = refresh_tokens.new_token(user.id, config.REFRESH_TOKEN_DAYS)
+        async with engine.begin() as connection:
+            await connection.execute(insert(RefreshToken).values(**values))
+        logs.audit('login.success', user_id=user.id, ip=request.remote)
+        return json_response({
+            'message': 'Login successful',
+            'token': issue_token(user, config.SECRET_KEY),
+            'refresh_token': refresh_token,
+            'expires_in': config.ACCESS_TOKEN_MINUTES * 60,
+            'user': user_from_row(rows[0][2:])
+        })
+    except Exception as e:
+        return web.json_response({'message': f'Login failed: {str(e)}'}, status=500)
+
+@routes.get('/api/events')
+@rate_limited('events')
+async def get_events(request):
+    """Get all events"""
+    try:
+        async def load():
+            return encode_events(await execute(events_query()))
+        return json_response(await cached('events:list', load))
+    except Exception as e:
+        return web.json_response({'message': f'Failed to fetch events: {str(e)}'}, status=500)
+
+@routes.get('/api/events/search')
+@rate_limited('events')
+async def search_events(request):
+    """Ranked, paginated full-text search over event name, description and venue"""
+    try:
+        try:
+            query, page, per_page = search.parse_search_args(request.query)
+        except ValueError as e:
+            return web.json_response({'message': str(e)}, status=400)
+        rows, count = search.search_statements(query, page, per_page)
+        async with engine.connect() as connection:
+            total, truncated = search.totals((await connection.execute(count)).scalar())
+            rows = (await connection.execute(rows)).all()
+        return json_response(encode_search_results(rows, total, truncated, page, per_page))
+    except Exception as e:
+        return web.json_response({'message': f'Failed to search events: {str(e)}'}, status=500)
+
+@routes.get(r'/api/events/{event_id:\d+}')
+@rate_limited('events')
+async def get_event(request):
+    """Get specific event"""
+    try:
+        event_id = int(request.match_info['event_id'])
+        body, generation = await cache_call(cache.lookup, f'event:{event_id}')
+        if body is None:
+            rows = await execute(events_query().where(Event.id == event_id))
+            if not rows:
+                return web.json_response({'message': 'Event not found'}, status=404)
+            body = encode_event(rows[0])
+            await cache_call(cache.store, f'event:{event_id}', body, generation)
+        return json_response(body)
+    except Exception as e:
+        return web.json_response({'message': f'Failed to fetch event: {str(e)}'}, status=500)
+
+@routes.get('/api/bookings')
+@token_required
+@rate_limited('bookings')
+async def get_user_bookings(request, current_user):
+    """Get user's bookings"""
+    try:
+        rows = await execute(bookings_query().where(Booking.user_id == current_user.id))
+        return json_response(encode_bookings(rows))
+    except Exception as e:
+        return web.json_response({'message': f'Failed to fetch bookings: {str(e)}'}, status=500)
+
+@routes.get(r'/api/bookings/{booking_id:\d+}/tickets')
+@token_required
+@rate_limited('bookings')
+async def get_booking_tickets(request, current_user):
+    """Signed ticket codes of one of the caller's bookings"""
+    try:
+        booking_id = int(request.match_info['booking_id'])
+        booking = await execute(select(Booking.user_id, Booking.event_id).where(Booking.id == booking_id))
+        if not booking:
+            return web.json_response({'message': 'Booking not found'}, status=404)
+        user_id, event_id = booking[0]
+        if user_id != current_user.id and not current_user.is_admin:
+            return web.json_response({'message': 'Access denied'}, status=403)
+
+        rows = await execute(select(Ticket.id, Ticket.status, Ticket.used_at)
+                             .where(Ticket.booking_id == booking_id).order_by(Ticket.id))
+        return json_response([{
+            'code': tickets.ticket_code(config.SECRET_KEY, event_id, row.id),
+            'status': row.status,
+            'used_at': row.used_at.isoformat() if row.used_at else None
+        } for row in rows])
+    except Exception as e:
+        return web.json_response({'message': f'Failed to fetch tickets: {str(e)}'}, status=500)
+
+@routes.get('/api/stats')
+@token_required
+@rate_limited('default')
+async def get_stats(request, current_user):
+    """Get system statistics (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return web.json_response({'message': 'Admin access required'}, status=403)
+
+        async def load():
+            async with engine.connect() as connection:
+                total_users = (await connection.execute(select(func.count(User.id)))).scalar()
+                total_events = (await connection.execute(select(func.count(Event.id)))).scalar()
+                total_bookings, total_revenue = (await connection.execute(
+                    select(func.count(Booking.id), func.sum(Booking.total_cents))
+                    .where(Booking.status == 'confirmed')
+                )).one()
+            async with archive_engine.connect() as connection:
+                archived_events, archived_bookings, archived_revenue = (
+                    await connection.execute(archive.totals_query())
+                ).one()
+            revenue_cents = (total_revenue or 0) + archived_revenue
+            return dumps({
+                'total_users': total_users,
+                'total_events': total_events + archived_events,
+                'total_bookings': total_bookings + archived_bookings,
+                'total_revenue': from_cents(revenue_cents),
+                'total_revenue_cents': revenue_cents
+            })
+        return json_response(await cached('stats', load))
+    except Exception as e:
+        return web.json_response({'message': f'Failed to fetch stats: {str(e)}'}, status=500)
+
+async def check_schema(app):
+    """Refuse to start on a database server.py has not initialized"""
+    async with engine.connect() as connection:
+        version = (await connection.execute(text('PRAGMA user_version'))).scalar()
+    if version < SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema is at version {version}, expected {SCHEMA_VERSION}; "
+                           "run 'python server.py --init-db' first")
+
+async def dispose_engine(app):
+    await engine.dispose()
+    await archive_engine.dispose()
+
+def create_app():
+    # access_log runs outside http_tuning so it sees the compressed size
+    app = web.Application(middlewares=[access_log, http_tuning])
+    app.add_routes(routes)
+    app.on_startup.append(check_schema)
+    app.on_cleanup.append(dispose_engine)
+    return app
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ticket Reservation Server (asyncio, read routes)')
+    parser.add_argument('--host', default=config.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=config.ASYNC_SERVER_PORT)
+    args = parser.parse_args(argv)
+
+    logs.configure(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', config.LOG_DIR),
+                   'async-')
+    print(f"Async server available at: https://localhost:{args.port}")
+    web.run_app(create_app(), host=args.host, port=args.port, ssl_context=create_ssl_context(),
+                keepalive_timeout=config.KEEP_ALIVE_TIMEOUT, print=None)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+JWT helpers shared by the Flask server and the asyncio server.
+
+Access tokens live for ``ACCESS_TOKEN_MINUTES`` and carry the user fields
+the routes need, so checking one is a signature check and no query.
+Each token also carries the user's ``token_epoch`` at issue time.
+Revoking a user's sessions (logout everywhere, a password change, a reused
+refresh token) bumps the epoch, and ``TokenRevocations`` refuses tokens
+issued before it.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+
+import jwt
+
+import config
+from models import db, User
+
+def bearer_token(authorization):
+    """Token from an 'Authorization: Bearer <token>' header value, or None"""
+    parts = (authorization or '').split(' ')
+    return parts[1] if len(parts) > 1 and parts[1] else None
+
+def issue_token(user, secret_key):
+    """Signed short-lived access token for a user"""
+    return jwt.encode({
+        'user_id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'is_admin': bool(user.is_admin),
+        'created_at': user.created_at.isoformat() if user.created_at else None,
+        'epoch': user.token_epoch or 0,
+        'exp': datetime.now(timezone.utc) + timedelta(minutes=config.ACCESS_TOKEN_MINUTES)
+    }, secret_key, algorithm='HS256')
+
+def decode_token(token, secret_key):
+    """Claims of a valid token; raises jwt.InvalidTokenError otherwise"""
+    return jwt.decode(token, secret_key, algorithms=['HS256'], options={'require': ['exp', 'epoch']})
+
+def token_user(claims):
+    """Detached User built from the claims of a verified token"""
+    created_at = claims.get('created_at')
+    return User(id=claims['user_id'], username=claims['username'], email=claims['email'],
+                is_admin=claims['is_admin'],
+                created_at=datetime.fromisoformat(created_at) if created_at else None)
+
+def revocations_query():
+    """(user_id, epoch) of every user whose sessions were ever revoked"""
+    return db.select(User.id, User.token_epoch).where(User.token_epoch > 0)
+
+class TokenRevocations:
+    """Per-user token epochs held in memory.
+
+    Only users that have revoked their sessions at least once are held.
+    Each process reloads them every refresh_seconds (see ``stale``) to pick
+    up revocations made by other processes.
+    """
+
+    def __init__(self, refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        self._epochs = {}
+        self._loaded_at = None
+        self._lock = Lock()
+
+    def stale(self):
+        """Whether the caller should load() the rows of revocations_query()"""
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at >= self.refresh_seconds
+
+    def load(self, rows):
+        """Merge (user_id, epoch) rows; an epoch never goes back"""
+        with self._lock:
+            for user_id, epoch in rows:
+                if epoch > self._epochs.get(user_id, 0):
+                    self._epochs[user_id] = epoch
+            self._loaded_at = time.monotonic()
+
+    def revoke(self, user_id, epoch):
+        """Refuse the user's tokens issued before epoch"""
+        with self._lock:
+            if epoch > self._epochs.get(user_id, 0):
+                self._epochs[user_id] = epoch
+
+    def accepts(self, claims):
+        return claims['epoch'] >= self._epochs.get(claims['user_id'], 0)
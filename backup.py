@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Online backups of the SQLite databases.
+
+A backup copies every database of the app (the live database and the
+archive; not the read replica, which is itself a copy) with SQLite's
+backup API while the server keeps taking bookings. Pages are copied in
+steps of ``BACKUP_PAGES_PER_STEP`` with a short pause in between, so a
+step only holds the read lock for a few milliseconds and writers commit
+in the gaps. SQLite restarts an incremental backup when another connection
+writes to the source; after ``BACKUP_MAX_RESTARTS`` restarts the copy is
+finished in a single step, which holds the read lock for the whole copy
+but always completes.
+
+Each backup is a directory named after its UTC start time holding one
+gzip file per database. Only the newest ``BACKUP_RETENTION`` are kept.
+
+Usage::
+
+    python backup.py create
+    python backup.py list
+    python backup.py restore 20261019-133000   # stop the server first
+"""
+
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timezone
+from threading import Lock
+
+import config
+from models import db
+from replica import REPLICA_BIND
+
+_running = Lock()
+
+class BackupInProgress(Exception):
+    """Another backup is already running in this process"""
+
+class _Restarted(Exception):
+    pass
+
+def snapshot(source, target, pages, step_sleep, max_restarts):
+    """Copy the source sqlite3 connection into target; returns the number of restarts"""
+    state = {'remaining': None, 'restarts': 0}
+
+    def progress(status, remaining, total):
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > max_restarts:
+                raise _Restarted()
+        state['remaining'] = remaining
+        if remaining:
+            # Let writers take the lock before the next step
+            time.sleep(step_sleep)
+
+    try:
+        source.backup(target, pages=pages, progress=progress)
+    except _Restarted:
+        source.backup(target, pages=-1)
+    return state['restarts']
+
+def databases():
+    """(file name, engine) of every database to back up, in the app context"""
+    return [(os.path.basename(engine.url.database), engine)
+            for key, engine in db.engines.items()
+            if key != REPLICA_BIND and engine.dialect.name == 'sqlite']
+
+def backup_dir(app):
+    return os.path.join(app.instance_path, config.BACKUP_DIR)
+
+def create_backup(directory, pages=config.BACKUP_PAGES_PER_STEP, step_sleep=config.BACKUP_STEP_SLEEP,
+                  max_restarts=config.BACKUP_MAX_RESTARTS, level=config.BACKUP_COMPRESSION_LEVEL,
+                  keep=config.BACKUP_RETENTION):
+    """Back up every database into a new directory under directory and prune old backups"""
+    if not _running.acquire(blocking=False):
+        raise BackupInProgress('A backup is already running')
+    try:
+        started = time.monotonic()
+        name = stamp = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')
+        os.makedirs(directory, exist_ok=True)
+        suffix = 1
+        while os.path.exists(os.path.join(directory, name)):
+            suffix += 1
+            name = f'{stamp}-{suffix}'
+        partial = tempfile.mkdtemp(prefix=f'.{name}-', dir=directory)
+        files = []
+        restarts = 0
+        copy_seconds = 0.0
+        try:
+            for filename, engine in databases():
+                copy_path = os.path.join(partial, filename)
+                source = engine.raw_connection()
+                target = sqlite3.connect(copy_path)
+                copy_started = time.monotonic()
+                try:
+                    restarts += snapshot(source.driver_connection, target, pages, step_sleep, max_restarts)
+                finally:
+                    copy_seconds += time.monotonic() - copy_started
+                    target.close()
+                    source.close()
+                # Compress after the copy so no lock is held meanwhile
+                with open(copy_path, 'rb') as raw, gzip.open(copy_path + '.gz', 'wb', compresslevel=level) as out:
+                    shutil.copyfileobj(raw, out, 1024 * 1024)
+                os.remove(copy_path)
+                files.append({'database': filename, 'size': os.path.getsize(copy_path + '.gz')})
+            os.rename(partial, os.path.join(directory, name))
+        except Exception:
+            shutil.rmtree(partial, ignore_errors=True)
+            raise
+        prune(directory, keep)
+        return {'name': name, 'files': files, 'restarts': restarts,
+                'copy_seconds': round(copy_seconds, 3), 'seconds': round(time.monotonic() - started, 3)}
+    finally:
+        _running.release()
+
+def list_backups(directory):
+    """Names of the complete backups under directory, newest first"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted((entry for entry in os.listdir(directory)
+                   if not entry.startswith('.') and os.path.isdir(os.path.join(directory, entry))),
+                  reverse=True)
+
+def prune(directory, keep):
+    """Delete all but the newest keep backups; returns the names removed"""
+    removed = list_backups(directory)[keep:]
+    for name in removed:
+        shutil.rmtree(os.path.join(directory, name))
+    return removed
+
+def restore(directory, name):
+    """Replace every database with its copy in backup name. The server must be stopped."""
+    path = os.path.join(directory, name)
+    if name not in list_backups(directory):
+        raise ValueError(f'No backup named {name}')
+    restored = []
+    for filename, engine in databases():
+        archive = os.path.join(path, filename + '.gz')
+        if not os.path.exists(archive):
+            continue
+        with tempfile.NamedTemporaryFile(suffix='.db', dir=path, delete=False) as copy:
+            with gzip.open(archive, 'rb') as compressed:
+                shutil.copyfileobj(compressed, copy, 1024 * 1024)
+        try:
+            source = sqlite3.connect(copy.name)
+            try:
+                if source.execute('PRAGMA integrity_check').fetchone()[0] != 'ok':
+                    raise ValueError(f'{archive} is corrupt')
+                engine.dispose()
+                target = sqlite3.connect(engine.url.database)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+            finally:
+                source.close()
+        finally:
+            os.remove(copy.name)
+        restored.append(filename)
+    return restored
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Online backups of the Ticket Reservation databases')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('create', help='back up the databases while the server runs')
+    commands.add_parser('list', help='list backups, newest first')
+    restore_parser = commands.add_parser('restore', help='restore a backup (stop the server first)')
+    restore_parser.add_argument('name')
+    args = parser.parse_args(argv)
+
+    import server
+
+    with server.app.app_context():
+        directory = backup_dir(server.app)
+        if args.command == 'create':
+            result = create_backup(directory)
+            print(f"Backup {result['name']} written in {result['seconds']}s "
+                  f"(copy {result['copy_seconds']}s, {result['restarts']} restart(s))")
+        elif args.command == 'list':
+            for name in list_backups(directory):
+                print(name)
+        else:
+            try:
+                restored = restore(directory, args.name)
+            except ValueError as e:
+                parser.exit(1, f"{e}\n")
+            print(f"Restored {', '.join(restored) or 'nothing'} from {args.name}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the Ticket Reservation System
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+def timed(label, func, repeat):
+    """Run func repeat times and print throughput"""
+    func()  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<40} {repeat / elapsed:10.1f} ops/s  ({elapsed / repeat * 1000:.2f} ms/op)")
+    return elapsed
+
+def make_app(n_events, n_bookings):
+    """Create the server app on a throwaway database filled with sample rows"""
+    workdir = tempfile.mkdtemp(prefix='ticket-bench-')
+    os.environ['TICKET_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ['TICKET_ARCHIVE_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'archive.db')
+    import server
+    from models import db, User, Event, Booking
+    from schema import upgrade_schema
+
+    app = server.app
+    with app.app_context():
+        upgrade_schema()
+        user = User(username='bench', email='bench@example.com', is_admin=True, password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        now = datetime.now()
+        db.session.add_all(Event(
+            name=f'Event {i}', description='Benchmark event ' * 4, venue=f'Venue {i % 50}',
+            event_date=now + timedelta(days=i % 365), total_tickets=1000, available_tickets=1000,
+            price_cents=2500, created_by=user.id) for i in range(n_events))
+        db.session.flush()
+        db.session.add_all(Booking(
+            user_id=user.id, event_id=1 + i % n_events, quantity=1, total_cents=2500,
+            status='confirmed') for i in range(n_bookings))
+        db.session.commit()
+    return app
+
+def bench_serialization(args):
+    """Compare the ORM to_dict + jsonify path with the row-tuple path"""
+    app = make_app(args.events, args.bookings)
+    from flask import jsonify
+    from models import db, Event, Booking
+    import serialization
+
+    print(f"Serialization: {args.events} events, {args.bookings} bookings "
+          f"(encoder: {'orjson' if serialization.orjson else 'json'})")
+    with app.test_request_context():
+        def orm_events():
+            jsonify([event.to_dict() for event in Event.query.all()]).get_data()
+            db.session.expire_all()
+
+        def fast_events():
+            rows = db.session.execute(serialization.events_query())
+            serialization.json_response(serialization.encode_events(rows)).get_data()
+
+        def cold_events():
+            serialization.event_fragments.clear()
+            fast_events()
+
+        def orm_bookings():
+            jsonify([booking.to_dict() for booking in Booking.query.all()]).get_data()
+            db.session.expire_all()
+
+        def fast_bookings():
+            rows = db.session.execute(serialization.bookings_query())
+            serialization.json_response(serialization.encode_bookings(rows)).get_data()
+
+        base = timed('events: ORM to_dict + jsonify', orm_events, args.repeat)
+        timed('events: row tuples (cold fragments)', cold_events, args.repeat)
+        fast = timed('events: row tuples (cached fragments)', fast_events, args.repeat)
+        print(f"  events speed-up: {base / fast:.1f}x")
+        base = timed('bookings: ORM to_dict + jsonify', orm_bookings, args.repeat)
+        fast = timed('bookings: row tuples', fast_bookings, args.repeat)
+        print(f"  bookings speed-up: {base / fast:.1f}x")
+
+def bench_booking(args):
+    """Time the booking path and the revenue aggregate used by stats"""
+    app = make_app(args.events, args.bookings)
+    import itertools
+    import config
+    from auth import issue_token
+    from models import db, User, Booking
+
+    config.RATE_LIMIT_ENABLED = False
+    client = app.test_client()
+    with app.app_context():
+        user = db.session.execute(db.select(User).where(User.username == 'bench')).scalar_one()
+        headers = {'Authorization': f"Bearer {issue_token(user, app.config['SECRET_KEY'])}"}
+        # Float baseline: the same rows with the pre-cents REAL column
+        db.session.execute(db.text(
+            'CREATE TABLE bench_float_bookings AS '
+            'SELECT id, user_id, event_id, quantity, total_cents / 100.0 AS total_amount, '
+            'status, booking_date, applied_tier FROM booking'))
+        db.session.commit()
+    event_ids = itertools.cycle(range(1, args.events + 1))
+
+    def book():
+        response = client.post('/api/bookings', json={'event_id': next(event_ids), 'quantity': 2},
+                               headers=headers)
+        assert response.status_code == 201, response.get_json()
+
+    def revenue():
+        with app.app_context():
+            db.session.execute(db.select(db.func.sum(Booking.total_cents))
+                               .where(Booking.status == 'confirmed')).scalar()
+
+    def float_revenue():
+        with app.app_context():
+            db.session.execute(db.text(
+                "SELECT SUM(total_amount) FROM bench_float_bookings WHERE status = 'confirmed'")).scalar()
+
+    print(f"Booking: {args.events} events, {args.bookings} bookings")
+    timed('POST /api/bookings', book, args.repeat)
+    fast = timed('revenue aggregate (integer cents)', revenue, args.repeat)
+    base = timed('revenue aggregate (float baseline)', float_revenue, args.repeat)
+    print(f"  cents vs float: {base / fast:.2f}x")
+
+def bench_search(args):
+    """Time ranked prefix searches against the FTS5 index"""
+    app = make_app(args.events, 0)
+    import search
+    from models import db
+    import serialization
+
+    print(f"Search: {args.events} events")
+    with app.app_context():
+        for text in ('event 4242', 'event 4', 'venue', 'benchmark ev', 'venue 4 event 12', 'nomatch'):
+            query, page, per_page = search.parse_search_args({'q': text})
+            rows, count = search.search_statements(query, page, per_page)
+
+            def run():
+                total, truncated = search.totals(db.session.execute(count).scalar())
+                serialization.encode_search_results(db.session.execute(rows), total, truncated, page, per_page)
+            timed(f'q={text!r}', run, args.repeat)
+
+def bench_network(args):
+    """Measure listing latency from a (LAN) client with and without connection reuse"""
+    import requests
+    import urllib3
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    url = args.url.rstrip('/') + '/api/events'
+    print(f"Network: GET {url}")
+
+    def fetch(session, encoding):
+        response = session.get(url, headers={'Accept-Encoding': encoding}, verify=False)
+        response.raise_for_status()
+        return response
+
+    for encoding in ('identity', 'gzip, br'):
+        sample = fetch(requests.Session(), encoding)
+        wire_size = sample.headers.get('Content-Length', len(sample.content))
+        print(f"  Accept-Encoding: {encoding} -> {sample.headers.get('Content-Encoding', 'identity')}, "
+              f"{wire_size} bytes on the wire")
+        timed(f'new connection per request ({encoding})',
+              lambda: fetch(requests.Session(), encoding), args.repeat)
+        session = requests.Session()
+        timed(f'persistent session ({encoding})', lambda: fetch(session, encoding), args.repeat)
+
+def bench_startup(args):
+    """Time server.py from process spawn to its first served request"""
+    import subprocess
+    import requests
+    import urllib3
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    workdir = tempfile.mkdtemp(prefix='ticket-bench-')
+    env = dict(os.environ, TICKET_DATABASE_URI='sqlite:///' + os.path.join(workdir, 'startup.db'),
+               TICKET_ARCHIVE_DATABASE_URI='sqlite:///' + os.path.join(workdir, 'archive.db'))
+    url = f'https://localhost:{args.port}/api/events'
+    print(f"Startup: cold start to first GET /api/events (budget {args.budget:.1f}s)")
+
+    over_budget = False
+    for label in ('empty database', 'schema already current'):
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, 'server.py', '--port', str(args.port)],
+                                cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                try:
+                    if requests.get(url, verify=False, timeout=0.5).status_code == 200:
+                        break
+                except requests.exceptions.ConnectionError:
+                    pass
+                if proc.poll() is not None:
+                    print("  server exited before serving a request")
+                    return 1
+                if time.perf_counter() - start > args.budget * 5:
+                    break
+                time.sleep(0.02)
+            elapsed = time.perf_counter() - start
+        finally:
+            proc.terminate()
+            proc.wait()
+        over_budget = over_budget or elapsed > args.budget
+        print(f"  {label:<40} {elapsed:8.2f} s{'  OVER BUDGET' if elapsed > args.budget else ''}")
+    return 1 if over_budget else 0
+
+def bench_concurrency(args):
+    """Compare how server.py and async_server.py serve requests while slow clients hold connections"""
+    import socket
+    import ssl
+    import subprocess
+    import requests
+    import urllib3
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    workdir = tempfile.mkdtemp(prefix='ticket-bench-')
+    env = dict(os.environ, TICKET_DATABASE_URI='sqlite:///' + os.path.join(workdir, 'concurrency.db'),
+               TICKET_ARCHIVE_DATABASE_URI='sqlite:///' + os.path.join(workdir, 'archive.db'))
+    subprocess.run([sys.executable, 'server.py', '--init-db'], cwd=here, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    client_context = ssl.create_default_context()
+    client_context.check_hostname = False
+    client_context.verify_mode = ssl.CERT_NONE
+
+    print(f"Concurrency: {args.connections} slow clients holding a half-sent request, "
+          f"then {args.repeat} GET /api/events (timeout {args.timeout:.0f}s)")
+    for label, script, port in (('server.py (threads)', 'server.py', args.port),
+                                ('async_server.py (asyncio)', 'async_server.py', args.port + 1)):
+        proc = subprocess.Popen([sys.executable, script, '--port', str(port)], cwd=here, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        url = f'https://localhost:{port}/api/events'
+        slow = []
+        try:
+            deadline = time.perf_counter() + 30
+            while True:
+                try:
+                    requests.get(url, verify=False, timeout=1).raise_for_status()
+                    break
+                except requests.exceptions.ConnectionError:
+                    if proc.poll() is not None or time.perf_counter() > deadline:
+                        print(f"  {label:<28} failed to start")
+                        return 1
+                    time.sleep(0.1)
+
+            for _ in range(args.connections):
+                conn = client_context.wrap_socket(socket.create_connection(('localhost', port)))
+                conn.sendall(b'GET /api/events HTTP/1.1\r\nHost: localhost\r\n')  # never finished
+                slow.append(conn)
+
+            session = requests.Session()
+            served = 0
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                try:
+                    session.get(url, verify=False, timeout=args.timeout).raise_for_status()
+                    served += 1
+                except requests.exceptions.RequestException:
+                    session = requests.Session()
+            elapsed = time.perf_counter() - start
+            print(f"  {label:<28} {served}/{args.repeat} served, {elapsed / args.repeat * 1000:8.1f} ms/request")
+        finally:
+            for conn in slow:
+                conn.close()
+            proc.terminate()
+            proc.wait()
+
+def bench_backup(args):
+    """Booking latency while an online backup runs, incremental vs single step"""
+    app = make_app(args.events, args.bookings)
+    import itertools
+    import threading
+    import backup
+    import config
+    from auth import issue_token
+    from models import db, User
+
+    config.RATE_LIMIT_ENABLED = False
+    client = app.test_client()
+    with app.app_context():
+        user = db.session.execute(db.select(User).where(User.username == 'bench')).scalar_one()
+        headers = {'Authorization': f"Bearer {issue_token(user, app.config['SECRET_KEY'])}"}
+    event_ids = itertools.cycle(range(1, args.events + 1))
+    directory = tempfile.mkdtemp(prefix='ticket-backup-')
+
+    def book():
+        start = time.perf_counter()
+        response = client.post('/api/bookings', json={'event_id': next(event_ids), 'quantity': 1},
+                               headers=headers)
+        assert response.status_code == 201, response.get_json()
+        return time.perf_counter() - start
+
+    def report(label, latencies, note=''):
+        latencies = sorted(latencies)
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        print(f"  {label:<28} {len(latencies):6d} bookings  p50 {p50:6.2f} ms  p99 {p99:7.2f} ms  "
+              f"max {latencies[-1] * 1000:7.2f} ms  {note}")
+
+    with app.app_context():
+        size = os.path.getsize(db.engine.url.database)
+    print(f"Backup: {args.events} events, {args.bookings} bookings, {size / 1e6:.1f} MB database")
+    report('no backup', [book() for _ in range(args.repeat)])
+
+    for label, pages in (('incremental backup', config.BACKUP_PAGES_PER_STEP), ('single-step backup', -1)):
+        result = {}
+
+        def run():
+            with app.app_context():
+                result.update(backup.create_backup(directory, pages=pages, keep=1))
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        latencies = []
+        while thread.is_alive():
+            latencies.append(book())
+        thread.join()
+        report(label, latencies, f"(backup {result.get('seconds')} s, copy {result.get('copy_seconds')} s, "
+                                   f"{result.get('restarts')} restart(s))")
+
+BENCHMARKS = {
+    'serialization': bench_serialization,
+    'search': bench_search,
+    'booking': bench_booking,
+    'network': bench_network,
+    'startup': bench_startup,
+    'concurrency': bench_concurrency,
+    'backup': bench_backup,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS), nargs='?', default='serialization')
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--bookings', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--url', default='https://localhost:8443', help='server to measure (network)')
+    parser.add_argument('--port', type=int, default=18443,
+                        help='port for the spawned server (startup; concurrency also uses port + 1)')
+    parser.add_argument('--connections', type=int, default=64, help='slow clients to hold open (concurrency)')
+    parser.add_argument('--timeout', type=float, default=5.0, help='per-request timeout (concurrency)')
+    parser.add_argument('--budget', type=float, default=3.0, help='startup time budget in seconds')
+    args = parser.parse_args()
+    return BENCHMARKS[args.benchmark](args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Pluggable response cache shared by the API routes.
+
+``MemoryCache`` keeps entries in the server process and is only coherent for
+a single worker. ``RedisCache`` stores entries in a Redis-protocol server so
+every worker (or node) sees the same values, and broadcasts invalidations
+over pub/sub so per-process caches layered on top, such as the event
+metadata cache, can drop their copies too.
+
+Every key has a generation that each invalidation bumps. A value built
+after a miss is only stored if the generation is still the one seen by the
+lookup, so a response built while a change landed is never written back
+over the invalidation.
+
+Values are bytes; callers serialize before storing.
+"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+
+class MemoryCache:
+    """In-process cache with per-entry TTL and LRU eviction"""
+
+    blocking = False  # Calls never wait on I/O
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._generations = {}  # key -> invalidation count; one per invalidated key
+        self._subscribers = []
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def lookup(self, key):
+        return self.get(key), self._generations.get(key, 0)
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def set_if(self, key, value, ttl, generation):
+        with self._lock:
+            if self._generations.get(key, 0) != generation:
+                return False
+            self._set(key, value, ttl)
+            return True
+
+    def _set(self, key, value, ttl):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def publish(self, keys):
+        for callback in list(self._subscribers):
+            callback(keys)
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+class RedisCache:
+    """Cache backed by a Redis-protocol server, with pub/sub invalidation"""
+
+    blocking = True  # Every call is a network round-trip
+
+    # Generations only have to outlive the builds that read them
+    GENERATION_TTL_MS = 24 * 3600 * 1000
+
+    SET_IF_GENERATION = (
+        "if tonumber(redis.call('GET', KEYS[2]) or '0') == tonumber(ARGV[2]) then "
+        "redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[3]) return 1 end return 0"
+    )
+
+    def __init__(self, url, channel):
+        # Imported here so memory:// deployments never pay for the redis client
+        try:
+            import redis
+        except ImportError:  # pragma: no cover - depends on the environment
+            raise RuntimeError("The redis package is required for a redis:// CACHE_URL") from None
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self._listener = None
+        self._set_if = self.client.register_script(self.SET_IF_GENERATION)
+
+    @staticmethod
+    def _generation_key(key):
+        return key + ':generation'
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def lookup(self, key):
+        value, generation = self.client.mget(key, self._generation_key(key))
+        return value, int(generation or 0)
+
+    def set(self, key, value, ttl):
+        self.client.set(key, value, px=int(ttl * 1000))
+
+    def set_if(self, key, value, ttl, generation):
+        return bool(self._set_if(keys=[key, self._generation_key(key)],
+                                 args=[value, generation, int(ttl * 1000)]))
+
+    def delete(self, *keys):
+        if keys:
+            pipeline = self.client.pipeline(transaction=False)
+            pipeline.delete(*keys)
+            for key in keys:
+                pipeline.incr(self._generation_key(key))
+                pipeline.pexpire(self._generation_key(key), self.GENERATION_TTL_MS)
+            pipeline.execute()
+
+    def publish(self, keys):
+        self.client.publish(self.channel, '\n'.join(keys))
+
+    def subscribe(self, callback):
+        def handle(message):
+            callback(message['data'].decode('utf-8').split('\n'))
+
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self.channel: handle})
+        self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+class Cache:
+    """Key-prefixed front end over a cache backend"""
+
+    def __init__(self, backend, ttl, prefix=''):
+        self.backend = backend
+        self.ttl = ttl
+        self.prefix = prefix
+        self.blocking = backend.blocking
+
+    def get(self, key):
+        return self.backend.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(self.prefix + key, value, self.ttl if ttl is None else ttl)
+
+    def lookup(self, key):
+        """(cached value or None, generation of key); pass the generation to store()"""
+        return self.backend.lookup(self.prefix + key)
+
+    def store(self, key, value, generation, ttl=None):
+        """Cache value unless key was invalidated since the lookup that returned generation"""
+        return self.backend.set_if(self.prefix + key, value, self.ttl if ttl is None else ttl, generation)
+
+    def get_or_set(self, key, build, ttl=None):
+        """Return the cached value for key, storing build() on a miss"""
+        value, generation = self.lookup(key)
+        if value is None:
+            value = build()
+            self.store(key, value, generation, ttl)
+        return value
+
+    def invalidate(self, *keys):
+        """Delete keys everywhere and notify subscribers in every worker"""
+        self.backend.delete(*(self.prefix + key for key in keys))
+        self.backend.publish([self.prefix + key for key in keys])
+
+    def subscribe(self, callback):
+        """Call callback(keys) with unprefixed keys for every invalidation"""
+        def strip(keys):
+            callback([key[len(self.prefix):] for key in keys if key.startswith(self.prefix)])
+        self.backend.subscribe(strip)
+
+def create_cache(url, ttl, channel, prefix=''):
+    """Build a Cache for a memory:// or redis:// URL"""
+    if url.startswith('memory://'):
+        backend = MemoryCache()
+    elif url.startswith(('redis://', 'rediss://', 'unix://')):
+        backend = RedisCache(url, channel)
+    else:
+        raise ValueError(f"Unsupported CACHE_URL: {url}")
+    return Cache(backend, ttl, prefix)
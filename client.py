@@ -1,13 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
-import requests
 import json
 import threading
 from datetime import datetime
-import urllib3
-
-# Disable SSL warnings for self-signed certificates
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from ticket_client import TicketClient, APIError
 
 class TicketReservationClient:
     def __init__(self, root):
@@ -16,11 +12,8 @@ class TicketReservationClient:
         self.root.geometry("1000x700")
         self.root.configure(bg='#f0f0f0')
         
-        # API configuration
-        self.base_url = "https://localhost:8443/api"
-        self.session = requests.Session()
-        self.session.verify = False  # For self-signed certificates
-        self.token = None
+        # API client (server URL and certificate checks come from config.py)
+        self.api = TicketClient()
         self.current_user = None
         
         # Create GUI
@@ -88,6 +81,15 @@ class TicketReservationClient:
                                font=('Arial', 16, 'bold'), bg='#f0f0f0')
         events_title.pack(pady=10)
         
+        # Search bar (server-side full-text search)
+        search_frame = tk.Frame(self.events_frame, bg='#f0f0f0')
+        search_frame.pack(fill='x', padx=10)
+        self.search_entry = tk.Entry(search_frame, font=('Arial', 12), width=40)
+        self.search_entry.pack(side='left', padx=(0, 5))
+        self.search_entry.bind('<Return>', lambda event: self.search_events())
+        tk.Button(search_frame, text="Search", command=self.search_events, 
+                 font=('Arial', 10), bg='#3498db', fg='white').pack(side='left')
+        
         # Events treeview
         columns = ('Name', 'Venue', 'Date', 'Available', 'Price')
         self.events_tree = ttk.Treeview(self.events_frame, columns=columns, show='headings', height=10)
@@ -225,15 +227,11 @@ class TicketReservationClient:
                 return
             
             try:
-                response = self.session.post(f"{self.base_url}/register", 
-                                           json={'username': username, 'email': email, 'password': password})
-                
-                if response.status_code == 201:
-                    messagebox.showinfo("Success", "Registration successful! Please login.")
-                    register_window.destroy()
-                else:
-                    error_msg = response.json().get('message', 'Registration failed')
-                    messagebox.showerror("Error", error_msg)
+                self.api.register(username, email, password)
+                messagebox.showinfo("Success", "Registration successful! Please login.")
+                register_window.destroy()
+            except APIError as e:
+                messagebox.showerror("Error", e.message)
             except Exception as e:
                 messagebox.showerror("Error", f"Connection failed: {str(e)}")
         
@@ -250,48 +248,43 @@ class TicketReservationClient:
             return
         
         try:
-            response = self.session.post(f"{self.base_url}/login", 
-                                       json={'username': username, 'password': password})
+            data = self.api.login(username, password)
+            self.current_user = data['user']
             
-            if response.status_code == 200:
-                data = response.json()
-                self.token = data['token']
-                self.current_user = data['user']
-                self.session.headers.update({'Authorization': f'Bearer {self.token}'})
-                
-                self.welcome_label.config(text=f"Welcome, {self.current_user['username']}!")
-                
-                # Show app frame and hide login frame
-                self.login_frame.pack_forget()
-                self.app_frame.pack(fill='both', expand=True)
-                
-                # Load data
-                self.load_events()
-                self.load_bookings()
-                
-                # Show admin tab only for admin users
-                if self.current_user['is_admin']:
-                    self.notebook.add(self.admin_frame, text="Admin")
-                    self.load_stats()
-                else:
-                    # Hide admin tab if not admin
-                    for tab_id in self.notebook.tabs():
-                        if self.notebook.tab(tab_id, "text") == "Admin":
-                            self.notebook.forget(tab_id)
-                            break
-                
-                messagebox.showinfo("Success", "Login successful!")
+            self.welcome_label.config(text=f"Welcome, {self.current_user['username']}!")
+            
+            # Show app frame and hide login frame
+            self.login_frame.pack_forget()
+            self.app_frame.pack(fill='both', expand=True)
+            
+            # Load data
+            self.load_events()
+            self.load_bookings()
+            
+            # Show admin tab only for admin users
+            if self.current_user['is_admin']:
+                self.notebook.add(self.admin_frame, text="Admin")
+                self.load_stats()
             else:
-                error_msg = response.json().get('message', 'Login failed')
-                messagebox.showerror("Error", error_msg)
+                # Hide admin tab if not admin
+                for tab_id in self.notebook.tabs():
+                    if self.notebook.tab(tab_id, "text") == "Admin":
+                        self.notebook.forget(tab_id)
+                        break
+            
+            messagebox.showinfo("Success", "Login successful!")
+        except APIError as e:
+            messagebox.showerror("Error", e.message)
         except Exception as e:
             messagebox.showerror("Error", f"Connection failed: {str(e)}")
     
     def logout(self):
         """Handle user logout"""
-        self.token = None
+        try:
+            self.api.logout()
+        except Exception:
+            pass  # The session is forgotten locally even if the server cannot be reached
         self.current_user = None
-        self.session.headers.pop('Authorization', None)
         self.show_login_frame()
         self.username_entry.delete(0, tk.END)
         self.password_entry.delete(0, tk.END)
@@ -299,30 +292,43 @@ class TicketReservationClient:
     def load_events(self):
         """Load events from server"""
         try:
-            response = self.session.get(f"{self.base_url}/events")
-            
-            if response.status_code == 200:
-                events = response.json()
-                
-                # Clear existing items
-                for item in self.events_tree.get_children():
-                    self.events_tree.delete(item)
-                
-                # Add events to tree
-                for event in events:
-                    event_date = datetime.fromisoformat(event['event_date']).strftime('%Y-%m-%d %H:%M')
-                    self.events_tree.insert('', 'end', values=(
-                        event['name'],
-                        event['venue'],
-                        event_date,
-                        event['available_tickets'],
-                        f"${event['price_per_ticket']:.2f}"
-                    ), tags=(event['id'],))
-            else:
-                messagebox.showerror("Error", "Failed to load events")
+            self.search_entry.delete(0, tk.END)
+            self.show_events(self.api.events())
+        except APIError:
+            messagebox.showerror("Error", "Failed to load events")
+        except Exception as e:
+            messagebox.showerror("Error", f"Connection failed: {str(e)}")
+    
+    def search_events(self):
+        """Show the best matches for the search box, or every event when it is empty"""
+        query = self.search_entry.get().strip()
+        if not query:
+            self.load_events()
+            return
+        try:
+            self.show_events(self.api.search(query, per_page=100)['events'])
+        except APIError as e:
+            messagebox.showerror("Error", e.message)
         except Exception as e:
             messagebox.showerror("Error", f"Connection failed: {str(e)}")
     
+    def show_events(self, events):
+        """Replace the rows of the events tree"""
+        # Clear existing items
+        for item in self.events_tree.get_children():
+            self.events_tree.delete(item)
+        
+        # Add events to tree
+        for event in events:
+            event_date = datetime.fromisoformat(event['event_date']).strftime('%Y-%m-%d %H:%M')
+            self.events_tree.insert('', 'end', values=(
+                event['name'],
+                event['venue'],
+                event_date,
+                event['available_tickets'],
+                f"${event['price_per_ticket']:.2f}"
+            ), tags=(event['id'],))
+    
     def book_tickets(self):
         """Book selected tickets"""
         selection = self.events_tree.selection()
@@ -339,55 +345,45 @@ class TicketReservationClient:
             # Get event ID from selection
             event_id = self.events_tree.item(selection[0])['tags'][0]
             
-            print(f"Debug: Booking {quantity} tickets for event {event_id}")  # Debug info
-            
-            response = self.session.post(f"{self.base_url}/bookings", 
-                                       json={'event_id': int(event_id), 'quantity': quantity})
-            
-            print(f"Debug: Server response status: {response.status_code}")  # Debug info
-            print(f"Debug: Server response: {response.text}")  # Debug info
+            # Retries reuse one Idempotency-Key, so a lost response never double-books
+            self.api.book(int(event_id), quantity)
             
-            if response.status_code == 201:
-                messagebox.showinfo("Success", "Tickets booked successfully!")
-                self.load_events()
-                self.load_bookings()
-            else:
-                error_msg = response.json().get('message', 'Booking failed')
-                messagebox.showerror("Error", error_msg)
+            messagebox.showinfo("Success", "Tickets booked successfully!")
+            self.load_events()
+            self.load_bookings()
         except ValueError:
             messagebox.showerror("Error", "Invalid quantity - please enter a number")
+        except APIError as e:
+            messagebox.showerror("Error", e.message)
         except Exception as e:
             messagebox.showerror("Error", f"Booking failed: {str(e)}")
     
     def load_bookings(self):
         """Load user bookings"""
         try:
-            response = self.session.get(f"{self.base_url}/bookings")
+            bookings = self.api.bookings()
             
-            if response.status_code == 200:
-                bookings = response.json()
-                
-                # Clear existing items
-                for item in self.bookings_tree.get_children():
-                    self.bookings_tree.delete(item)
+            # Clear existing items
+            for item in self.bookings_tree.get_children():
+                self.bookings_tree.delete(item)
+            
+            # Add bookings to tree
+            for booking in bookings:
+                event = booking['event']
+                event_date = datetime.fromisoformat(event['event_date']).strftime('%Y-%m-%d %H:%M')
+                booking_date = datetime.fromisoformat(booking['booking_date']).strftime('%Y-%m-%d %H:%M')
                 
-                # Add bookings to tree
-                for booking in bookings:
-                    event = booking['event']
-                    event_date = datetime.fromisoformat(event['event_date']).strftime('%Y-%m-%d %H:%M')
-                    booking_date = datetime.fromisoformat(booking['booking_date']).strftime('%Y-%m-%d %H:%M')
-                    
-                    self.bookings_tree.insert('', 'end', values=(
-                        event['name'],
-                        event['venue'],
-                        event_date,
-                        booking['quantity'],
-                        f"${booking['total_amount']:.2f}",
-                        booking['status'].title(),
-                        booking_date
-                    ), tags=(booking['id'],))
-            else:
-                messagebox.showerror("Error", "Failed to load bookings")
+                self.bookings_tree.insert('', 'end', values=(
+                    event['name'],
+                    event['venue'],
+                    event_date,
+                    booking['quantity'],
+                    f"${booking['total_amount']:.2f}",
+                    booking['status'].title(),
+                    booking_date
+                ), tags=(booking['id'],))
+        except APIError:
+            messagebox.showerror("Error", "Failed to load bookings")
         except Exception as e:
             messagebox.showerror("Error", f"Connection failed: {str(e)}")
     
@@ -402,15 +398,12 @@ class TicketReservationClient:
         
         if messagebox.askyesno("Confirm", "Are you sure you want to cancel this booking?"):
             try:
-                response = self.session.delete(f"{self.base_url}/bookings/{booking_id}")
-                
-                if response.status_code == 200:
-                    messagebox.showinfo("Success", "Booking cancelled successfully!")
-                    self.load_bookings()
-                    self.load_events()
-                else:
-                    error_msg = response.json().get('message', 'Cancellation failed')
-                    messagebox.showerror("Error", error_msg)
+                self.api.cancel(booking_id)
+                messagebox.showinfo("Success", "Booking cancelled successfully!")
+                self.load_bookings()
+                self.load_events()
+            except APIError as e:
+                messagebox.showerror("Error", e.message)
             except Exception as e:
                 messagebox.showerror("Error", f"Cancellation failed: {str(e)}")
     
@@ -425,45 +418,45 @@ class TicketReservationClient:
                     messagebox.showerror("Error", f"All fields are required")
                     return
                 
-                if field == 'total_tickets' or field == 'price_per_ticket':
+                if field == 'total_tickets':
+                    try:
+                        event_data[field] = int(value)
+                    except ValueError:
+                        messagebox.showerror("Error", f"Invalid {field}")
+                        return
+                elif field == 'price_per_ticket':
                     try:
                         event_data[field] = float(value)
                     except ValueError:
                         messagebox.showerror("Error", f"Invalid {field}")
                         return
-                elif field == 'event_date':
+                elif field.startswith('event_date'):
                     try:
                         # Parse date string
-                        event_data[field] = datetime.strptime(value, '%Y-%m-%d %H:%M').isoformat()
+                        event_data['event_date'] = datetime.strptime(value, '%Y-%m-%d %H:%M').isoformat()
                     except ValueError:
                         messagebox.showerror("Error", "Invalid date format. Use YYYY-MM-DD HH:MM")
                         return
                 else:
                     event_data[field] = value
             
-            response = self.session.post(f"{self.base_url}/events", json=event_data)
-            
-            if response.status_code == 201:
-                messagebox.showinfo("Success", "Event created successfully!")
-                # Clear form
-                for entry in self.event_entries.values():
-                    entry.delete(0, tk.END)
-                self.load_events()
-            else:
-                error_msg = response.json().get('message', 'Event creation failed')
-                messagebox.showerror("Error", error_msg)
+            self.api.create_event(**event_data)
+            messagebox.showinfo("Success", "Event created successfully!")
+            # Clear form
+            for entry in self.event_entries.values():
+                entry.delete(0, tk.END)
+            self.load_events()
+        except APIError as e:
+            messagebox.showerror("Error", e.message)
         except Exception as e:
             messagebox.showerror("Error", f"Event creation failed: {str(e)}")
     
     def load_stats(self):
         """Load system statistics (admin only)"""
         try:
-            response = self.session.get(f"{self.base_url}/stats")
+            stats = self.api.stats()
             
-            if response.status_code == 200:
-                stats = response.json()
-                
-                stats_text = f"""
+            stats_text = f"""
 System Statistics
 ================
 
@@ -473,12 +466,12 @@ Total Bookings: {stats['total_bookings']}
 Total Revenue: ${stats['total_revenue']:.2f}
 
 Last Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-                """
-                
-                self.stats_text.delete(1.0, tk.END)
-                self.stats_text.insert(1.0, stats_text)
-            else:
-                messagebox.showerror("Error", "Failed to load statistics")
+            """
+            
+            self.stats_text.delete(1.0, tk.END)
+            self.stats_text.insert(1.0, stats_text)
+        except APIError:
+            messagebox.showerror("Error", "Failed to load statistics")
         except Exception as e:
             messagebox.showerror("Error", f"Connection failed: {str(e)}")
 
@@ -0,0 +1,52 @@
+"""
+HTTP response compression negotiated via Accept-Encoding.
+"""
+
+import gzip
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain', 'text/html')
+
+def _gzip(data, level):
+    return gzip.compress(data, compresslevel=level)
+
+def _brotli(data, level):
+    # Map gzip levels 1-9 onto the cheaper end of brotli's 0-11 quality range
+    return brotli.compress(data, quality=min(11, max(0, level - 2)))
+
+ENCODERS = {'gzip': _gzip}
+if brotli is not None:
+    ENCODERS = {'br': _brotli, 'gzip': _gzip}
+
+def compress_body(data, accept_encodings, min_size, level):
+    """Return (data, encoding) compressed with the best encoding the client accepts.
+
+    encoding is None when the body is left as is.
+    """
+    if len(data) < min_size:
+        return data, None
+    encoding = accept_encodings.best_match(list(ENCODERS))
+    if encoding is None:
+        return data, None
+    return ENCODERS[encoding](data, level), encoding
+
+def compress_response(response, accept_encodings, min_size, level):
+    """Compress response in place with the best encoding the client accepts"""
+    if (response.direct_passthrough
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data, encoding = compress_body(response.get_data(), accept_encodings, min_size, level)
+    if encoding is None:
+        return response
+
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
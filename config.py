@@ -4,18 +4,117 @@
 SERVER_HOST = '0.0.0.0'  # Accept connections from any IP
 SERVER_PORT = 8443
 SERVER_DEBUG = True
+SERVER_THREADS = 16  # Worker threads serving requests (each persistent connection holds one while active)
+ASYNC_SERVER_PORT = 8444  # async_server.py (read routes on asyncio)
 
 # Database Configuration
 DATABASE_URI = 'sqlite:///ticket_system.db'
 
+# Cache Configuration
+CACHE_URL = 'memory://'  # 'memory://' (single worker) or 'redis://host:6379/0' (shared by all workers)
+CACHE_TTL_SECONDS = 30  # Upper bound on staleness if an invalidation is missed
+CACHE_INVALIDATION_CHANNEL = 'ticket-cache-invalidate'
+
+# Read Replica Configuration
+REPLICA_ENABLED = False  # Route read-only API queries to a replica database
+REPLICA_DATABASE_URI = 'sqlite:///ticket_system_replica.db'  # SQLite copies are refreshed from the primary
+REPLICA_REFRESH_SECONDS = 5  # How often a SQLite replica is re-copied from the primary
+REPLICA_MAX_STALENESS_SECONDS = 15  # Older replicas are bypassed and reads go to the primary
+
+# Archive Configuration
+ARCHIVE_DATABASE_URI = 'sqlite:///ticket_system_archive.db'  # Past events and their bookings (server.py --archive-events)
+ARCHIVE_AFTER_DAYS = 30  # Events are archived this many days after their date
+ARCHIVE_BATCH_SIZE = 100  # Events moved per transaction
+
+# Backup Configuration (backup.py)
+BACKUP_DIR = 'backups'  # Relative to the instance folder
+BACKUP_PAGES_PER_STEP = 256  # Pages copied per backup step; writers commit between steps
+BACKUP_STEP_SLEEP = 0.002  # Seconds paused between steps
+BACKUP_MAX_RESTARTS = 1  # Writes restart an incremental backup; after this many it finishes in one step
+BACKUP_RETENTION = 7  # Newest backups kept
+BACKUP_COMPRESSION_LEVEL = 1  # gzip level; higher levels cost CPU that bookings compete for
+
 # Security Configuration
 SECRET_KEY = 'your-secret-key-change-in-production'  # Change this in production!
-JWT_EXPIRATION_HOURS = 24
+ACCESS_TOKEN_MINUTES = 15  # Lifetime of access tokens (JWTs), which are checked without a query
+REFRESH_TOKEN_DAYS = 30  # Lifetime of the single-use refresh tokens stored server-side
+REFRESH_TOKEN_PURGE_INTERVAL = 1000  # Delete expired refresh tokens after this many are issued
+REVOCATION_REFRESH_SECONDS = 5  # How often each process reloads token revocations made elsewhere
+
+# Account Configuration
+PASSWORD_HASH_WORKERS = 4  # Threads hashing passwords; bcrypt releases the GIL, so each can use a core
+BULK_USERS_MAX = 5000  # Users accepted per POST /api/users/bulk
+BULK_USERS_BATCH_SIZE = 500  # Users inserted per transaction by POST /api/users/bulk
+
+# Rate Limiting Configuration
+RATE_LIMIT_ENABLED = True
+RATE_LIMIT_MAX_BUCKETS = 100000  # Least recently used buckets are evicted beyond this
+# Per-route token buckets: (requests per minute, burst size), applied per client IP
+# and, on authenticated routes, per user id
+RATE_LIMITS = {
+    'default': (120, 30),
+    'register': (10, 5),
+    'login': (20, 5),
+    'token': (60, 20),
+    'events': (300, 60),
+    'create_booking': (30, 10),
+    'bookings': (120, 30),
+}
+
+# Search Configuration
+SEARCH_PER_PAGE = 20
+SEARCH_MAX_PER_PAGE = 100
+SEARCH_MAX_RANKED = 1000  # Newest matches scored per query; bounds the cost of very broad queries
+
+# Idempotency Configuration
+IDEMPOTENCY_TTL_HOURS = 24  # How long a booking response is replayed for a repeated Idempotency-Key
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+IDEMPOTENCY_PURGE_INTERVAL = 1000  # Delete expired keys after this many stored responses
+
+# Purchase Limit Configuration
+MAX_TICKETS_PER_USER_PER_EVENT = 10  # Confirmed tickets one account may hold per event; None disables the limit
+
+# Sharding Configuration (router.py / run_cluster.py)
+SHARD_NODES = [  # One URL per node; node i owns events and bookings with id % len(SHARD_NODES) == i
+    'https://localhost:9001',
+    'https://localhost:9002',
+]
+SHARD_INTERNAL_KEY = ''  # Shared by the router and nodes for user replication; empty disables it (run_cluster.py generates one)
+SHARD_BEHIND_ROUTER = False  # Nodes take client IPs from X-Forwarded-For; only enable when clients cannot reach them directly
+ROUTER_PORT = 8443
+
+# Background Job Configuration (worker.py)
+JOB_WORKERS = 2  # Worker processes started by worker.py
+JOB_POLL_SECONDS = 1.0  # Idle wait between queue polls
+JOB_MAX_ATTEMPTS = 5  # Attempts before a job moves to the dead-letter table
+JOB_BACKOFF_SECONDS = 2.0  # First retry delay; doubles with each attempt (with jitter)
+JOB_LEASE_SECONDS = 300  # Running jobs older than this are assumed abandoned and retried
+RECEIPTS_DIR = 'receipts'  # Where booking receipts are written
+SMTP_HOST = None  # Set to send booking confirmation emails
+SMTP_PORT = 25
+SMTP_SENDER = 'tickets@localhost'
+
+# Logging Configuration (logs.py)
+LOG_DIR = 'logs'  # Under the instance folder
+ACCESS_LOG_FILE = 'access.log'
+AUDIT_LOG_FILE = 'audit.log'
+LOG_MAX_BYTES = 10 * 1024 * 1024  # Rotate a log file at this size
+LOG_BACKUP_COUNT = 5  # Rotated files kept per log
+ACCESS_LOG_SAMPLE_RATE = 0.1  # Fraction of successful GET requests logged; writes and errors are always logged
 
 # SSL Configuration
 SSL_CERT_FILE = 'cert.pem'
 SSL_KEY_FILE = 'key.pem'
 
+# HTTP Performance Configuration
+COMPRESSION_MIN_SIZE = 1024  # Responses smaller than this (bytes) are sent uncompressed
+COMPRESSION_LEVEL = 6  # gzip level (1-9); brotli quality is derived from it
+KEEP_ALIVE_TIMEOUT = 30  # Seconds an idle persistent connection is kept open
+TLS_SESSION_TICKETS = 2  # TLS 1.3 session tickets issued per handshake (0 disables resumption)
+EVENT_CACHE_SIZE = 10000  # Events whose metadata is cached per server process
+BULK_CANCEL_BATCH_SIZE = 500  # Bookings cancelled per transaction when an admin cancels an event
+LEDGER_SNAPSHOT_INTERVAL = 1000  # Ledger entries per event between availability/revenue snapshots
+
 # Client Configuration
 CLIENT_SERVER_URL = 'https://localhost:8443'  # Change to server IP for LAN access
 CLIENT_VERIFY_SSL = False  # Set to True for production with valid certificates
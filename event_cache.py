@@ -0,0 +1,65 @@
+"""
+Read-through cache of immutable Event metadata.
+
+Name, venue, date and price rarely change once an event is published, so
+they are cached per process and only the volatile ``available_tickets``
+counter is read from the database. Unknown ids are cached as well so
+repeated 404s do not reach SQLite. Entries must be invalidated whenever an
+event is created or edited.
+"""
+
+from collections import OrderedDict, namedtuple
+from threading import Lock
+
+from models import db, Event
+
+EVENT_META_FIELDS = ('id', 'name', 'description', 'venue', 'event_date', 'total_tickets',
+                     'price_cents', 'created_at', 'created_by', 'version')
+
+EventMeta = namedtuple('EventMeta', EVENT_META_FIELDS)
+
+_MISSING = object()
+
+class EventCache:
+    """Bounded LRU of EventMeta keyed by event id"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, event_id):
+        """Return the EventMeta for event_id, or None if the event does not exist"""
+        with self._lock:
+            meta = self._entries.get(event_id, _MISSING)
+            if meta is not _MISSING:
+                self._entries.move_to_end(event_id)
+                return meta
+
+        row = db.session.execute(
+            db.select(*(getattr(Event, name) for name in EVENT_META_FIELDS))
+            .where(Event.id == event_id)
+        ).first()
+        meta = EventMeta(*row) if row is not None else None
+
+        with self._lock:
+            self._entries[event_id] = meta
+            self._entries.move_to_end(event_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return meta
+
+    def invalidate(self, event_id):
+        """Drop the cached entry for event_id"""
+        with self._lock:
+            self._entries.pop(event_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def event_row(meta, available_tickets):
+    """Combine cached metadata with a live counter into an EVENT_COLUMNS row"""
+    return (meta.id, meta.name, meta.description, meta.venue, meta.event_date,
+            meta.total_tickets, available_tickets, meta.price_cents,
+            meta.created_at, meta.created_by)
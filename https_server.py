@@ -0,0 +1,53 @@
+"""
+TLS serving shared by the API server and the shard router.
+"""
+
+import ssl
+
+from flask import request
+
+import config
+from compression import compress_response
+
+def install_http_tuning(app):
+    """Compress large responses and advertise the keep-alive window"""
+    @app.after_request
+    def apply_http_tuning(response):
+        compress_response(response, request.accept_encodings,
+                          config.COMPRESSION_MIN_SIZE, config.COMPRESSION_LEVEL)
+        response.headers['Keep-Alive'] = f'timeout={config.KEEP_ALIVE_TIMEOUT}'
+        return response
+
+def create_ssl_context():
+    """Build the server TLS context with session resumption enabled"""
+    ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ssl_context.load_cert_chain(config.SSL_CERT_FILE, config.SSL_KEY_FILE)
+    if config.TLS_SESSION_TICKETS:
+        # Stateless tickets let reconnecting clients skip the full handshake
+        ssl_context.options &= ~ssl.OP_NO_TICKET
+        ssl_context.num_tickets = config.TLS_SESSION_TICKETS
+    else:
+        ssl_context.options |= ssl.OP_NO_TICKET
+        ssl_context.num_tickets = 0
+    return ssl_context
+
+def serve_https(app, host, port):
+    """Serve a Flask app over TLS with persistent connections"""
+    ssl_context = create_ssl_context()
+    try:
+        from cheroot import wsgi
+        from cheroot.ssl.builtin import BuiltinSSLAdapter
+    except ImportError:
+        # Werkzeug's development server closes the connection after every response
+        print("cheroot not installed - falling back to the development server (no keep-alive)")
+        app.run(host=host, port=port, ssl_context=ssl_context, debug=True, threaded=True)
+        return
+
+    http_server = wsgi.Server((host, port), app, numthreads=config.SERVER_THREADS,
+                              timeout=config.KEEP_ALIVE_TIMEOUT)
+    http_server.ssl_adapter = BuiltinSSLAdapter(config.SSL_CERT_FILE, config.SSL_KEY_FILE)
+    http_server.ssl_adapter.context = ssl_context
+    try:
+        http_server.start()
+    except KeyboardInterrupt:
+        http_server.stop()
@@ -0,0 +1,68 @@
+"""
+Idempotency-Key support for POST /api/bookings.
+
+A successful booking response is stored in the same transaction as the
+booking itself, keyed by the user and a 16-byte digest of the client's key.
+Retrying the request with the same key replays the stored response instead
+of reserving the seats a second time. A digest of the request body is
+stored too, so reusing a key for a different request is refused rather
+than answered with another booking's response.
+"""
+
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from itertools import count
+
+from models import db, IdempotencyKey
+
+_stores = count(1)
+
+def key_digest(key):
+    """Compact fixed-size digest of a client supplied key"""
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+def request_digest(data):
+    """Digest of a JSON request body that ignores key order and whitespace"""
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).digest()
+
+def _cutoff(ttl_hours):
+    # SQLite returns naive datetimes, so compare against naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=ttl_hours)
+
+def lookup(user_id, key, request_hash, ttl_hours):
+    """Return (status_code, body) stored for this key, or None.
+
+    Raises ValueError if the key was used for a request with another body.
+    """
+    row = db.session.execute(
+        db.select(IdempotencyKey.status_code, IdempotencyKey.response_body, IdempotencyKey.request_hash,
+                  IdempotencyKey.created_at)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key_hash == key_digest(key))
+    ).first()
+    if row is None or row.created_at < _cutoff(ttl_hours):
+        return None
+    # Keys stored before request digests were kept have none to compare
+    if row.request_hash is not None and row.request_hash != request_hash:
+        raise ValueError('Idempotency-Key was already used for a different request')
+    return row.status_code, row.response_body
+
+def remember(user_id, key, request_hash, status_code, body, ttl_hours):
+    """Stage the response for this key in the current transaction"""
+    digest = key_digest(key)
+    # An expired entry for the same key would otherwise collide with the new one
+    db.session.execute(
+        db.delete(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key_hash == digest,
+               IdempotencyKey.created_at < _cutoff(ttl_hours))
+    )
+    db.session.add(IdempotencyKey(user_id=user_id, key_hash=digest, request_hash=request_hash,
+                                  status_code=status_code, response_body=body))
+
+def purge_expired(ttl_hours, interval):
+    """Delete expired keys once every interval stored responses"""
+    if next(_stores) % interval:
+        return
+    db.session.execute(db.delete(IdempotencyKey).where(IdempotencyKey.created_at < _cutoff(ttl_hours)))
+    db.session.commit()
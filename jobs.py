@@ -0,0 +1,188 @@
+"""
+Durable background jobs fed by a transactional outbox.
+
+Request handlers call ``publish`` to stage an ``OutboxMessage`` in the same
+transaction as the booking change, so a message exists if and only if the
+change committed. Workers (see worker.py) relay outbox messages into one
+``Job`` per handler, run them, retry failures with exponential backoff and
+move jobs that keep failing to ``DeadLetterJob``.
+"""
+
+import os
+import random
+import smtplib
+import traceback
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+
+import config
+from money import format_money
+from models import db, User, Event, Booking, OutboxMessage, Job, DeadLetterJob
+from serialization import dumps, loads
+
+def _now():
+    # SQLite returns naive datetimes, so compare against naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def publish(topic, payload):
+    """Stage a message in the current transaction"""
+    publish_many(topic, [payload])
+
+def publish_many(topic, payloads):
+    """Stage several messages of one topic in the current transaction"""
+    if payloads:
+        db.session.execute(db.insert(OutboxMessage), [
+            {'topic': topic, 'payload': dumps(payload).decode('utf-8')} for payload in payloads
+        ])
+
+# Handlers
+
+def _booking_details(booking_id):
+    return db.session.execute(
+        db.select(Booking.id, Booking.quantity, Booking.total_cents, Booking.status,
+                  Booking.booking_date, Event.name, Event.venue, Event.event_date,
+                  User.username, User.email)
+        .join(Event, Booking.event_id == Event.id)
+        .join(User, Booking.user_id == User.id)
+        .where(Booking.id == booking_id)
+    ).first()
+
+def _send_email(to, subject, body):
+    if not config.SMTP_HOST:
+        return
+    message = EmailMessage()
+    message['From'] = config.SMTP_SENDER
+    message['To'] = to
+    message['Subject'] = subject
+    message.set_content(body)
+    with smtplib.SMTP(config.SMTP_HOST, config.SMTP_PORT, timeout=30) as smtp:
+        smtp.send_message(message)
+
+def write_receipt(payload):
+    """Write a plain-text receipt for a booking or cancellation"""
+    booking = _booking_details(payload['booking_id'])
+    if booking is None:
+        return
+    os.makedirs(config.RECEIPTS_DIR, exist_ok=True)
+    action = payload.get('action', booking.status)
+    path = os.path.join(config.RECEIPTS_DIR, f"booking-{booking.id}-{action}.txt")
+    with open(path, 'w', encoding='utf-8') as receipt:
+        receipt.write(
+            f"Booking #{booking.id} ({action})\n"
+            f"Customer: {booking.username} <{booking.email}>\n"
+            f"Event: {booking.name} at {booking.venue}, {booking.event_date.isoformat()}\n"
+            f"Tickets: {booking.quantity}\n"
+            f"Total: {format_money(booking.total_cents)}\n"
+            f"Booked: {booking.booking_date.isoformat()}\n"
+        )
+
+def send_confirmation(payload):
+    """Email the customer that their booking was confirmed"""
+    booking = _booking_details(payload['booking_id'])
+    if booking is None:
+        return
+    _send_email(booking.email, f"Booking #{booking.id} confirmed",
+                f"Hi {booking.username},\n\nYour {booking.quantity} ticket(s) for {booking.name} "
+                f"at {booking.venue} are confirmed. Total: {format_money(booking.total_cents)}\n")
+
+def send_cancellation(payload):
+    """Email the customer that their booking was cancelled and refunded"""
+    booking = _booking_details(payload['booking_id'])
+    if booking is None:
+        return
+    _send_email(booking.email, f"Booking #{booking.id} cancelled",
+                f"Hi {booking.username},\n\nYour booking for {booking.name} was cancelled. "
+                f"Refund: {format_money(booking.total_cents)}\n")
+
+HANDLERS = {
+    'write_receipt': write_receipt,
+    'send_confirmation': send_confirmation,
+    'send_cancellation': send_cancellation,
+}
+
+# Outbox topic -> handlers that each get their own job
+SUBSCRIPTIONS = {
+    'booking.created': ('send_confirmation', 'write_receipt'),
+    'booking.cancelled': ('send_cancellation', 'write_receipt'),
+}
+
+# Queue operations
+
+def relay_outbox(batch_size=100):
+    """Move up to batch_size outbox messages into the job queue. Returns the count moved."""
+    messages = db.session.execute(
+        db.delete(OutboxMessage)
+        .where(OutboxMessage.id.in_(
+            db.select(OutboxMessage.id).order_by(OutboxMessage.id).limit(batch_size)
+        ))
+        .returning(OutboxMessage.topic, OutboxMessage.payload)
+    ).all()
+    now = _now()
+    jobs = [{'handler': handler, 'payload': message.payload, 'run_at': now}
+            for message in messages for handler in SUBSCRIPTIONS.get(message.topic, ())]
+    if jobs:
+        db.session.execute(db.insert(Job), jobs)
+    db.session.commit()
+    return len(messages)
+
+def requeue_abandoned():
+    """Return running jobs whose worker died to the queue"""
+    cutoff = _now() - timedelta(seconds=config.JOB_LEASE_SECONDS)
+    count = db.session.execute(
+        db.update(Job).where(Job.status == 'running', Job.locked_at < cutoff)
+        .values(status='queued', run_at=_now())
+    ).rowcount
+    db.session.commit()
+    return count
+
+def claim():
+    """Atomically take the next due job, or return None"""
+    now = _now()
+    job = db.session.execute(
+        db.update(Job)
+        .where(Job.id == db.select(Job.id)
+               .where(Job.status == 'queued', Job.run_at <= now)
+               .order_by(Job.run_at, Job.id).limit(1).scalar_subquery(),
+               Job.status == 'queued')
+        .values(status='running', attempts=Job.attempts + 1, locked_at=now)
+        .returning(Job.id, Job.handler, Job.payload, Job.attempts)
+    ).first()
+    db.session.commit()
+    return job
+
+def retry_delay(attempts):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, config.JOB_BACKOFF_SECONDS * 2 ** (attempts - 1))
+
+def run(job):
+    """Run a claimed job, then delete it, reschedule it or dead-letter it"""
+    try:
+        HANDLERS[job.handler](loads(job.payload))
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc()
+        if job.attempts >= config.JOB_MAX_ATTEMPTS:
+            db.session.add(DeadLetterJob(job_id=job.id, handler=job.handler, payload=job.payload,
+                                         attempts=job.attempts, last_error=error))
+            db.session.execute(db.delete(Job).where(Job.id == job.id))
+        else:
+            db.session.execute(
+                db.update(Job).where(Job.id == job.id)
+                .values(status='queued', last_error=error,
+                        run_at=_now() + timedelta(seconds=retry_delay(job.attempts)))
+            )
+        db.session.commit()
+        return False
+    db.session.execute(db.delete(Job).where(Job.id == job.id))
+    db.session.commit()
+    return True
+
+def requeue_dead_letters():
+    """Give every dead-lettered job a fresh set of attempts"""
+    dead = db.session.execute(db.select(DeadLetterJob)).scalars().all()
+    now = _now()
+    for job in dead:
+        db.session.add(Job(handler=job.handler, payload=job.payload, run_at=now))
+        db.session.delete(job)
+    db.session.commit()
+    return len(dead)
@@ -0,0 +1,158 @@
+"""
+Append-only booking ledger with per-event snapshots.
+
+Every booking state change is appended to ``LedgerEntry`` in the same
+transaction as the change itself. Every ``interval`` entries for an event a
+snapshot of its availability and revenue is written, so rebuilding state
+after a crash only replays the entries after the latest snapshot, and
+compaction can drop everything a snapshot already covers.
+
+Entry kinds and their effect on an event:
+
+- ``reserve``: seats leave availability
+- ``confirm``: the booking amount counts as revenue
+- ``cancel``: seats return to availability and the amount is refunded
+- ``resize``: the event's capacity changed by ``quantity`` seats (negative to shrink)
+"""
+
+from collections import defaultdict
+from threading import Lock
+
+from models import db, Event, LedgerEntry, EventSnapshot
+
+RESERVE = 'reserve'
+CONFIRM = 'confirm'
+CANCEL = 'cancel'
+RESIZE = 'resize'
+
+_appended = defaultdict(int)
+_appended_lock = Lock()
+
+def entry(kind, event_id, booking_id=None, user_id=None, quantity=0, amount_cents=0):
+    """Row dict for a ledger entry, for use with append()"""
+    return {'kind': kind, 'event_id': event_id, 'booking_id': booking_id,
+            'user_id': user_id, 'quantity': quantity, 'amount_cents': amount_cents}
+
+def append(entries):
+    """Stage ledger entries in the current transaction"""
+    if entries:
+        db.session.execute(db.insert(LedgerEntry), entries)
+
+def book(booking):
+    """Stage reserve and confirm entries for a newly confirmed booking"""
+    append([
+        entry(RESERVE, booking.event_id, booking.id, booking.user_id, booking.quantity),
+        entry(CONFIRM, booking.event_id, booking.id, booking.user_id, amount_cents=booking.total_cents),
+    ])
+
+def apply(state, kind, quantity, amount_cents):
+    """Fold one ledger entry into an (available_tickets, revenue_cents) pair"""
+    available, revenue = state
+    if kind == RESERVE:
+        available -= quantity
+    elif kind == CONFIRM:
+        revenue += amount_cents
+    elif kind == CANCEL:
+        available += quantity
+        revenue -= amount_cents
+    elif kind == RESIZE:
+        available += quantity
+    return available, revenue
+
+def rebuild(event_id):
+    """Replay the ledger tail after the latest snapshot.
+
+    Returns (available_tickets, revenue_cents, last_ledger_id) or None if the event
+    does not exist.
+    """
+    snapshot = db.session.get(EventSnapshot, event_id)
+    if snapshot is not None:
+        state = (snapshot.available_tickets, snapshot.revenue_cents)
+        last_id = snapshot.ledger_id
+    else:
+        total = db.session.execute(
+            db.select(Event.total_tickets).where(Event.id == event_id)
+        ).scalar()
+        if total is None:
+            return None
+        # Start from the capacity the event was created with; resizes are replayed below
+        resized = db.session.execute(
+            db.select(db.func.coalesce(db.func.sum(LedgerEntry.quantity), 0))
+            .where(LedgerEntry.event_id == event_id, LedgerEntry.kind == RESIZE)
+        ).scalar()
+        state = (total - resized, 0)
+        last_id = 0
+
+    tail = db.session.execute(
+        db.select(LedgerEntry.id, LedgerEntry.kind, LedgerEntry.quantity, LedgerEntry.amount_cents)
+        .where(LedgerEntry.event_id == event_id, LedgerEntry.id > last_id)
+        .order_by(LedgerEntry.id)
+    )
+    for row in tail:
+        state = apply(state, row.kind, row.quantity, row.amount_cents)
+        last_id = row.id
+    return state[0], state[1], last_id
+
+def snapshot(event_id):
+    """Write a fresh snapshot for event_id in the current transaction"""
+    state = rebuild(event_id)
+    if state is None:
+        return None
+    available, revenue, last_id = state
+    current = db.session.get(EventSnapshot, event_id)
+    if current is None:
+        current = EventSnapshot(event_id=event_id)
+        db.session.add(current)
+    current.ledger_id = last_id
+    current.available_tickets = available
+    current.revenue_cents = revenue
+    return current
+
+def committed(event_id, count, interval):
+    """Note count entries committed for event_id; snapshot every interval entries"""
+    with _appended_lock:
+        _appended[event_id] += count
+        due = _appended[event_id] >= interval
+        if due:
+            _appended[event_id] = 0
+    if due:
+        snapshot(event_id)
+        db.session.commit()
+
+def recover():
+    """Rebuild every event's available_tickets from snapshots and the ledger tail"""
+    repaired = 0
+    for event_id, available in db.session.execute(db.select(Event.id, Event.available_tickets)).all():
+        state = rebuild(event_id)
+        if state[0] != available:
+            db.session.execute(
+                db.update(Event).where(Event.id == event_id).values(available_tickets=state[0])
+            )
+            repaired += 1
+    db.session.commit()
+    return repaired
+
+def compact():
+    """Snapshot every event and delete the ledger entries the snapshots cover"""
+    deleted = 0
+    for event_id in db.session.execute(db.select(Event.id)).scalars().all():
+        current = snapshot(event_id)
+        db.session.flush()
+        deleted += db.session.execute(
+            db.delete(LedgerEntry)
+            .where(LedgerEntry.event_id == event_id, LedgerEntry.id <= current.ledger_id)
+        ).rowcount
+        db.session.commit()
+    return deleted
+
+def seed_from_bookings(connection):
+    """Schema migration: record existing confirmed bookings in the ledger"""
+    # Databases older than the move to integer cents still hold the float column here
+    columns = {row[1] for row in connection.execute(db.text('PRAGMA table_info(booking)'))}
+    total = 'total_cents' if 'total_cents' in columns else 'CAST(ROUND(total_amount * 100) AS INTEGER)'
+    for kind, quantity, amount in ((RESERVE, 'quantity', '0'), (CONFIRM, '0', total)):
+        connection.execute(db.text(
+            'INSERT INTO ledger_entry (event_id, booking_id, user_id, kind, quantity, amount_cents, created_at) '
+            f"SELECT event_id, id, user_id, '{kind}', {quantity}, {amount}, booking_date "
+            "FROM booking WHERE status = 'confirmed' ORDER BY id"
+        ))
@@ -0,0 +1,117 @@
+"""
+Structured JSON access and audit logs.
+
+Request threads only build a dict and put the record on an in-memory
+queue. A ``QueueListener`` thread encodes it as one JSON line and writes
+it to a ``RotatingFileHandler``, so JSON encoding and file I/O never run
+on a request. Nothing is logged until ``configure`` is called, which the
+servers do when they start serving.
+
+* ``access.log``: one record per request. Successful GET and HEAD
+  requests (the high-volume read routes) are sampled at
+  ``ACCESS_LOG_SAMPLE_RATE`` and carry the rate, so counts can be scaled
+  back up. Writes and errors are always logged.
+* ``audit.log``: logins, bookings, cancellations and session changes,
+  all of them.
+"""
+
+import atexit
+import logging
+import os
+import random
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import SimpleQueue
+
+from flask import g, request
+
+import config
+from serialization import dumps
+
+access_logger = logging.getLogger('ticket.access')
+audit_logger = logging.getLogger('ticket.audit')
+
+_listener = None
+
+class _EnqueueHandler(QueueHandler):
+    """Queue records as they are; the listener thread formats them"""
+
+    def prepare(self, record):
+        return record
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, log name and the record's fields"""
+
+    def format(self, record):
+        fields = {'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+                  'log': record.name.rsplit('.', 1)[-1]}
+        fields.update(record.msg)
+        return dumps(fields).decode('utf-8')
+
+def configure(directory, prefix='', max_bytes=config.LOG_MAX_BYTES, backup_count=config.LOG_BACKUP_COUNT):
+    """Start writing <prefix>access.log and <prefix>audit.log under directory.
+
+    Processes sharing a directory need distinct prefixes, since file
+    rotation is not coordinated between processes.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    os.makedirs(directory, exist_ok=True)
+    queue = SimpleQueue()
+    handlers = []
+    for logger, filename in ((access_logger, config.ACCESS_LOG_FILE), (audit_logger, config.AUDIT_LOG_FILE)):
+        file_handler = RotatingFileHandler(os.path.join(directory, prefix + filename), maxBytes=max_bytes,
+                                           backupCount=backup_count, encoding='utf-8')
+        file_handler.setFormatter(JSONFormatter())
+        file_handler.addFilter(lambda record, name=logger.name: record.name == name)
+        handlers.append(file_handler)
+        logger.addHandler(_EnqueueHandler(queue))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    _listener = QueueListener(queue, *handlers)
+    _listener.start()
+    atexit.register(shutdown)
+
+def shutdown():
+    """Write what is still queued and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def _log(logger, fields):
+    # makeRecord + handle skips Logger.findCaller's stack walk; call sites are not logged
+    logger.handle(logger.makeRecord(logger.name, logging.INFO, '', 0, fields, None, None))
+
+def audit(action, **fields):
+    """Record a login, booking, cancellation or session change"""
+    if audit_logger.isEnabledFor(logging.INFO):
+        fields['action'] = action
+        _log(audit_logger, fields)
+
+def access(method, path, status, seconds, ip, user_id, size, read_sample_rate):
+    """Record a finished request, sampling successful reads"""
+    if not access_logger.isEnabledFor(logging.INFO):
+        return
+    sample_rate = read_sample_rate if method in ('GET', 'HEAD') and status < 400 else 1.0
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        return
+    _log(access_logger, {'method': method, 'path': path, 'status': status,
+                         'ms': round(seconds * 1000, 2), 'ip': ip, 'user_id': user_id,
+                         'bytes': size, 'sample_rate': sample_rate})
+
+def install_access_log(app, read_sample_rate=config.ACCESS_LOG_SAMPLE_RATE):
+    """Log every request of a Flask app to the access log"""
+    @app.before_request
+    def start_access_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_access(response):
+        started = g.get('request_started')
+        if started is not None:
+            access(request.method, request.path, response.status_code, time.perf_counter() - started,
+                   request.remote_addr, g.get('user_id'), response.content_length, read_sample_rate)
+        return response
@@ -1,12 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask import request
 from datetime import datetime, timezone
 import bcrypt
-import jwt
-from functools import wraps
+from money import from_cents
 
 db = SQLAlchemy()
 
+# Bind holding archived events and bookings (see archive.py)
+ARCHIVE_BIND = 'archive'
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -14,13 +15,19 @@ class User(db.Model):
     password_hash = db.Column(db.String(128), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    token_epoch = db.Column(db.Integer, nullable=False, default=0)  # Bumped to revoke every issued token
     
     # Relationships
     bookings = db.relationship('Booking', backref='user', lazy=True)
     
+    @staticmethod
+    def hash_password(password):
+        """bcrypt hash of a password (slow on purpose)"""
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    
     def set_password(self, password):
         """Hash and set password"""
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = self.hash_password(password)
     
     def check_password(self, password):
         """Check password against hash"""
@@ -43,9 +50,10 @@ class Event(db.Model):
     event_date = db.Column(db.DateTime, nullable=False)
     total_tickets = db.Column(db.Integer, nullable=False)
     available_tickets = db.Column(db.Integer, nullable=False)
-    price_per_ticket = db.Column(db.Float, nullable=False)
+    price_cents = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1)  # Bumped by every edit; the ETag
     
     # Relationships
     bookings = db.relationship('Booking', backref='event', lazy=True)
@@ -59,7 +67,7 @@ class Event(db.Model):
             'event_date': self.event_date.isoformat(),
             'total_tickets': self.total_tickets,
             'available_tickets': self.available_tickets,
-            'price_per_ticket': self.price_per_ticket,
+            'price_per_ticket': from_cents(self.price_cents),
             'created_at': self.created_at.isoformat(),
             'created_by': self.created_by
         }
@@ -77,9 +85,10 @@ class Booking(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
-    total_amount = db.Column(db.Float, nullable=False)
+    total_cents = db.Column(db.Integer, nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, confirmed, cancelled
     booking_date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    applied_tier = db.Column(db.String(50))  # PriceTier name the booking was priced at, if any
     
     def to_dict(self):
         return {
@@ -87,11 +96,148 @@ class Booking(db.Model):
             'user_id': self.user_id,
             'event_id': self.event_id,
             'quantity': self.quantity,
-            'total_amount': self.total_amount,
+            'total_amount': from_cents(self.total_cents),
             'status': self.status,
             'booking_date': self.booking_date.isoformat(),
+            'applied_tier': self.applied_tier,
             'event': self.event.to_dict() if self.event else None,
             'user': self.user.to_dict() if self.user else None
         }
 
+class RefreshToken(db.Model):
+    """Server-side refresh token; single use, replaced by a new one on every refresh"""
+    token_hash = db.Column(db.LargeBinary(32), primary_key=True)  # SHA-256 of the token
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    used_at = db.Column(db.DateTime)  # Set when rotated; presenting it again revokes the user's sessions
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+class UserEventQuota(db.Model):
+    """Tickets a user holds on an event, kept in step with their confirmed bookings (see quotas.py)"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+
+class IdempotencyKey(db.Model):
+    """Stored response of a POST /api/bookings call, replayed for retried requests"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    key_hash = db.Column(db.LargeBinary(16), primary_key=True)  # blake2b digest of the client key
+    request_hash = db.Column(db.LargeBinary(16))  # blake2b digest of the request body
+    status_code = db.Column(db.Integer, nullable=False)
+    response_body = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+
+class LedgerEntry(db.Model):
+    """Append-only record of booking state changes (reserve, confirm, cancel)"""
+    # AUTOINCREMENT keeps ids increasing after compaction deletes the newest rows
+    __table_args__ = (db.Index('ix_ledger_entry_event_id_id', 'event_id', 'id'),
+                      {'sqlite_autoincrement': True})
+    
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    booking_id = db.Column(db.Integer)
+    user_id = db.Column(db.Integer)
+    kind = db.Column(db.String(10), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    amount_cents = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+class EventSnapshot(db.Model):
+    """Availability and revenue of an event as of a ledger position"""
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), primary_key=True)
+    ledger_id = db.Column(db.Integer, nullable=False)  # Last ledger entry folded into this snapshot
+    available_tickets = db.Column(db.Integer, nullable=False)
+    revenue_cents = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+class OutboxMessage(db.Model):
+    """Event written in the same transaction as a booking change, relayed to the job queue"""
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+class Job(db.Model):
+    """Unit of background work processed by worker.py"""
+    __table_args__ = (db.Index('ix_job_status_run_at', 'status', 'run_at'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    handler = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    status = db.Column(db.String(10), nullable=False, default='queued')  # queued, running
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+class DeadLetterJob(db.Model):
+    """Job that exhausted its retries"""
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, nullable=False)
+    handler = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False)
+    last_error = db.Column(db.Text)
+    failed_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+class Ticket(db.Model):
+    """One admission (seat) of a booking; its signed code is derived from the id"""
+    __table_args__ = (db.Index('ix_ticket_event_id_status', 'event_id', 'status'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=False, index=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='valid')  # valid, used, void
+    used_at = db.Column(db.DateTime)
+
+class PriceTier(db.Model):
+    """A price step of an event: from min_sold tickets sold, or until ends_at (early bird)"""
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False, index=True)
+    name = db.Column(db.String(50), nullable=False)
+    price_cents = db.Column(db.Integer, nullable=False)
+    min_sold = db.Column(db.Integer)
+    ends_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'price': from_cents(self.price_cents),
+            'min_sold': self.min_sold,
+            'ends_at': self.ends_at.isoformat() if self.ends_at else None
+        }
+
+class ArchivedEvent(db.Model):
+    """A past event moved out of the live tables by archive.py"""
+    __bind_key__ = ARCHIVE_BIND
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    venue = db.Column(db.String(200), nullable=False)
+    event_date = db.Column(db.DateTime, nullable=False)
+    total_tickets = db.Column(db.Integer, nullable=False)
+    available_tickets = db.Column(db.Integer, nullable=False)
+    price_cents = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime)
+    created_by = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+class ArchivedBooking(db.Model):
+    """A booking of an archived event"""
+    __bind_key__ = ARCHIVE_BIND
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    event_id = db.Column(db.Integer, nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    total_cents = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20))
+    booking_date = db.Column(db.DateTime)
+    applied_tier = db.Column(db.String(50))
+    archived_at = db.Column(db.DateTime, nullable=False)
+
 # JWT token decorator will be defined in server.py
@@ -0,0 +1,32 @@
+"""
+Money handling.
+
+Amounts are stored, multiplied and summed as integer cents so totals are
+exact; decimal values only appear at the API edge. ``from_cents`` returns a
+float because the shortest representation of ``n / 100`` is exactly the
+decimal amount, so JSON output such as ``19.99`` is unaffected.
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+def to_cents(value):
+    """Integer cents for a non-negative amount given as a number or decimal string"""
+    if isinstance(value, bool):
+        raise ValueError(f'Invalid amount: {value!r}')
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount: {value!r}')
+    if not amount.is_finite() or amount < 0:
+        raise ValueError(f'Invalid amount: {value!r}')
+    return int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_cents(cents):
+    """API value (a JSON number) for an amount in cents"""
+    return cents / 100
+
+def format_money(cents):
+    """'$12.34' for an amount in cents"""
+    sign = '-' if cents < 0 else ''
+    cents = abs(cents)
+    return f'{sign}${cents // 100}.{cents % 100:02d}'
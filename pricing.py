@@ -0,0 +1,127 @@
+"""
+Tiered and demand-based ticket pricing.
+
+An event's ``PriceTier`` rows are turned into a ``PriceTable`` once and
+kept in memory, so pricing a booking costs two binary searches and no
+queries. Two kinds of tier are supported:
+
+* early-bird windows (``ends_at``): the window with the earliest end still
+  in the future applies, so windows form a staircase of rising prices;
+* demand steps (``min_sold``): the step with the highest threshold not
+  above the number of tickets already sold applies.
+
+An open early-bird window takes precedence over demand steps; with neither
+the event's ``price_per_ticket`` is charged. A booking is priced as a whole
+at the tier in force when it starts.
+"""
+
+from bisect import bisect_right
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from threading import Lock
+
+from models import db, PriceTier
+from money import to_cents
+
+Quote = namedtuple('Quote', ('price_cents', 'tier'))
+
+class PriceTable:
+    """Precomputed tier lookups for one event"""
+
+    def __init__(self, tiers):
+        early = sorted((t.ends_at, t.price_cents, t.name) for t in tiers if t.ends_at is not None)
+        demand = sorted((t.min_sold, t.price_cents, t.name) for t in tiers if t.min_sold is not None)
+        self._early_ends = [ends_at for ends_at, _, _ in early]
+        self._early = [Quote(price, name) for _, price, name in early]
+        self._demand_thresholds = [min_sold for min_sold, _, _ in demand]
+        self._demand = [Quote(price, name) for _, price, name in demand]
+
+    def quote(self, base_price_cents, sold, now):
+        """Unit price in cents and tier name for a booking made at now with sold tickets already gone"""
+        index = bisect_right(self._early_ends, now)
+        if index < len(self._early):
+            return self._early[index]
+        index = bisect_right(self._demand_thresholds, sold) - 1
+        if index >= 0:
+            return self._demand[index]
+        return Quote(base_price_cents, None)
+
+def parse_tiers(items, total_tickets):
+    """Validate a list of tier dicts from a request; returns PriceTier kwargs or raises ValueError"""
+    if not isinstance(items, list):
+        raise ValueError('tiers must be a list')
+    tiers = []
+    names = set()
+    for item in items:
+        if not isinstance(item, dict) or not item.get('name') or 'price' not in item:
+            raise ValueError('Each tier needs a name and a price')
+        name = str(item['name'])[:50]
+        if name in names:
+            raise ValueError(f'Duplicate tier name: {name}')
+        names.add(name)
+        try:
+            price_cents = to_cents(item['price'])
+        except ValueError:
+            raise ValueError(f'Invalid price for tier {name}')
+
+        min_sold = item.get('min_sold')
+        ends_at = item.get('ends_at')
+        if (min_sold is None) == (ends_at is None):
+            raise ValueError(f'Tier {name} needs exactly one of min_sold or ends_at')
+        if min_sold is not None:
+            try:
+                min_sold = int(min_sold)
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid min_sold for tier {name}')
+            if not 0 <= min_sold < total_tickets:
+                raise ValueError(f'min_sold for tier {name} must be between 0 and {total_tickets - 1}')
+        else:
+            try:
+                ends_at = datetime.fromisoformat(ends_at)
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid ends_at for tier {name}')
+            if ends_at.tzinfo is not None:
+                # Event dates are naive server-local times; compare like with like
+                ends_at = ends_at.astimezone().replace(tzinfo=None)
+        tiers.append({'name': name, 'price_cents': price_cents, 'min_sold': min_sold, 'ends_at': ends_at})
+    return tiers
+
+class PricingEngine:
+    """Bounded LRU of PriceTables keyed by event id"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._tables = OrderedDict()
+        self._lock = Lock()
+
+    def table(self, event_id):
+        """PriceTable for event_id, loading its tiers on first use"""
+        with self._lock:
+            table = self._tables.get(event_id)
+            if table is not None:
+                self._tables.move_to_end(event_id)
+                return table
+
+        table = PriceTable(db.session.execute(
+            db.select(PriceTier).where(PriceTier.event_id == event_id)
+        ).scalars().all())
+
+        with self._lock:
+            self._tables[event_id] = table
+            self._tables.move_to_end(event_id)
+            while len(self._tables) > self.max_entries:
+                self._tables.popitem(last=False)
+        return table
+
+    def quote(self, event, sold, now=None):
+        """Quote for a booking on event (an EventMeta) with sold tickets already gone"""
+        return self.table(event.id).quote(event.price_cents, sold, now or datetime.now())
+
+    def invalidate(self, event_id):
+        """Drop the table for event_id after its tiers change"""
+        with self._lock:
+            self._tables.pop(event_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
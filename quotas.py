@@ -0,0 +1,60 @@
+"""
+Per-user purchase limits.
+
+``UserEventQuota`` holds the number of confirmed tickets each user has on
+each event. It is changed in the same transaction as every booking and
+cancellation, so enforcing ``MAX_TICKETS_PER_USER_PER_EVENT`` is a single
+upsert on the (user_id, event_id) primary key instead of summing the
+user's bookings. The upsert only applies while the new total stays within
+the limit, so concurrent bookings by one user cannot overshoot it.
+"""
+
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, UserEventQuota
+
+def reserve(user_id, event_id, quantity, limit):
+    """Count quantity more tickets against the user's limit on the event.
+
+    Returns the user's new total, or None (changing nothing) if it would
+    exceed limit. With limit None the tickets are only counted, so the
+    counter is right if a limit is set later. Callers reject
+    quantity > limit before calling.
+    """
+    statement = insert(UserEventQuota).values(user_id=user_id, event_id=event_id, quantity=quantity)
+    total = UserEventQuota.quantity + statement.excluded.quantity
+    return db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[UserEventQuota.user_id, UserEventQuota.event_id],
+            set_={'quantity': total},
+            where=total <= limit if limit is not None else None
+        ).returning(UserEventQuota.quantity)
+    ).scalar()
+
+def held(user_id, event_id):
+    """Tickets the user currently holds on the event"""
+    return db.session.execute(
+        db.select(UserEventQuota.quantity)
+        .where(UserEventQuota.user_id == user_id, UserEventQuota.event_id == event_id)
+    ).scalar() or 0
+
+def release(event_id, quantities):
+    """Give back cancelled tickets; quantities maps user_id -> tickets released"""
+    if not quantities:
+        return
+    db.session.execute(
+        db.update(UserEventQuota.__table__)
+        .where(UserEventQuota.user_id == db.bindparam('released_user_id'),
+               UserEventQuota.event_id == event_id)
+        .values(quantity=UserEventQuota.quantity - db.bindparam('released'))
+        .execution_options(synchronize_session=False),
+        [{'released_user_id': user_id, 'released': quantity} for user_id, quantity in quantities.items()]
+    )
+
+def seed_from_bookings(connection):
+    """Schema migration: count the tickets of existing confirmed bookings"""
+    connection.execute(db.text(
+        'INSERT OR REPLACE INTO user_event_quota (user_id, event_id, quantity) '
+        'SELECT user_id, event_id, SUM(quantity) FROM booking '
+        "WHERE status = 'confirmed' GROUP BY user_id, event_id"
+    ))
@@ -0,0 +1,54 @@
+"""
+In-memory token-bucket rate limiting.
+
+Each (route, client) pair owns a bucket of ``burst`` tokens refilled at
+``rate`` tokens per second. A check is O(1); the least recently used
+buckets are evicted once ``max_buckets`` is reached, which only ever makes
+the limiter more lenient for idle clients.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from threading import Lock
+
+class TokenBucketLimiter:
+    """Bounded store of token buckets keyed by arbitrary hashable keys"""
+
+    def __init__(self, max_buckets=100000, clock=time.monotonic):
+        self.max_buckets = max_buckets
+        self.clock = clock
+        self._buckets = OrderedDict()  # key -> [tokens, last_refill]
+        self._lock = Lock()
+
+    def consume(self, key, rate, burst, cost=1):
+        """Take cost tokens from the bucket for key.
+
+        Returns 0 if the request is allowed, otherwise the number of seconds
+        until enough tokens are available.
+        """
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [burst, now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0
+            return (cost - bucket[0]) / rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+def retry_after_header(wait):
+    """Format a wait time for the Retry-After header (whole seconds, at least 1)"""
+    return str(max(1, math.ceil(wait)))
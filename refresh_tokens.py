@@ -0,0 +1,77 @@
+"""
+Server-side refresh tokens with rotation.
+
+Login hands out a random refresh token next to the short-lived access
+token; only its SHA-256 digest is stored. ``POST /api/token/refresh``
+consumes it and issues a new pair, so every refresh token works once.
+Presenting a consumed token again means it was copied, and the caller
+revokes all of the user's sessions.
+"""
+
+import hashlib
+import secrets
+from datetime import datetime, timedelta, timezone
+from itertools import count
+
+from models import db, User, RefreshToken
+
+_issued = count(1)
+
+def token_digest(token):
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+def _now():
+    # SQLite returns naive datetimes, so compare against naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def new_token(user_id, days):
+    """(token, RefreshToken row values) for a new refresh token"""
+    token = secrets.token_urlsafe(32)
+    return token, {'token_hash': token_digest(token), 'user_id': user_id,
+                   'expires_at': _now() + timedelta(days=days)}
+
+def issue(user_id, days):
+    """Stage a new refresh token for the user in the current transaction; returns the token"""
+    token, values = new_token(user_id, days)
+    db.session.execute(db.insert(RefreshToken).values(**values))
+    return token
+
+def consume(token):
+    """Mark an unused, unexpired token as used; returns its user id or None"""
+    return db.session.execute(
+        db.update(RefreshToken)
+        .where(RefreshToken.token_hash == token_digest(token), RefreshToken.used_at.is_(None),
+               RefreshToken.expires_at > _now())
+        .values(used_at=_now())
+        .returning(RefreshToken.user_id)
+    ).scalar()
+
+def reused_by(token):
+    """User id of a token that was already consumed, else None"""
+    return db.session.execute(
+        db.select(RefreshToken.user_id)
+        .where(RefreshToken.token_hash == token_digest(token), RefreshToken.used_at.is_not(None))
+    ).scalar()
+
+def discard(user_id, token):
+    """Delete one of the user's refresh tokens (logout on one device)"""
+    db.session.execute(
+        db.delete(RefreshToken)
+        .where(RefreshToken.token_hash == token_digest(token), RefreshToken.user_id == user_id)
+    )
+
+def revoke_all(user_id):
+    """Delete the user's refresh tokens and bump their token epoch; returns the new epoch"""
+    db.session.execute(db.delete(RefreshToken).where(RefreshToken.user_id == user_id))
+    return db.session.execute(
+        db.update(User).where(User.id == user_id)
+        .values(token_epoch=User.token_epoch + 1)
+        .returning(User.token_epoch)
+    ).scalar()
+
+def purge_expired(interval):
+    """Delete expired tokens once every interval issued tokens"""
+    if next(_issued) % interval:
+        return
+    db.session.execute(db.delete(RefreshToken).where(RefreshToken.expires_at <= _now()))
+    db.session.commit()
@@ -0,0 +1,104 @@
+"""
+Read replica routing.
+
+Read-only routes run their queries against the ``replica`` bind when it is
+fresh enough, falling back to the primary otherwise. For SQLite the replica
+is a copy of the primary file refreshed periodically with the backup API;
+any other replica database (e.g. a Postgres standby) is assumed to be kept
+current by its own replication.
+
+A user who has just written (booked or cancelled) reads from the primary
+until the replica has been refreshed past that write, so they always see
+their own changes.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from models import db
+
+REPLICA_BIND = 'replica'
+
+class ReplicaRouter:
+    """Chooses between the primary and the replica for read queries"""
+
+    def __init__(self, max_staleness, refresh_interval, max_tracked_users=100000):
+        self.max_staleness = max_staleness
+        self.refresh_interval = refresh_interval
+        self.max_tracked_users = max_tracked_users
+        self.synced_at = None  # wall time the data in the replica is as fresh as
+        self._last_write = OrderedDict()  # user_id -> time of their last write
+        self._lock = threading.Lock()
+        self._thread = None
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+
+    @property
+    def enabled(self):
+        return self.app is not None and REPLICA_BIND in self.app.config.get('SQLALCHEMY_BINDS', {})
+
+    def _is_snapshot_copy(self):
+        return (db.engine.dialect.name == 'sqlite'
+                and db.engines[REPLICA_BIND].dialect.name == 'sqlite')
+
+    def refresh(self):
+        """Copy the primary SQLite database into the replica"""
+        started = time.time()
+        primary = db.engine.raw_connection()
+        replica = db.engines[REPLICA_BIND].raw_connection()
+        try:
+            primary.driver_connection.backup(replica.driver_connection)
+        finally:
+            replica.close()
+            primary.close()
+        self.synced_at = started
+
+    def start(self):
+        """Begin refreshing the replica in a background thread"""
+        if not self.enabled or self._thread is not None:
+            return
+        with self.app.app_context():
+            if not self._is_snapshot_copy():
+                # Externally replicated: treat as current
+                self.synced_at = float('inf')
+                return
+            self.refresh()
+
+        def loop():
+            while True:
+                time.sleep(self.refresh_interval)
+                try:
+                    with self.app.app_context():
+                        self.refresh()
+                except Exception as e:
+                    print(f"Replica refresh failed: {e}")
+
+        self._thread = threading.Thread(target=loop, name='replica-refresh', daemon=True)
+        self._thread.start()
+
+    def mark_write(self, user_id):
+        """Record that user_id just changed data they will want to read back"""
+        with self._lock:
+            self._last_write[user_id] = time.time()
+            self._last_write.move_to_end(user_id)
+            while len(self._last_write) > self.max_tracked_users:
+                self._last_write.popitem(last=False)
+
+    def bind_arguments(self, user_id=None):
+        """Session bind arguments for a read on behalf of user_id (None: anonymous)"""
+        synced_at = self.synced_at
+        if not self.enabled or synced_at is None or time.time() - synced_at > self.max_staleness:
+            return {}
+        if user_id is not None:
+            with self._lock:
+                last_write = self._last_write.get(user_id)
+            if last_write is not None and last_write >= synced_at:
+                return {}
+        return {'bind': db.engines[REPLICA_BIND]}
+
+    def execute(self, statement, user_id=None):
+        """Run a read-only statement on the replica when allowed, else the primary"""
+        return db.session.execute(statement, bind_arguments=self.bind_arguments(user_id))
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Router for a sharded (shared-nothing) deployment of the Ticket Reservation Server.
+
+Requests for a single event or booking are forwarded to the node that owns
+its id; listings and statistics are fanned out to every node and merged.
+Users register and log in on node 0 and are replicated to the other nodes,
+again whenever their password changes or their sessions are revoked.
+"""
+
+import argparse
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import requests
+import urllib3
+from flask import Flask, request, jsonify
+from requests.adapters import HTTPAdapter
+
+import config
+from auth import bearer_token, decode_token
+from https_server import install_http_tuning, serve_https
+from money import from_cents
+from sharding import owner
+
+# Nodes use the same self-signed certificate as the single-node server
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+FORWARDED_HEADERS = ('Authorization', 'Content-Type', 'Idempotency-Key', 'If-Match')
+RETURNED_HEADERS = ('Retry-After', 'ETag')
+
+app = Flask(__name__)
+install_http_tuning(app)
+
+nodes = list(config.SHARD_NODES)
+internal_key = os.environ.get('TICKET_SHARD_INTERNAL_KEY', config.SHARD_INTERNAL_KEY)
+session = requests.Session()
+session.verify = False
+session.trust_env = False  # Node hops never go through proxies or environment CA bundles
+session.mount('https://', HTTPAdapter(pool_connections=len(nodes), pool_maxsize=config.SERVER_THREADS))
+fan_out_pool = ThreadPoolExecutor(max_workers=config.SERVER_THREADS)
+event_placement = itertools.count()
+
+def forward(node_index, path=None, method=None, data=None, timeout=30, internal=False):
+    """Send the current request (or the given one) to a node, with the internal key if internal"""
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    headers['X-Forwarded-For'] = request.remote_addr
+    if internal:
+        headers['X-Internal-Key'] = internal_key
+    return session.request(method or request.method, nodes[node_index] + (path or request.full_path),
+                           data=request.get_data() if data is None else data,
+                           headers=headers, timeout=timeout)
+
+def relay(node_response):
+    """Turn a node response into a router response"""
+    response = app.response_class(node_response.content, status=node_response.status_code,
+                                  mimetype=node_response.headers.get('Content-Type', 'application/json'))
+    for name in RETURNED_HEADERS:
+        if name in node_response.headers:
+            response.headers[name] = node_response.headers[name]
+    return response
+
+def fan_out(path=None):
+    """Forward the current request to every node in parallel"""
+    # Bind request data now: worker threads have no request context
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    headers['X-Forwarded-For'] = request.remote_addr
+    url_path = path or request.full_path
+    method = request.method
+
+    def call(node_url):
+        return session.request(method, node_url + url_path, headers=headers, timeout=30)
+    return list(fan_out_pool.map(call, nodes))
+
+def merged_list(responses):
+    """Merge JSON arrays from all nodes ordered by id, or relay the first failure"""
+    items = []
+    for node_response in responses:
+        if node_response.status_code != 200:
+            return relay(node_response)
+        items.extend(node_response.json())
+    items.sort(key=lambda item: item['id'])
+    return jsonify(items), 200
+
+def replicate_user(user_id):
+    """Copy a user from the home node to every other node"""
+    internal = {'X-Internal-Key': internal_key}
+    user = session.get(f'{nodes[0]}/api/internal/users/{user_id}', headers=internal, timeout=30)
+    user.raise_for_status()
+    for node_url in nodes[1:]:
+        session.post(f'{node_url}/api/internal/users', json=user.json(),
+                     headers=internal, timeout=30).raise_for_status()
+
+def replicate_users(user_ids):
+    """Copy many users from the home node, BULK_USERS_BATCH_SIZE per request"""
+    internal = {'X-Internal-Key': internal_key}
+    for start in range(0, len(user_ids), config.BULK_USERS_BATCH_SIZE):
+        ids = ','.join(str(user_id) for user_id in user_ids[start:start + config.BULK_USERS_BATCH_SIZE])
+        users = session.get(f'{nodes[0]}/api/internal/users?ids={ids}', headers=internal, timeout=30)
+        users.raise_for_status()
+        for node_url in nodes[1:]:
+            session.post(f'{node_url}/api/internal/users', json=users.json(),
+                         headers=internal, timeout=30).raise_for_status()
+
+@app.route('/api/register', methods=['POST'])
+def register():
+    """Register on the home node and replicate the user to the others"""
+    home = forward(0)
+    if home.status_code == 201 and len(nodes) > 1:
+        replicate_user(home.json()['user']['id'])
+    return relay(home)
+
+@app.route('/api/users/bulk', methods=['POST'])
+def provision_users():
+    """Provision on the home node and replicate the new users to the others"""
+    # Hashing thousands of passwords can take minutes
+    home = forward(0, timeout=None)
+    if home.status_code == 200 and len(nodes) > 1:
+        replicate_users([user['id'] for user in home.json()['users']])
+    return relay(home)
+
+@app.route('/api/login', methods=['POST'])
+def login():
+    return relay(forward(0))
+
+@app.route('/api/token/refresh', methods=['POST'])
+def refresh_token():
+    """Refresh on the home node; a reused refresh token revokes the user's sessions on every node"""
+    home = forward(0, internal=len(nodes) > 1)
+    revoked = home.headers.get('X-Revoked-User')
+    if home.status_code == 401 and revoked and len(nodes) > 1:
+        replicate_user(int(revoked))
+    return relay(home)
+
+@app.route('/api/logout', methods=['POST'])
+@app.route('/api/password', methods=['POST'])
+def revoke_sessions():
+    """Revoke on the home node, then replicate the new password and token epoch"""
+    home = forward(0)
+    if home.status_code == 200 and len(nodes) > 1:
+        # Logging out one session only deletes its refresh token, which lives on the home node
+        if request.path == '/api/password' or (request.get_json(silent=True) or {}).get('all'):
+            claims = decode_token(bearer_token(request.headers.get('Authorization')), config.SECRET_KEY)
+            replicate_user(claims['user_id'])
+    return relay(home)
+
+@app.route('/api/events', methods=['GET'])
+def get_events():
+    return merged_list(fan_out())
+
+@app.route('/api/events/search', methods=['GET'])
+def search_events():
+    """Collect the top page*per_page matches from every node and merge them by score"""
+    try:
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', config.SEARCH_PER_PAGE))
+    except ValueError:
+        page = per_page = 0
+    if page < 1 or not 1 <= per_page <= config.SEARCH_MAX_PER_PAGE:
+        # Let a node produce the usual validation error
+        return relay(forward(0))
+    
+    needed = page * per_page
+    node_page_size = min(needed, config.SEARCH_MAX_PER_PAGE)
+    total = 0
+    truncated = False
+    events = []
+    for node_page in range(1, -(-needed // node_page_size) + 1):
+        query = urlencode({'q': request.args.get('q', ''), 'page': node_page, 'per_page': node_page_size})
+        exhausted = True
+        for node_response in fan_out(f'/api/events/search?{query}'):
+            if node_response.status_code != 200:
+                return relay(node_response)
+            result = node_response.json()
+            if node_page == 1:
+                total += result['total']
+                truncated = truncated or result['truncated']
+            events.extend(result['events'])
+            exhausted = exhausted and len(result['events']) < node_page_size
+        if exhausted:
+            break
+    events.sort(key=lambda event: (-event['score'], event['id']))
+    return jsonify({
+        'total': total,
+        'truncated': truncated,
+        'page': page,
+        'per_page': per_page,
+        'events': events[(page - 1) * per_page:needed]
+    }), 200
+
+@app.route('/api/events', methods=['POST'])
+def create_event():
+    """Place new events on the nodes round-robin"""
+    return relay(forward(next(event_placement) % len(nodes)))
+
+@app.route('/api/events/<int:event_id>', methods=['GET', 'PATCH'])
+@app.route('/api/events/<int:event_id>/<path:rest>', methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+def event_route(event_id, rest=None):
+    return relay(forward(owner(event_id, len(nodes))))
+
+@app.route('/api/bookings', methods=['POST'])
+def create_booking():
+    data = request.get_json(silent=True) or {}
+    try:
+        node_index = owner(data['event_id'], len(nodes))
+    except (KeyError, TypeError, ValueError):
+        # Let a node produce the usual validation error
+        node_index = 0
+    return relay(forward(node_index))
+
+@app.route('/api/bookings', methods=['GET'])
+def get_user_bookings():
+    return merged_list(fan_out())
+
+@app.route('/api/bookings/<int:booking_id>', methods=['DELETE'])
+@app.route('/api/bookings/<int:booking_id>/tickets', methods=['GET'])
+def booking_route(booking_id):
+    return relay(forward(owner(booking_id, len(nodes))))
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Sum per-node statistics; users are replicated, so they are counted once"""
+    responses = fan_out()
+    for node_response in responses:
+        if node_response.status_code != 200:
+            return relay(node_response)
+    stats = [node_response.json() for node_response in responses]
+    merged = {key: sum(node_stats[key] for node_stats in stats)
+              for key in stats[0] if key not in ('total_users', 'total_revenue')}
+    merged['total_users'] = stats[0]['total_users']
+    # Revenue is summed in integer cents and converted once, so shards add up exactly
+    merged['total_revenue'] = from_cents(merged['total_revenue_cents'])
+    return jsonify(merged), 200
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ticket Reservation shard router')
+    parser.add_argument('--host', default=config.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=config.ROUTER_PORT)
+    parser.add_argument('--nodes', help='comma-separated node URLs (default: SHARD_NODES)')
+    args = parser.parse_args(argv)
+    if args.nodes:
+        nodes[:] = [url.rstrip('/') for url in args.nodes.split(',')]
+    if len(nodes) > 1 and not internal_key:
+        parser.error('user replication needs a shared key: set TICKET_SHARD_INTERNAL_KEY on the router and nodes')
+
+    print(f"Routing to {len(nodes)} node(s): {', '.join(nodes)}")
+    print(f"Router available at: https://localhost:{args.port}")
+    serve_https(app, args.host, args.port)
+
+if __name__ == '__main__':
+    main()
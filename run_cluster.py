@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Run a sharded Ticket Reservation deployment locally: N server nodes on
+consecutive ports, each with its own database file, plus the router.
+"""
+
+import argparse
+import os
+import secrets
+import subprocess
+import sys
+
+import config
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--nodes', type=int, default=len(config.SHARD_NODES), help='number of server nodes')
+    parser.add_argument('--base-port', type=int, default=9001, help='port of the first node')
+    parser.add_argument('--port', type=int, default=config.ROUTER_PORT, help='router port')
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    processes = []
+    node_urls = []
+    # Nodes only accept user replication from holders of this key
+    internal_key = os.environ.get('TICKET_SHARD_INTERNAL_KEY') or secrets.token_urlsafe(32)
+    try:
+        for index in range(args.nodes):
+            port = args.base_port + index
+            env = dict(os.environ, TICKET_SHARD_INTERNAL_KEY=internal_key,
+                       TICKET_DATABASE_URI=f'sqlite:///ticket_system_shard{index}.db',
+                       TICKET_ARCHIVE_DATABASE_URI=f'sqlite:///ticket_system_shard{index}_archive.db')
+            processes.append(subprocess.Popen(
+                # Bound to loopback, so the router is the only way in and X-Forwarded-For can be trusted
+                [sys.executable, 'server.py', '--host', '127.0.0.1', '--port', str(port), '--behind-router',
+                 '--shard-index', str(index), '--shard-count', str(args.nodes)],
+                cwd=here, env=env))
+            node_urls.append(f'https://localhost:{port}')
+
+        processes.append(subprocess.Popen(
+            [sys.executable, 'router.py', '--port', str(args.port), '--nodes', ','.join(node_urls)],
+            cwd=here, env=dict(os.environ, TICKET_SHARD_INTERNAL_KEY=internal_key)))
+
+        print(f"Cluster running: router on {args.port}, nodes on {args.base_port}-{args.base_port + args.nodes - 1}")
+        print("Press Ctrl+C to stop")
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        print("\nStopping cluster...")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+if __name__ == '__main__':
+    main()
@@ -6,24 +6,20 @@ Server startup script for Ticket Reservation System
 import sys
 import os
 import subprocess
+import importlib.util
 from pathlib import Path
 
+REQUIRED_MODULES = ('flask', 'flask_sqlalchemy', 'flask_cors', 'bcrypt', 'jwt', 'cryptography', 'requests')
+
 def check_dependencies():
-    """Check if required packages are installed"""
-    try:
-        import flask
-        import flask_sqlalchemy
-        import flask_cors
-        import bcrypt
-        import jwt
-        import cryptography
-        import requests
-        print("✓ All dependencies are installed")
-        return True
-    except ImportError as e:
-        print(f"✗ Missing dependency: {e}")
+    """Check if required packages are installed (without importing them)"""
+    missing = [name for name in REQUIRED_MODULES if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"✗ Missing dependency: {', '.join(missing)}")
         print("Please run: pip install -r requirements.txt")
         return False
+    print("✓ All dependencies are installed")
+    return True
 
 def check_ssl_certificates():
     """Check if SSL certificates exist"""
@@ -58,13 +54,14 @@ def main():
     if not check_ssl_certificates():
         sys.exit(1)
     
-    # Initialize database
+    # Import and initialize the server in this process (heavy imports happen once)
     print("Initializing database...")
     try:
-        subprocess.run([sys.executable, "server.py", "--init-db"], check=True)
+        import server
+        server.init_db()
         print("✓ Database initialized")
-    except subprocess.CalledProcessError:
-        print("✗ Failed to initialize database")
+    except Exception as e:
+        print(f"✗ Failed to initialize database: {e}")
         sys.exit(1)
     
     # Start server
@@ -76,10 +73,10 @@ def main():
     print("=" * 50)
     
     try:
-        subprocess.run([sys.executable, "server.py"], check=True)
+        server.serve(server.config.SERVER_HOST, server.config.SERVER_PORT)
     except KeyboardInterrupt:
         print("\nServer stopped by user")
-    except subprocess.CalledProcessError as e:
+    except Exception as e:
         print(f"Server error: {e}")
         sys.exit(1)
 
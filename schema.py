@@ -0,0 +1,81 @@
+"""
+Database schema versioning.
+
+The schema version is kept in SQLite's ``PRAGMA user_version`` so checking
+it at startup costs a single statement. ``create_all`` and any migrations
+only run when the database is older than ``SCHEMA_VERSION``.
+"""
+
+from models import db
+import ledger
+import tickets
+import search
+import quotas
+
+# Bump when tables or columns change and add the upgrade step to MIGRATIONS
+SCHEMA_VERSION = 12
+
+def add_column(table, column, ddl):
+    """Migration step adding a column unless create_all already made it"""
+    def migrate(connection):
+        columns = {row[1] for row in connection.execute(db.text(f'PRAGMA table_info({table})'))}
+        if column not in columns:
+            connection.execute(db.text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+    return migrate
+
+def move_to_cents(*columns):
+    """Migration step replacing float money columns with integer cents.
+
+    columns are (table, float column, cents column) triples; tables that
+    create_all already made with the cents column are skipped.
+    """
+    def migrate(connection):
+        for table, old, new in columns:
+            existing = {row[1] for row in connection.execute(db.text(f'PRAGMA table_info({table})'))}
+            if old not in existing:
+                continue
+            if new not in existing:
+                connection.execute(db.text(f'ALTER TABLE {table} ADD COLUMN {new} INTEGER NOT NULL DEFAULT 0'))
+            connection.execute(db.text(f'UPDATE {table} SET {new} = CAST(ROUND({old} * 100) AS INTEGER)'))
+            connection.execute(db.text(f'ALTER TABLE {table} DROP COLUMN {old}'))
+    return migrate
+
+# version -> callable(connection) run after create_all when upgrading to that version
+MIGRATIONS = {
+    2: ledger.seed_from_bookings,
+    4: tickets.issue_for_existing_bookings,
+    5: search.create_index,
+    6: add_column('booking', 'applied_tier', 'VARCHAR(50)'),
+    7: move_to_cents(('event', 'price_per_ticket', 'price_cents'),
+                     ('booking', 'total_amount', 'total_cents'),
+                     ('ledger_entry', 'amount', 'amount_cents'),
+                     ('event_snapshot', 'revenue', 'revenue_cents'),
+                     ('price_tier', 'price', 'price_cents')),
+    9: add_column('event', 'version', 'INTEGER NOT NULL DEFAULT 1'),
+    10: quotas.seed_from_bookings,
+    11: add_column('user', 'token_epoch', 'INTEGER NOT NULL DEFAULT 0'),
+    12: add_column('idempotency_key', 'request_hash', 'BLOB'),
+}
+
+def get_schema_version():
+    return db.session.execute(db.text('PRAGMA user_version')).scalar()
+
+def upgrade_schema():
+    """Bring the database up to SCHEMA_VERSION.
+
+    Returns the version found before upgrading, or None if the database was
+    already current.
+    """
+    current = get_schema_version()
+    if current >= SCHEMA_VERSION:
+        return None
+
+    db.create_all()
+    with db.engine.begin() as connection:
+        for version in range(current + 1, SCHEMA_VERSION + 1):
+            migration = MIGRATIONS.get(version)
+            if migration:
+                migration(connection)
+        # PRAGMA does not accept bound parameters
+        connection.execute(db.text(f'PRAGMA user_version = {int(SCHEMA_VERSION)}'))
+    return current
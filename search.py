@@ -0,0 +1,97 @@
+"""
+Full-text event search.
+
+``event_fts`` is an SQLite FTS5 index over ``Event.name``, ``description``
+and ``venue`` that stores no copy of the text (external content). Triggers
+keep it in step with the event table, and the update trigger only fires on
+the indexed columns, so the ticket counter updates made by every booking
+never touch the index.
+"""
+
+import re
+
+import config
+from models import db, Event
+from serialization import EVENT_COLUMNS
+
+MAX_TERMS = 8
+
+# Column weights for bm25(): a match in the name counts most, then the venue
+RANK_WEIGHTS = (10.0, 1.0, 4.0)
+
+INDEX_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS event_fts USING fts5("
+    "name, description, venue, content='event', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_insert AFTER INSERT ON event BEGIN "
+    "INSERT INTO event_fts(rowid, name, description, venue) "
+    "VALUES (new.id, new.name, new.description, new.venue); END",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_delete AFTER DELETE ON event BEGIN "
+    "INSERT INTO event_fts(event_fts, rowid, name, description, venue) "
+    "VALUES ('delete', old.id, old.name, old.description, old.venue); END",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_update AFTER UPDATE OF name, description, venue ON event BEGIN "
+    "INSERT INTO event_fts(event_fts, rowid, name, description, venue) "
+    "VALUES ('delete', old.id, old.name, old.description, old.venue); "
+    "INSERT INTO event_fts(rowid, name, description, venue) "
+    "VALUES (new.id, new.name, new.description, new.venue); END",
+)
+
+def create_index(connection):
+    """Schema migration: create the FTS index and its triggers, and index existing events"""
+    for statement in INDEX_DDL:
+        connection.execute(db.text(statement))
+    connection.execute(db.text("INSERT INTO event_fts(event_fts) VALUES ('rebuild')"))
+
+def match_query(text):
+    """FTS5 query matching every word of text, the last one as a prefix (search as you type).
+
+    Returns None if text has no words.
+    """
+    terms = re.findall(r'\w+', text.lower())[:MAX_TERMS]
+    if not terms:
+        return None
+    # Quoting keeps FTS5 operators and column filters in user input literal
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+def parse_search_args(args):
+    """(query, page, per_page) from request arguments; raises ValueError with a client message"""
+    query = match_query(args.get('q', ''))
+    if query is None:
+        raise ValueError('Missing search query: q')
+    try:
+        page = int(args.get('page', 1))
+        per_page = int(args.get('per_page', config.SEARCH_PER_PAGE))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid page or per_page format')
+    if page < 1 or not 1 <= per_page <= config.SEARCH_MAX_PER_PAGE:
+        raise ValueError(f'page must be at least 1 and per_page between 1 and {config.SEARCH_MAX_PER_PAGE}')
+    return query, page, per_page
+
+_fts = db.table('event_fts', db.column('rowid'))
+_fts_match = db.literal_column('event_fts')
+
+def search_statements(query, page, per_page):
+    """(rows, count) statements for one page of events matching an FTS5 query, best first.
+
+    Only the SEARCH_MAX_RANKED newest matches are scored, so a query that
+    matches most events costs no more than a selective one. The count stops
+    one past that; pass it to ``totals``.
+    """
+    condition = _fts_match.op('MATCH')(query)
+    candidates = (db.select(_fts.c.rowid.label('event_id'),
+                            (-db.func.bm25(_fts_match, *RANK_WEIGHTS)).label('score'))
+                  .select_from(_fts).where(condition)
+                  .order_by(_fts.c.rowid.desc())
+                  .limit(config.SEARCH_MAX_RANKED)
+                  .subquery())
+    rows = (db.select(*EVENT_COLUMNS, candidates.c.score)
+            .select_from(candidates.join(Event, Event.id == candidates.c.event_id))
+            .order_by(candidates.c.score.desc(), Event.id)
+            .limit(per_page).offset((page - 1) * per_page))
+    matches = db.select(_fts.c.rowid).where(condition).limit(config.SEARCH_MAX_RANKED + 1).subquery()
+    count = db.select(db.func.count()).select_from(matches)
+    return rows, count
+
+def totals(count):
+    """(total, truncated) for the result of a count statement: only ranked matches can be paged to"""
+    return min(count, config.SEARCH_MAX_RANKED), count > config.SEARCH_MAX_RANKED
@@ -0,0 +1,183 @@
+"""
+Fast JSON serialization for API responses.
+
+Listings are built from plain row tuples selected straight from the database
+instead of hydrating ORM objects and calling ``to_dict`` on each of them.
+Encoding uses orjson when it is installed and falls back to the standard
+library ``json`` module otherwise.
+"""
+
+import json
+from collections import OrderedDict
+from datetime import date, datetime
+from threading import Lock
+
+from flask import current_app
+from models import db, User, Event, Booking, ArchivedEvent, ArchivedBooking
+from money import from_cents
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# Column order matches the keys produced by the models' to_dict methods
+EVENT_FIELDS = ('id', 'name', 'description', 'venue', 'event_date', 'total_tickets',
+                'available_tickets', 'price_per_ticket', 'created_at', 'created_by')
+USER_FIELDS = ('id', 'username', 'email', 'is_admin', 'created_at')
+BOOKING_FIELDS = ('id', 'user_id', 'event_id', 'quantity', 'total_amount', 'status', 'booking_date',
+                  'applied_tier')
+
+# API fields whose column holds the amount in integer cents
+CENTS_COLUMNS = {'price_per_ticket': 'price_cents', 'total_amount': 'total_cents'}
+
+def _columns(model, fields):
+    return tuple(getattr(model, CENTS_COLUMNS.get(name, name)) for name in fields)
+
+EVENT_COLUMNS = _columns(Event, EVENT_FIELDS)
+USER_COLUMNS = _columns(User, USER_FIELDS)
+BOOKING_COLUMNS = _columns(Booking, BOOKING_FIELDS)
+ARCHIVED_EVENT_COLUMNS = _columns(ArchivedEvent, EVENT_FIELDS)
+ARCHIVED_BOOKING_COLUMNS = _columns(ArchivedBooking, BOOKING_FIELDS)
+
+def _default(value):
+    """Encode values the stdlib json module does not know about"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+if orjson is not None:
+    def dumps(obj):
+        """Serialize obj to JSON bytes"""
+        return orjson.dumps(obj, default=_default)
+    loads = orjson.loads
+else:
+    def dumps(obj):
+        """Serialize obj to JSON bytes"""
+        return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+    loads = json.loads
+
+def json_response(body, status=200):
+    """Build a JSON response from a payload or already-encoded bytes"""
+    if not isinstance(body, (bytes, bytearray)):
+        body = dumps(body)
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+def event_from_row(row):
+    """Build the Event.to_dict payload from an EVENT_COLUMNS row"""
+    event = dict(zip(EVENT_FIELDS, row))
+    event['price_per_ticket'] = from_cents(event['price_per_ticket'])
+    return event
+
+def user_from_row(row):
+    """Build the User.to_dict payload from a USER_COLUMNS row"""
+    return dict(zip(USER_FIELDS, row))
+
+def booking_from_row(row):
+    """Build the Booking payload (without nested objects) from a BOOKING_COLUMNS row"""
+    booking = dict(zip(BOOKING_FIELDS, row))
+    booking['total_amount'] = from_cents(booking['total_amount'])
+    return booking
+
+class FragmentCache:
+    """Bounded LRU cache of serialized JSON fragments keyed by id.
+
+    Each entry remembers the row it was encoded from, so a fragment is only
+    reused while the underlying row is unchanged and needs no explicit
+    invalidation.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, row, build):
+        """Return the fragment for row, encoding it with build(row) on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == row:
+                self._entries.move_to_end(key)
+                return entry[1]
+        fragment = dumps(build(row))
+        with self._lock:
+            self._entries[key] = (row, fragment)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fragment
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+event_fragments = FragmentCache()
+
+def _splice(obj_bytes, **fragments):
+    """Append pre-encoded fragments as extra keys of an encoded JSON object"""
+    parts = [obj_bytes[:-1]]
+    for key, fragment in fragments.items():
+        parts.append(b',"' + key.encode('utf-8') + b'":' + fragment)
+    parts.append(b'}')
+    return b''.join(parts)
+
+def encode_event(row):
+    """Return the cached JSON fragment for an EVENT_COLUMNS row"""
+    return event_fragments.get(row[0], tuple(row), event_from_row)
+
+def encode_events(rows):
+    """Encode an iterable of EVENT_COLUMNS rows as a JSON array"""
+    return b'[' + b','.join(encode_event(row) for row in rows) + b']'
+
+def join_arrays(*arrays):
+    """Concatenate encoded JSON arrays into one"""
+    return b'[' + b','.join(array[1:-1] for array in arrays if array != b'[]') + b']'
+
+def encode_search_results(rows, total, truncated, page, per_page):
+    """Encode a page of EVENT_COLUMNS + score rows with the total match count"""
+    events = b'[' + b','.join(_splice(encode_event(row[:-1]), score=dumps(round(row[-1], 4)))
+                              for row in rows) + b']'
+    return _splice(dumps({'total': total, 'truncated': truncated, 'page': page, 'per_page': per_page}),
+                   events=events)
+
+def encode_booking(row):
+    """Encode a row of BOOKING_COLUMNS + EVENT_COLUMNS + USER_COLUMNS"""
+    n_booking = len(BOOKING_FIELDS)
+    n_event = len(EVENT_FIELDS)
+    booking_row = row[:n_booking]
+    event_row = row[n_booking:n_booking + n_event]
+    user_row = row[n_booking + n_event:]
+    event = encode_event(event_row) if event_row[0] is not None else b'null'
+    user = dumps(user_from_row(user_row)) if user_row[0] is not None else b'null'
+    return _splice(dumps(booking_from_row(booking_row)), event=event, user=user)
+
+def encode_message(message, **fragments):
+    """Encode a {'message': ...} response body with pre-encoded fragments"""
+    return _splice(dumps({'message': message}), **fragments)
+
+def encode_bookings(rows):
+    """Encode an iterable of joined booking rows as a JSON array"""
+    return b'[' + b','.join(encode_booking(row) for row in rows) + b']'
+
+def events_query():
+    """Select statement for event rows in listing order"""
+    return db.select(*EVENT_COLUMNS).order_by(Event.id)
+
+def bookings_query():
+    """Select statement for bookings joined with their event and user"""
+    return (db.select(*BOOKING_COLUMNS, *EVENT_COLUMNS, *USER_COLUMNS)
+            .select_from(Booking)
+            .outerjoin(Event, Booking.event_id == Event.id)
+            .outerjoin(User, Booking.user_id == User.id)
+            .order_by(Booking.id))
+
+def archived_events_query():
+    """Select statement for archived event rows, shaped like events_query"""
+    return db.select(*ARCHIVED_EVENT_COLUMNS).order_by(ArchivedEvent.id)
+
+def archived_bookings_query():
+    """Select statement for archived bookings joined with their event (the user lives in the live database)"""
+    return (db.select(*ARCHIVED_BOOKING_COLUMNS, *ARCHIVED_EVENT_COLUMNS)
+            .select_from(ArchivedBooking)
+            .outerjoin(ArchivedEvent, ArchivedBooking.event_id == ArchivedEvent.id)
+            .order_by(ArchivedBooking.id))
@@ -1,45 +1,192 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
-from models import db, User, Event, Booking
-import jwt
+from models import db, User, Event, Booking, Ticket, PriceTier, ArchivedEvent, ArchivedBooking, ARCHIVE_BIND
+from https_server import install_http_tuning, serve_https
+from serialization import (json_response, encode_events, encode_event, encode_booking,
+                           encode_bookings, encode_message, encode_search_results, events_query,
+                           bookings_query, archived_events_query, archived_bookings_query, join_arrays,
+                           dumps, BOOKING_COLUMNS, USER_FIELDS)
+from cache import create_cache
+from event_cache import EventCache, event_row
+import idempotency
+import ledger
+import jobs
+import logs
+import tickets
+import search
+import accounts
+import archive
+import quotas
+import backup
+from pricing import PricingEngine, parse_tiers
+from money import to_cents, from_cents
+from schema import upgrade_schema
+from auth import (bearer_token, issue_token, decode_token, token_user, revocations_query,
+                  TokenRevocations)
+import refresh_tokens
+from rate_limit import TokenBucketLimiter, retry_after_header
+from sqlalchemy.exc import IntegrityError
+from werkzeug.middleware.proxy_fix import ProxyFix
+from sharding import allocate_id
+from replica import ReplicaRouter, REPLICA_BIND
+import hmac
 import os
 from datetime import datetime, timedelta, timezone
-import ssl
+import argparse
 from functools import wraps
+import config
 
 app = Flask(__name__)
 CORS(app)
 
 # Configuration
-app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///ticket_system.db'
+app.config['SECRET_KEY'] = config.SECRET_KEY
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('TICKET_DATABASE_URI', 'sqlite:///ticket_system.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_BINDS'] = {
+    ARCHIVE_BIND: os.environ.get('TICKET_ARCHIVE_DATABASE_URI', config.ARCHIVE_DATABASE_URI)
+}
+if config.REPLICA_ENABLED:
+    app.config['SQLALCHEMY_BINDS'][REPLICA_BIND] = os.environ.get('TICKET_REPLICA_DATABASE_URI',
+                                                                  config.REPLICA_DATABASE_URI)
+# Shard placement when running behind router.py (see sharding.py)
+app.config['SHARD_INDEX'] = int(os.environ.get('TICKET_SHARD_INDEX', 0))
+app.config['SHARD_COUNT'] = int(os.environ.get('TICKET_SHARD_COUNT', 1))
+app.config['SHARD_INTERNAL_KEY'] = os.environ.get('TICKET_SHARD_INTERNAL_KEY', config.SHARD_INTERNAL_KEY)
 
 # Initialize database
 db.init_app(app)
 
+# A new or replaced archive database gets its tables on first use
+with app.app_context():
+    archive.create_tables_on_connect(db.engines[ARCHIVE_BIND])
+
+# Read-only routes use the replica when it is within the staleness bound
+replicas = ReplicaRouter(config.REPLICA_MAX_STALENESS_SECONDS, config.REPLICA_REFRESH_SECONDS)
+replicas.init_app(app)
+
+# Immutable event metadata shared by booking and detail lookups
+event_cache = EventCache(config.EVENT_CACHE_SIZE)
+
+# Listing, detail, stats and token-user responses; shared between workers with a redis:// URL
+cache = create_cache(os.environ.get('TICKET_CACHE_URL', config.CACHE_URL), config.CACHE_TTL_SECONDS,
+                     config.CACHE_INVALIDATION_CHANNEL, prefix=f"ticket:{app.config['SHARD_INDEX']}:")
+
+# Per-event price tier tables, so pricing a booking needs no queries
+pricing = PricingEngine(config.EVENT_CACHE_SIZE)
+
+# Preloaded per-event ticket sets for gate scanning
+gate = tickets.GateValidator(app.config['SECRET_KEY'])
+
+# Token epochs of users who revoked their sessions, so token checks need no query
+revocations = TokenRevocations(config.REVOCATION_REFRESH_SECONDS)
+
+def invalidate_cached(event_id=None):
+    """Drop cached responses affected by a change to event_id (or to any event)"""
+    keys = ['events:list', 'stats']
+    if event_id is not None:
+        keys.append(f'event:{event_id}')
+    cache.invalidate(*keys)
+
+def on_cache_invalidation(keys):
+    """Keep this worker's event metadata in step with invalidations from any worker"""
+    for key in keys:
+        if key.startswith('event:'):
+            event_id = int(key.split(':', 1)[1])
+            event_cache.invalidate(event_id)
+            pricing.invalidate(event_id)
+
+def include_archived():
+    """Whether the request opted in to archived events and bookings with ?include_archived=1"""
+    return request.args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+rate_limiter = TokenBucketLimiter(config.RATE_LIMIT_MAX_BUCKETS)
+
+def rate_limited(budget):
+    """Limit a route using the RATE_LIMITS budget of that name.
+
+    Requests are counted per client IP and, when applied below
+    token_required, per authenticated user as well.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if config.RATE_LIMIT_ENABLED:
+                per_minute, burst = config.RATE_LIMITS.get(budget, config.RATE_LIMITS['default'])
+                keys = [(budget, 'ip', request.remote_addr)]
+                if args:
+                    keys.append((budget, 'user', args[0].id))
+                for key in keys:
+                    wait = rate_limiter.consume(key, per_minute / 60.0, burst)
+                    if wait:
+                        response = jsonify({'message': 'Too many requests'})
+                        response.headers['Retry-After'] = retry_after_header(wait)
+                        return response, 429
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+# Registered first so its after_request hook sees the compressed size
+logs.install_access_log(app)
+install_http_tuning(app)
+
+def configure_sharding(shard_index, shard_count, behind_router=False):
+    """Run this process as node shard_index of shard_count behind router.py"""
+    app.config['SHARD_INDEX'] = shard_index
+    app.config['SHARD_COUNT'] = shard_count
+    cache.prefix = f'ticket:{shard_index}:'
+    if behind_router:
+        # Client IPs (for rate limiting) arrive in X-Forwarded-For from the router
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+
+def serve(host, port):
+    """Serve the app over TLS with persistent connections"""
+    replicas.start()
+    cache.subscribe(on_cache_invalidation)
+    prefix = f"shard{app.config['SHARD_INDEX']}-" if app.config['SHARD_COUNT'] > 1 else ''
+    logs.configure(os.path.join(app.instance_path, config.LOG_DIR), prefix)
+    serve_https(app, host, port)
+
+def session_tokens(user):
+    """Access token, and a refresh token staged in the current transaction, for user"""
+    return {
+        'token': issue_token(user, app.config['SECRET_KEY']),
+        'refresh_token': refresh_tokens.issue(user.id, config.REFRESH_TOKEN_DAYS),
+        'expires_in': config.ACCESS_TOKEN_MINUTES * 60
+    }
+
+def revoke_sessions(user_id):
+    """Delete the user's refresh tokens and refuse every access token issued so far"""
+    epoch = refresh_tokens.revoke_all(user_id)
+    db.session.commit()
+    if epoch is not None:
+        revocations.revoke(user_id, epoch)
+
 # JWT token decorator
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            token = request.headers['Authorization'].split(' ')[1]
+        token = bearer_token(request.headers.get('Authorization'))
         
         if not token:
             return jsonify({'message': 'Token is missing'}), 401
         
         try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.filter_by(id=data['user_id']).first()
+            claims = decode_token(token, app.config['SECRET_KEY'])
+            if revocations.stale():
+                revocations.load(db.session.execute(revocations_query()))
+            if not revocations.accepts(claims):
+                return jsonify({'message': 'Token has been revoked'}), 401
+            current_user = token_user(claims)
         except:
             return jsonify({'message': 'Token is invalid'}), 401
         
+        g.user_id = current_user.id
         return f(current_user, *args, **kwargs)
     return decorated
 
 @app.route('/api/register', methods=['POST'])
+@rate_limited('register')
 def register():
     """Register a new user"""
     try:
@@ -49,30 +196,65 @@ def register():
         if not data or not data.get('username') or not data.get('email') or not data.get('password'):
             return jsonify({'message': 'Missing required fields'}), 400
         
-        # Check if user already exists
-        if User.query.filter_by(username=data['username']).first():
-            return jsonify({'message': 'Username already exists'}), 400
-        
-        if User.query.filter_by(email=data['email']).first():
-            return jsonify({'message': 'Email already exists'}), 400
-        
-        # Create new user
+        # Insert once; the unique constraints reject taken usernames and emails
         user = User(
             username=data['username'],
             email=data['email'],
-            is_admin=data.get('is_admin', False)
+            is_admin=data.get('is_admin', False),
+            password_hash=accounts.hash_password(data['password'])
         )
-        user.set_password(data['password'])
         
         db.session.add(user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            message = accounts.duplicate_message(e)
+            if message is None:
+                raise
+            return jsonify({'message': message}), 400
+        cache.invalidate('stats')
         
         return jsonify({'message': 'User registered successfully', 'user': user.to_dict()}), 201
     
     except Exception as e:
         return jsonify({'message': f'Registration failed: {str(e)}'}), 500
 
+@app.route('/api/users/bulk', methods=['POST'])
+@token_required
+@rate_limited('default')
+def provision_users(current_user):
+    """Create many users at once, e.g. corporate accounts (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'message': 'Admin access required'}), 403
+        
+        data = request.get_json()
+        if not data or 'users' not in data:
+            return jsonify({'message': 'Missing required fields'}), 400
+        
+        try:
+            users = accounts.parse_users(data['users'], config.BULK_USERS_MAX)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        created, skipped = accounts.provision(users, config.BULK_USERS_BATCH_SIZE)
+        if created:
+            cache.invalidate('stats')
+        
+        return jsonify({
+            'message': 'Users provisioned',
+            'created': len(created),
+            'users': [{'id': user_id, 'username': username, 'email': email}
+                      for user_id, username, email in created],
+            'skipped': [{'username': username, 'message': message} for username, message in skipped]
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to provision users: {str(e)}'}), 500
+
 @app.route('/api/login', methods=['POST'])
+@rate_limited('login')
 def login():
     """Login user and return JWT token"""
     try:
@@ -84,35 +266,134 @@ def login():
         user = User.query.filter_by(username=data['username']).first()
         
         if not user or not user.check_password(data['password']):
+            logs.audit('login.failure', username=data['username'], ip=request.remote_addr)
             return jsonify({'message': 'Invalid credentials'}), 401
         
-        # Generate JWT token
-        token = jwt.encode({
-            'user_id': user.id,
-            'username': user.username,
-            'exp': datetime.now(timezone.utc) + timedelta(hours=24)
-        }, app.config['SECRET_KEY'], algorithm='HS256')
+        tokens = session_tokens(user)
+        db.session.commit()
+        logs.audit('login.success', user_id=user.id, ip=request.remote_addr)
+        refresh_tokens.purge_expired(config.REFRESH_TOKEN_PURGE_INTERVAL)
         
-        return jsonify({
-            'message': 'Login successful',
-            'token': token,
-            'user': user.to_dict()
-        }), 200
+        return jsonify(dict(tokens, message='Login successful', user=user.to_dict())), 200
     
     except Exception as e:
         return jsonify({'message': f'Login failed: {str(e)}'}), 500
 
+@app.route('/api/token/refresh', methods=['POST'])
+@rate_limited('token')
+def refresh_token():
+    """Exchange a refresh token for a new access token and refresh token"""
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('refresh_token'):
+            return jsonify({'message': 'Refresh token required'}), 400
+        
+        user_id = refresh_tokens.consume(str(data['refresh_token']))
+        if user_id is None:
+            db.session.rollback()
+            reused_by = refresh_tokens.reused_by(str(data['refresh_token']))
+            if reused_by is not None:
+                # A rotated token came back, so a copy is in someone else's hands
+                revoke_sessions(reused_by)
+                logs.audit('refresh_token.reused', user_id=reused_by, ip=request.remote_addr)
+                if from_cluster():
+                    # The router replicates the new token epoch to the other nodes
+                    response = jsonify({'message': 'Invalid refresh token'})
+                    response.headers['X-Revoked-User'] = str(reused_by)
+                    return response, 401
+            return jsonify({'message': 'Invalid refresh token'}), 401
+        
+        user = db.session.get(User, user_id)
+        tokens = session_tokens(user)
+        db.session.commit()
+        refresh_tokens.purge_expired(config.REFRESH_TOKEN_PURGE_INTERVAL)
+        
+        return jsonify(dict(tokens, message='Token refreshed', user=user.to_dict())), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Token refresh failed: {str(e)}'}), 500
+
+@app.route('/api/logout', methods=['POST'])
+@token_required
+@rate_limited('token')
+def logout(current_user):
+    """End this session (its refresh token), or every session of the user with {"all": true}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        if data.get('all'):
+            revoke_sessions(current_user.id)
+        elif data.get('refresh_token'):
+            refresh_tokens.discard(current_user.id, str(data['refresh_token']))
+            db.session.commit()
+        logs.audit('logout', user_id=current_user.id, all=bool(data.get('all')), ip=request.remote_addr)
+        
+        return jsonify({'message': 'Logged out'}), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Logout failed: {str(e)}'}), 500
+
+@app.route('/api/password', methods=['POST'])
+@token_required
+@rate_limited('login')
+def change_password(current_user):
+    """Change the caller's password; every other session ends"""
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('current_password') or not data.get('new_password'):
+            return jsonify({'message': 'Current and new password required'}), 400
+        
+        user = db.session.get(User, current_user.id)
+        if not user or not user.check_password(data['current_password']):
+            return jsonify({'message': 'Invalid credentials'}), 401
+        
+        user.set_password(data['new_password'])
+        user.token_epoch = refresh_tokens.revoke_all(user.id)
+        # The caller gets a fresh session on the new epoch
+        tokens = session_tokens(user)
+        db.session.commit()
+        revocations.revoke(user.id, user.token_epoch)
+        logs.audit('password.changed', user_id=user.id, ip=request.remote_addr)
+        
+        return jsonify(dict(tokens, message='Password changed', user=user.to_dict())), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to change password: {str(e)}'}), 500
+
 @app.route('/api/events', methods=['GET'])
+@rate_limited('events')
 def get_events():
-    """Get all events"""
+    """Get all events (past ones too with ?include_archived=1)"""
     try:
-        events = Event.query.all()
-        return jsonify([event.to_dict() for event in events]), 200
+        body = cache.get_or_set('events:list', lambda: encode_events(replicas.execute(events_query())))
+        if include_archived():
+            archived = cache.get_or_set('events:archived', lambda: encode_events(
+                db.session.execute(archived_events_query())))
+            body = join_arrays(archived, body)
+        return json_response(body)
     except Exception as e:
         return jsonify({'message': f'Failed to fetch events: {str(e)}'}), 500
 
+@app.route('/api/events/search', methods=['GET'])
+@rate_limited('events')
+def search_events():
+    """Ranked, paginated full-text search over event name, description and venue"""
+    try:
+        try:
+            query, page, per_page = search.parse_search_args(request.args)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        rows, count = search.search_statements(query, page, per_page)
+        total, truncated = search.totals(replicas.execute(count).scalar())
+        return json_response(encode_search_results(replicas.execute(rows), total, truncated, page, per_page))
+    except Exception as e:
+        return jsonify({'message': f'Failed to search events: {str(e)}'}), 500
+
 @app.route('/api/events', methods=['POST'])
 @token_required
+@rate_limited('default')
 def create_event(current_user):
     """Create a new event (admin only)"""
     try:
@@ -124,19 +405,33 @@ def create_event(current_user):
         if not data or not all(k in data for k in ['name', 'venue', 'event_date', 'total_tickets', 'price_per_ticket']):
             return jsonify({'message': 'Missing required fields'}), 400
         
+        try:
+            price_cents = to_cents(data['price_per_ticket'])
+        except ValueError:
+            return jsonify({'message': 'Invalid price_per_ticket'}), 400
+        try:
+            total_tickets = parse_total_tickets(data['total_tickets'])
+            description = parse_description(data.get('description'))
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
         event = Event(
+            id=allocate_id(app, Event),
             name=data['name'],
-            description=data.get('description', ''),
+            description=description,
             venue=data['venue'],
             event_date=datetime.fromisoformat(data['event_date']),
-            total_tickets=data['total_tickets'],
-            available_tickets=data['total_tickets'],
-            price_per_ticket=data['price_per_ticket'],
+            total_tickets=total_tickets,
+            available_tickets=total_tickets,
+            price_cents=price_cents,
             created_by=current_user.id
         )
         
         db.session.add(event)
         db.session.commit()
+        event_cache.invalidate(event.id)
+        invalidate_cached(event.id)
+        replicas.mark_write(current_user.id)
         
         return jsonify({'message': 'Event created successfully', 'event': event.to_dict()}), 201
     
@@ -144,16 +439,224 @@ def create_event(current_user):
         return jsonify({'message': f'Failed to create event: {str(e)}'}), 500
 
 @app.route('/api/events/<int:event_id>', methods=['GET'])
+@rate_limited('events')
 def get_event(event_id):
     """Get specific event"""
     try:
-        event = Event.query.get_or_404(event_id)
-        return jsonify(event.to_dict()), 200
+        meta = event_cache.get(event_id)
+        if meta is not None:
+            body, generation = cache.lookup(f'event:{event_id}')
+            if body is None:
+                query = db.select(Event.available_tickets).where(Event.id == event_id)
+                available = replicas.execute(query).scalar()
+                if available is None:
+                    # Not on the replica yet, or archived since the metadata was cached
+                    available = db.session.execute(query).scalar()
+                if available is not None:
+                    body = encode_event(event_row(meta, available))
+                    cache.store(f'event:{event_id}', body, generation)
+                else:
+                    event_cache.invalidate(event_id)
+            if body is not None:
+                response = json_response(body)
+                response.headers['ETag'] = f'"{meta.version}"'
+                return response
+        
+        if include_archived():
+            row = db.session.execute(
+                archived_events_query().where(ArchivedEvent.id == event_id)
+            ).first()
+            if row is not None:
+                return json_response(encode_event(row))
+        return jsonify({'message': 'Event not found'}), 404
     except Exception as e:
         return jsonify({'message': f'Failed to fetch event: {str(e)}'}), 500
 
+EDITABLE_EVENT_FIELDS = ('name', 'description', 'venue', 'event_date', 'total_tickets', 'price_per_ticket')
+
+def parse_total_tickets(value):
+    """Event capacity from a request body: a positive JSON integer; raises ValueError otherwise"""
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError('Invalid total_tickets format')
+    if value <= 0:
+        raise ValueError('Invalid total_tickets - must be greater than 0')
+    return value
+
+def parse_description(value):
+    """Event description from a request body: a string or null; raises ValueError otherwise"""
+    if value is not None and not isinstance(value, str):
+        raise ValueError('Invalid description')
+    return value or ''
+
+def parse_event_changes(data):
+    """Column values for a PATCH body; raises ValueError with a client message"""
+    unknown = sorted(set(data) - set(EDITABLE_EVENT_FIELDS))
+    if unknown:
+        raise ValueError(f"Cannot update: {', '.join(unknown)}")
+    values = {}
+    for field in ('name', 'venue'):
+        if field in data:
+            if not isinstance(data[field], str) or not data[field].strip():
+                raise ValueError(f'Invalid {field}')
+            values[field] = data[field]
+    if 'description' in data:
+        values['description'] = parse_description(data['description'])
+    if 'event_date' in data:
+        try:
+            values['event_date'] = datetime.fromisoformat(data['event_date'])
+        except (TypeError, ValueError):
+            raise ValueError('Invalid event_date format')
+    if 'price_per_ticket' in data:
+        try:
+            values['price_cents'] = to_cents(data['price_per_ticket'])
+        except ValueError:
+            raise ValueError('Invalid price_per_ticket')
+    if 'total_tickets' in data:
+        values['total_tickets'] = parse_total_tickets(data['total_tickets'])
+    return values
+
+def if_match_accepts(if_match, etag):
+    """Whether an If-Match header is * or lists etag; weak (W/) tags never match"""
+    if if_match.strip() == '*':
+        return True
+    return any(tag.strip() == etag for tag in if_match.split(','))
+
+@app.route('/api/events/<int:event_id>', methods=['PATCH'])
+@token_required
+@rate_limited('default')
+def update_event(current_user, event_id):
+    """Edit an event (admin only).
+
+    Requires If-Match with the ETag from GET (or *). A capacity change is
+    applied as a delta to the live available_tickets counter in the same
+    conditional UPDATE, so concurrent bookings are never lost and the
+    capacity can never drop below the tickets already sold.
+    """
+    try:
+        if not current_user.is_admin:
+            return jsonify({'message': 'Admin access required'}), 403
+        
+        if_match = request.headers.get('If-Match')
+        if not if_match:
+            return jsonify({'message': 'If-Match header required'}), 428
+        
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not data:
+            return jsonify({'message': 'No fields to update'}), 400
+        try:
+            values = parse_event_changes(data)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        current = db.session.execute(
+            db.select(Event.version, Event.total_tickets).where(Event.id == event_id)
+        ).first()
+        if current is None:
+            return jsonify({'message': 'Event not found'}), 404
+        if not if_match_accepts(if_match, f'"{current.version}"'):
+            return jsonify({'message': 'Event was modified; fetch it again'}), 412
+        
+        delta = values.get('total_tickets', current.total_tickets) - current.total_tickets
+        updated = db.session.execute(
+            db.update(Event)
+            .where(Event.id == event_id, Event.version == current.version,
+                   Event.available_tickets + delta >= 0)
+            .values(available_tickets=Event.available_tickets + delta, version=Event.version + 1, **values)
+            .returning(Event.version)
+        ).scalar()
+        
+        if updated is None:
+            db.session.rollback()
+            row = db.session.execute(
+                db.select(Event.version, Event.total_tickets, Event.available_tickets)
+                .where(Event.id == event_id)
+            ).first()
+            if row is None:
+                return jsonify({'message': 'Event not found'}), 404
+            if row.version != current.version:
+                return jsonify({'message': 'Event was modified; fetch it again'}), 412
+            return jsonify({'message': f'Cannot reduce total_tickets below the '
+                                       f'{row.total_tickets - row.available_tickets} tickets already sold'}), 400
+        
+        if delta:
+            ledger.append([ledger.entry(ledger.RESIZE, event_id, user_id=current_user.id, quantity=delta)])
+        db.session.commit()
+        event_cache.invalidate(event_id)
+        pricing.invalidate(event_id)
+        invalidate_cached(event_id)
+        replicas.mark_write(current_user.id)
+        if delta:
+            ledger.committed(event_id, 1, config.LEDGER_SNAPSHOT_INTERVAL)
+        
+        row = db.session.execute(events_query().where(Event.id == event_id)).first()
+        response = json_response(encode_message('Event updated successfully', event=encode_event(row)))
+        response.headers['ETag'] = f'"{updated}"'
+        return response
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to update event: {str(e)}'}), 500
+
+@app.route('/api/events/<int:event_id>/pricing', methods=['GET'])
+@rate_limited('events')
+def get_event_pricing(event_id):
+    """Price tiers of an event and the price a booking would pay now"""
+    try:
+        event = event_cache.get(event_id)
+        if event is None:
+            return jsonify({'message': 'Event not found'}), 404
+        
+        available = db.session.execute(
+            db.select(Event.available_tickets).where(Event.id == event_id)
+        ).scalar()
+        quote = pricing.quote(event, event.total_tickets - available)
+        tiers = db.session.execute(
+            db.select(PriceTier).where(PriceTier.event_id == event_id)
+            .order_by(PriceTier.ends_at, PriceTier.min_sold)
+        ).scalars().all()
+        return jsonify({
+            'base_price': from_cents(event.price_cents),
+            'current_price': from_cents(quote.price_cents),
+            'current_tier': quote.tier,
+            'tiers': [tier.to_dict() for tier in tiers]
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to fetch pricing: {str(e)}'}), 500
+
+@app.route('/api/events/<int:event_id>/pricing', methods=['PUT'])
+@token_required
+@rate_limited('default')
+def set_event_pricing(current_user, event_id):
+    """Replace the price tiers of an event (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'message': 'Admin access required'}), 403
+        
+        event = event_cache.get(event_id)
+        if event is None:
+            return jsonify({'message': 'Event not found'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        try:
+            tiers = parse_tiers(data.get('tiers'), event.total_tickets)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        db.session.execute(db.delete(PriceTier).where(PriceTier.event_id == event_id))
+        if tiers:
+            db.session.execute(db.insert(PriceTier), [dict(tier, event_id=event_id) for tier in tiers])
+        db.session.commit()
+        pricing.invalidate(event_id)
+        invalidate_cached(event_id)
+        
+        return jsonify({'message': 'Pricing updated successfully', 'tiers': len(tiers)}), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to update pricing: {str(e)}'}), 500
+
 @app.route('/api/bookings', methods=['POST'])
 @token_required
+@rate_limited('create_booking')
 def create_booking(current_user):
     """Create a new booking"""
     try:
@@ -162,6 +665,20 @@ def create_booking(current_user):
         if not data or not all(k in data for k in ['event_id', 'quantity']):
             return jsonify({'message': 'Missing required fields'}), 400
         
+        # Replay the stored response when a client retries with the same key
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key is not None:
+            if not idempotency_key or len(idempotency_key) > config.IDEMPOTENCY_KEY_MAX_LENGTH:
+                return jsonify({'message': 'Invalid Idempotency-Key header'}), 400
+            request_hash = idempotency.request_digest(data)
+            try:
+                stored = idempotency.lookup(current_user.id, idempotency_key, request_hash,
+                                            config.IDEMPOTENCY_TTL_HOURS)
+            except ValueError as e:
+                return jsonify({'message': str(e)}), 422
+            if stored:
+                return json_response(stored[1], stored[0])
+        
         # Convert quantity to integer and validate
         try:
             quantity = int(data['quantity'])
@@ -171,112 +688,485 @@ def create_booking(current_user):
         if quantity <= 0:
             return jsonify({'message': 'Invalid quantity - must be greater than 0'}), 400
         
-        event = Event.query.get(data['event_id'])
+        try:
+            event_id = int(data['event_id'])
+        except (ValueError, TypeError):
+            return jsonify({'message': 'Invalid event_id format'}), 400
+        
+        limit = config.MAX_TICKETS_PER_USER_PER_EVENT
+        if limit is not None and quantity > limit:
+            return jsonify({'message': f'You can buy at most {limit} tickets per event'}), 400
+        
+        event = event_cache.get(event_id)
         if not event:
             return jsonify({'message': 'Event not found'}), 404
         
-        if quantity > event.available_tickets:
-            return jsonify({'message': f'Not enough tickets available. Available: {event.available_tickets}, Requested: {quantity}'}), 400
+        # Count the tickets against the caller's per-event limit in the same transaction
+        if quotas.reserve(current_user.id, event_id, quantity, limit) is None:
+            db.session.rollback()
+            remaining = limit - quotas.held(current_user.id, event_id)
+            return jsonify({'message': f'Purchase limit reached: you can buy {max(remaining, 0)} more '
+                                       f'tickets for this event (limit {limit})'}), 400
         
-        total_amount = quantity * event.price_per_ticket
+        # Reserve the seats atomically instead of re-aggregating all bookings
+        available = db.session.execute(
+            db.update(Event)
+            .where(Event.id == event_id, Event.available_tickets >= quantity)
+            .values(available_tickets=Event.available_tickets - quantity)
+            .returning(Event.available_tickets)
+        ).scalar()
+        if available is None:
+            db.session.rollback()
+            available = db.session.execute(
+                db.select(Event.available_tickets).where(Event.id == event_id)
+            ).scalar()
+            if available is None:
+                # Archived since its metadata was cached
+                event_cache.invalidate(event_id)
+                return jsonify({'message': 'Event not found'}), 404
+            return jsonify({'message': f'Not enough tickets available. Available: {available}, Requested: {quantity}'}), 400
+        
+        # Priced at the tier in force before these seats were taken
+        quote = pricing.quote(event, event.total_tickets - available - quantity)
+        total_cents = quantity * quote.price_cents
         
         booking = Booking(
+            id=allocate_id(app, Booking),
             user_id=current_user.id,
-            event_id=data['event_id'],
+            event_id=event_id,
             quantity=quantity,
-            total_amount=total_amount,
-            status='confirmed'
+            total_cents=total_cents,
+            status='confirmed',
+            applied_tier=quote.tier,
+            # Naive UTC, as SQLite returns it, so this response matches later reads
+            booking_date=datetime.now(timezone.utc).replace(tzinfo=None)
         )
         
         db.session.add(booking)
+        db.session.flush()
+        booking_id = booking.id  # booking is expired by the commit below
+        ledger.book(booking)
+        ticket_ids = tickets.issue(booking_id, event_id, quantity)
+        jobs.publish('booking.created', {'booking_id': booking_id, 'action': 'confirmed'})
         
-        # Update event availability
-        event.update_availability()
+        row = (tuple(getattr(booking, column.key) for column in BOOKING_COLUMNS)
+               + event_row(event, available)
+               + tuple(getattr(current_user, name) for name in USER_FIELDS))
+        codes = [tickets.ticket_code(gate.key, event_id, ticket_id) for ticket_id in ticket_ids]
+        body = encode_message('Booking created successfully', booking=encode_booking(row),
+                              tickets=dumps(codes))
         
-        db.session.commit()
+        if idempotency_key is not None:
+            idempotency.remember(current_user.id, idempotency_key, request_hash, 201, body,
+                                 config.IDEMPOTENCY_TTL_HOURS)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent request with the same key won the race; return its response
+            db.session.rollback()
+            if idempotency_key is None:
+                raise
+            try:
+                stored = idempotency.lookup(current_user.id, idempotency_key, request_hash,
+                                            config.IDEMPOTENCY_TTL_HOURS)
+            except ValueError as e:
+                return jsonify({'message': str(e)}), 422
+            if stored is None:
+                raise
+            return json_response(stored[1], stored[0])
+        
+        gate.added(event_id, ticket_ids)
+        invalidate_cached(event_id)
+        replicas.mark_write(current_user.id)
+        ledger.committed(event_id, 2, config.LEDGER_SNAPSHOT_INTERVAL)
+        logs.audit('booking.created', user_id=current_user.id, booking_id=booking_id, event_id=event_id,
+                   quantity=quantity, total_cents=total_cents, tier=quote.tier)
+        if idempotency_key is not None:
+            idempotency.purge_expired(config.IDEMPOTENCY_TTL_HOURS, config.IDEMPOTENCY_PURGE_INTERVAL)
         
-        return jsonify({'message': 'Booking created successfully', 'booking': booking.to_dict()}), 201
+        return json_response(body, 201)
     
     except Exception as e:
         return jsonify({'message': f'Failed to create booking: {str(e)}'}), 500
 
 @app.route('/api/bookings', methods=['GET'])
 @token_required
+@rate_limited('bookings')
 def get_user_bookings(current_user):
     """Get user's bookings"""
     try:
-        bookings = Booking.query.filter_by(user_id=current_user.id).all()
-        return jsonify([booking.to_dict() for booking in bookings]), 200
+        rows = replicas.execute(bookings_query().where(Booking.user_id == current_user.id),
+                                current_user.id)
+        body = encode_bookings(rows)
+        if include_archived():
+            user_row = tuple(getattr(current_user, name) for name in USER_FIELDS)
+            archived = db.session.execute(
+                archived_bookings_query().where(ArchivedBooking.user_id == current_user.id)
+            )
+            body = join_arrays(encode_bookings(tuple(row) + user_row for row in archived), body)
+        return json_response(body)
     except Exception as e:
         return jsonify({'message': f'Failed to fetch bookings: {str(e)}'}), 500
 
 @app.route('/api/bookings/<int:booking_id>', methods=['DELETE'])
 @token_required
+@rate_limited('bookings')
 def cancel_booking(current_user, booking_id):
     """Cancel a booking"""
     try:
-        booking = Booking.query.get_or_404(booking_id)
+        # Flip confirmed -> cancelled only if it is still confirmed and owned by the caller
+        cancelled = db.session.execute(
+            db.update(Booking)
+            .where(Booking.id == booking_id, Booking.user_id == current_user.id,
+                   Booking.status == 'confirmed')
+            .values(status='cancelled')
+            .returning(Booking.event_id, Booking.quantity, Booking.total_cents)
+        ).first()
         
-        if booking.user_id != current_user.id:
-            return jsonify({'message': 'Access denied'}), 403
-        
-        if booking.status == 'cancelled':
-            return jsonify({'message': 'Booking already cancelled'}), 400
+        if cancelled is None:
+            db.session.rollback()
+            booking = db.session.execute(
+                db.select(Booking.user_id, Booking.status).where(Booking.id == booking_id)
+            ).first()
+            if booking is None:
+                return jsonify({'message': 'Booking not found'}), 404
+            if booking.user_id != current_user.id:
+                return jsonify({'message': 'Access denied'}), 403
+            if booking.status == 'cancelled':
+                return jsonify({'message': 'Booking already cancelled'}), 400
+            return jsonify({'message': f'Booking cannot be cancelled ({booking.status})'}), 400
         
-        booking.status = 'cancelled'
-        
-        # Update event availability
-        booking.event.update_availability()
+        # Release the seats back to the event counter
+        db.session.execute(
+            db.update(Event)
+            .where(Event.id == cancelled.event_id)
+            .values(available_tickets=Event.available_tickets + cancelled.quantity)
+        )
+        ledger.append([ledger.entry(ledger.CANCEL, cancelled.event_id, booking_id, current_user.id,
+                                    cancelled.quantity, cancelled.total_cents)])
+        quotas.release(cancelled.event_id, {current_user.id: cancelled.quantity})
+        voided = tickets.void([booking_id])
+        jobs.publish('booking.cancelled', {'booking_id': booking_id, 'action': 'cancelled'})
         
         db.session.commit()
+        gate.voided(voided)
+        invalidate_cached(cancelled.event_id)
+        replicas.mark_write(current_user.id)
+        ledger.committed(cancelled.event_id, 1, config.LEDGER_SNAPSHOT_INTERVAL)
+        logs.audit('booking.cancelled', user_id=current_user.id, booking_id=booking_id,
+                   event_id=cancelled.event_id, quantity=cancelled.quantity, total_cents=cancelled.total_cents)
         
         return jsonify({'message': 'Booking cancelled successfully'}), 200
     
     except Exception as e:
         return jsonify({'message': f'Failed to cancel booking: {str(e)}'}), 500
 
+@app.route('/api/events/<int:event_id>/bookings', methods=['DELETE'])
+@token_required
+@rate_limited('default')
+def cancel_event_bookings(current_user, event_id):
+    """Cancel every confirmed booking of an event (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'message': 'Admin access required'}), 403
+        
+        if event_cache.get(event_id) is None:
+            return jsonify({'message': 'Event not found'}), 404
+        
+        cancelled_bookings = 0
+        released_tickets = 0
+        refunded_cents = 0
+        
+        # One short transaction per batch so bookings on other events are not held up
+        while True:
+            batch = db.session.execute(
+                db.select(Booking.id)
+                .where(Booking.event_id == event_id, Booking.status == 'confirmed')
+                .limit(config.BULK_CANCEL_BATCH_SIZE)
+            ).scalars().all()
+            if not batch:
+                break
+            
+            rows = db.session.execute(
+                db.update(Booking)
+                .where(Booking.id.in_(batch), Booking.status == 'confirmed')
+                .values(status='cancelled')
+                .returning(Booking.id, Booking.user_id, Booking.quantity, Booking.total_cents)
+            ).all()
+            quantity = sum(row.quantity for row in rows)
+            db.session.execute(
+                db.update(Event)
+                .where(Event.id == event_id)
+                .values(available_tickets=Event.available_tickets + quantity)
+            )
+            ledger.append([ledger.entry(ledger.CANCEL, event_id, row.id, row.user_id,
+                                        row.quantity, row.total_cents) for row in rows])
+            released = {}
+            for row in rows:
+                released[row.user_id] = released.get(row.user_id, 0) + row.quantity
+            quotas.release(event_id, released)
+            voided = tickets.void([row.id for row in rows])
+            jobs.publish_many('booking.cancelled', [{'booking_id': row.id, 'action': 'cancelled'}
+                                                    for row in rows])
+            db.session.commit()
+            gate.voided(voided)
+            invalidate_cached(event_id)
+            replicas.mark_write(current_user.id)
+            ledger.committed(event_id, len(rows), config.LEDGER_SNAPSHOT_INTERVAL)
+            for row in rows:
+                logs.audit('booking.cancelled', user_id=row.user_id, booking_id=row.id, event_id=event_id,
+                           quantity=row.quantity, total_cents=row.total_cents, by=current_user.id)
+            
+            cancelled_bookings += len(rows)
+            released_tickets += quantity
+            refunded_cents += sum(row.total_cents for row in rows)
+        
+        return jsonify({
+            'message': 'Event bookings cancelled successfully',
+            'cancelled_bookings': cancelled_bookings,
+            'released_tickets': released_tickets,
+            'refunded_amount': from_cents(refunded_cents)
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to cancel event bookings: {str(e)}'}), 500
+
+@app.route('/api/bookings/<int:booking_id>/tickets', methods=['GET'])
+@token_required
+@rate_limited('bookings')
+def get_booking_tickets(current_user, booking_id):
+    """Signed ticket codes of one of the caller's bookings"""
+    try:
+        booking = db.session.execute(
+            db.select(Booking.user_id, Booking.event_id).where(Booking.id == booking_id)
+        ).first()
+        if booking is None:
+            return jsonify({'message': 'Booking not found'}), 404
+        if booking.user_id != current_user.id and not current_user.is_admin:
+            return jsonify({'message': 'Access denied'}), 403
+        
+        rows = db.session.execute(
+            db.select(Ticket.id, Ticket.status, Ticket.used_at)
+            .where(Ticket.booking_id == booking_id).order_by(Ticket.id)
+        ).all()
+        return jsonify([{
+            'code': tickets.ticket_code(gate.key, booking.event_id, row.id),
+            'status': row.status,
+            'used_at': row.used_at.isoformat() if row.used_at else None
+        } for row in rows]), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to fetch tickets: {str(e)}'}), 500
+
+SCAN_RESPONSES = {
+    tickets.ACCEPTED: ('Ticket accepted', 200),
+    tickets.ALREADY_USED: ('Ticket already used', 409),
+    tickets.INVALID: ('Invalid ticket code', 400),
+    tickets.WRONG_EVENT: ('Ticket is for a different event', 400),
+    tickets.UNKNOWN: ('Ticket not found or cancelled', 404),
+}
+
+@app.route('/api/events/<int:event_id>/scan', methods=['POST'])
+@token_required
+def scan_ticket(current_user, event_id):
+    """Admit a ticket at the gate, rejecting forged, cancelled and reused codes (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'message': 'Admin access required'}), 403
+        
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data.get('code'), str):
+            return jsonify({'message': 'Missing required field: code'}), 400
+        
+        outcome, ticket_id = gate.scan(event_id, data['code'].strip())
+        message, status = SCAN_RESPONSES[outcome]
+        return jsonify({'message': message, 'result': outcome, 'ticket_id': ticket_id}), status
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to scan ticket: {str(e)}'}), 500
+
+@app.route('/api/events/<int:event_id>/gate-export', methods=['GET'])
+@token_required
+@rate_limited('default')
+def export_gate_list(current_user, event_id):
+    """Packed list of admissible ticket digests for offline gate devices (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'message': 'Admin access required'}), 403
+        
+        if event_cache.get(event_id) is None:
+            return jsonify({'message': 'Event not found'}), 404
+        
+        payload = gate.export(event_id)
+        response = app.response_class(payload, mimetype='application/octet-stream')
+        response.headers['Content-Disposition'] = f'attachment; filename=event-{event_id}-gate.bin'
+        response.headers['X-Ticket-Count'] = str(len(payload) // 8)
+        return response
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to export gate list: {str(e)}'}), 500
+
+def from_cluster():
+    """Whether the current request comes from the router or another node"""
+    expected = app.config['SHARD_INTERNAL_KEY']
+    if app.config['SHARD_COUNT'] <= 1 or not expected:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Internal-Key', ''), expected)
+
+def internal_required(f):
+    """Restrict a route to other nodes of a sharded deployment"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not from_cluster():
+            return jsonify({'message': 'Access denied'}), 403
+        return f(*args, **kwargs)
+    return decorated
+
+def exported_user(user):
+    return dict(user.to_dict(), password_hash=user.password_hash, token_epoch=user.token_epoch)
+
+@app.route('/api/internal/users/<int:user_id>', methods=['GET'])
+@internal_required
+def export_user(user_id):
+    """Full user row (including password hash) for replication to other nodes"""
+    user = db.session.get(User, user_id)
+    if user is None:
+        return jsonify({'message': 'User not found'}), 404
+    return jsonify(exported_user(user)), 200
+
+@app.route('/api/internal/users', methods=['GET'])
+@internal_required
+def export_users():
+    """Full user rows for ?ids=1,2,3, for replicating bulk-provisioned users"""
+    try:
+        ids = [int(user_id) for user_id in request.args.get('ids', '').split(',') if user_id]
+    except ValueError:
+        return jsonify({'message': 'Invalid ids'}), 400
+    users = db.session.execute(db.select(User).where(User.id.in_(ids))).scalars()
+    return jsonify([exported_user(user) for user in users]), 200
+
+@app.route('/api/internal/users', methods=['POST'])
+@internal_required
+def import_user():
+    """Store users replicated from the home node (one object or a list), keeping their ids"""
+    try:
+        data = request.get_json()
+        added = False
+        revoked = []
+        for item in data if isinstance(data, list) else [data]:
+            epoch = item.get('token_epoch', 0)
+            user = db.session.get(User, item['id'])
+            if user is None:
+                db.session.add(User(
+                    id=item['id'],
+                    username=item['username'],
+                    email=item['email'],
+                    password_hash=item['password_hash'],
+                    is_admin=item.get('is_admin', False),
+                    token_epoch=epoch
+                ))
+                added = True
+            elif user.password_hash != item['password_hash'] or user.token_epoch < epoch:
+                # Password changed or sessions revoked on the home node
+                user.password_hash = item['password_hash']
+                user.token_epoch = max(user.token_epoch, epoch)
+                revoked.append((user.id, user.token_epoch))
+        db.session.commit()
+        for user_id, epoch in revoked:
+            revocations.revoke(user_id, epoch)
+        if added:
+            cache.invalidate('stats')
+        return jsonify({'message': 'User replicated'}), 200
+    except Exception as e:
+        return jsonify({'message': f'Failed to replicate user: {str(e)}'}), 500
+
 @app.route('/api/stats', methods=['GET'])
 @token_required
+@rate_limited('default')
 def get_stats(current_user):
     """Get system statistics (admin only)"""
     try:
         if not current_user.is_admin:
             return jsonify({'message': 'Admin access required'}), 403
         
-        total_users = User.query.count()
-        total_events = Event.query.count()
-        total_bookings = Booking.query.filter_by(status='confirmed').count()
-        total_revenue = db.session.query(db.func.sum(Booking.total_amount)).filter(
-            Booking.status == 'confirmed'
-        ).scalar() or 0
+        def load():
+            total_users = replicas.execute(db.select(db.func.count(User.id)), current_user.id).scalar()
+            total_events = replicas.execute(db.select(db.func.count(Event.id)), current_user.id).scalar()
+            total_bookings, total_revenue = replicas.execute(
+                db.select(db.func.count(Booking.id), db.func.sum(Booking.total_cents))
+                .where(Booking.status == 'confirmed'),
+                current_user.id
+            ).one()
+            archived_events, archived_bookings, archived_revenue = db.session.execute(
+                archive.totals_query()
+            ).one()
+            revenue_cents = (total_revenue or 0) + archived_revenue
+            return dumps({
+                'total_users': total_users,
+                'total_events': total_events + archived_events,
+                'total_bookings': total_bookings + archived_bookings,
+                'total_revenue': from_cents(revenue_cents),
+                'total_revenue_cents': revenue_cents
+            })
         
-        return jsonify({
-            'total_users': total_users,
-            'total_events': total_events,
-            'total_bookings': total_bookings,
-            'total_revenue': total_revenue
-        }), 200
+        return json_response(cache.get_or_set('stats', load))
     
     except Exception as e:
         return jsonify({'message': f'Failed to fetch stats: {str(e)}'}), 500
 
+@app.route('/api/backups', methods=['POST'])
+@token_required
+@rate_limited('default')
+def create_backup(current_user):
+    """Take an online backup of the databases (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'message': 'Admin access required'}), 403
+        
+        try:
+            result = backup.create_backup(backup.backup_dir(app))
+        except backup.BackupInProgress as e:
+            return jsonify({'message': str(e)}), 409
+        return jsonify({'message': 'Backup created successfully', 'backup': result}), 201
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to create backup: {str(e)}'}), 500
+
+@app.route('/api/backups', methods=['GET'])
+@token_required
+@rate_limited('default')
+def get_backups(current_user):
+    """Names of the kept backups, newest first (admin only)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'message': 'Admin access required'}), 403
+        
+        return jsonify({'backups': backup.list_backups(backup.backup_dir(app))}), 200
+    
+    except Exception as e:
+        return jsonify({'message': f'Failed to list backups: {str(e)}'}), 500
+
 def init_db():
-    """Initialize database with sample data"""
+    """Initialize database with sample data.
+
+    Cheap when the schema is already current: a single PRAGMA read, with no
+    create_all, seeding queries or password hashing.
+    """
     with app.app_context():
-        db.create_all()
-        
-        # Create admin user
-        admin = User(username='admin', email='admin@tickets.com', is_admin=True)
-        admin.set_password('admin123')
+        if upgrade_schema() is None:
+            return
         
-        # Check if admin already exists
-        if not User.query.filter_by(username='admin').first():
+        # Create admin user (hashing only when it is actually missing)
+        admin = User.query.filter_by(username='admin').first()
+        if not admin:
+            admin = User(username='admin', email='admin@tickets.com', is_admin=True)
+            admin.set_password('admin123')
             db.session.add(admin)
             db.session.commit()
             print("Admin user created: username=admin, password=admin123")
         
-        # Create sample events
-        if Event.query.count() == 0:
+        # Create sample events (on the first node only when sharded)
+        if app.config['SHARD_INDEX'] == 0 and Event.query.count() == 0:
             sample_events = [
                 Event(
                     name='Concert Night',
@@ -285,7 +1175,7 @@ def init_db():
                     event_date=datetime.now() + timedelta(days=30),
                     total_tickets=100,
                     available_tickets=100,
-                    price_per_ticket=50.0,
+                    price_cents=5000,
                     created_by=admin.id
                 ),
                 Event(
@@ -295,7 +1185,7 @@ def init_db():
                     event_date=datetime.now() + timedelta(days=45),
                     total_tickets=200,
                     available_tickets=200,
-                    price_per_ticket=75.0,
+                    price_cents=7500,
                     created_by=admin.id
                 ),
                 Event(
@@ -305,33 +1195,66 @@ def init_db():
                     event_date=datetime.now() + timedelta(days=60),
                     total_tickets=500,
                     available_tickets=500,
-                    price_per_ticket=30.0,
+                    price_cents=3000,
                     created_by=admin.id
                 )
             ]
             
             for event in sample_events:
+                event.id = allocate_id(app, Event)
                 db.session.add(event)
+                db.session.flush()
             
             db.session.commit()
             print("Sample events created")
 
-if __name__ == '__main__':
-    import sys
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ticket Reservation Server')
+    parser.add_argument('--init-db', action='store_true', help='initialize the database and exit')
+    parser.add_argument('--recover-ledger', action='store_true',
+                        help='rebuild event availability from ledger snapshots and exit')
+    parser.add_argument('--compact-ledger', action='store_true',
+                        help='snapshot every event, drop covered ledger entries and exit')
+    parser.add_argument('--archive-events', action='store_true',
+                        help='move events past ARCHIVE_AFTER_DAYS and their bookings to the archive and exit')
+    parser.add_argument('--host', default=config.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=config.SERVER_PORT)
+    parser.add_argument('--shard-index', type=int, default=app.config['SHARD_INDEX'],
+                        help='index of this node in a sharded deployment')
+    parser.add_argument('--shard-count', type=int, default=app.config['SHARD_COUNT'],
+                        help='number of nodes in a sharded deployment')
+    parser.add_argument('--behind-router', action='store_true', default=config.SHARD_BEHIND_ROUTER,
+                        help='trust X-Forwarded-For; only when clients can reach this node solely through router.py')
+    args = parser.parse_args(argv)
+    configure_sharding(args.shard_index, args.shard_count, args.behind_router)
     
-    if len(sys.argv) > 1 and sys.argv[1] == '--init-db':
-        init_db()
+    # Initialize database
+    init_db()
+    if args.init_db:
         print("Database initialized successfully!")
-    else:
-        # Initialize database
-        init_db()
-        
-        # SSL context
-        ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-        ssl_context.load_cert_chain('cert.pem', 'key.pem')
-        
-        print("Starting Ticket Reservation Server...")
-        print("Server will be available at: https://localhost:8443")
-        print("For LAN access, use: https://<server-ip>:8443")
-        
-        app.run(host='0.0.0.0', port=8443, ssl_context=ssl_context, debug=True)
+        return
+    if args.recover_ledger:
+        with app.app_context():
+            print(f"Ledger replayed: {ledger.recover()} event(s) repaired")
+        return
+    if args.compact_ledger:
+        with app.app_context():
+            print(f"Ledger compacted: {ledger.compact()} entries removed")
+        return
+    if args.archive_events:
+        with app.app_context():
+            event_ids, booking_count = archive.archive_past_events(config.ARCHIVE_AFTER_DAYS,
+                                                                   config.ARCHIVE_BATCH_SIZE)
+            cache.invalidate('events:list', 'events:archived', 'stats',
+                             *(f'event:{event_id}' for event_id in event_ids))
+            print(f"Archived {len(event_ids)} event(s) and {booking_count} booking(s)")
+        return
+    
+    print("Starting Ticket Reservation Server...")
+    print(f"Server will be available at: https://localhost:{args.port}")
+    print(f"For LAN access, use: https://<server-ip>:{args.port}")
+    
+    serve(args.host, args.port)
+
+if __name__ == '__main__':
+    main()
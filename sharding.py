@@ -0,0 +1,27 @@
+"""
+Event-id sharding for multi-node deployments.
+
+Node ``i`` of ``n`` owns every event and booking whose id satisfies
+``id % n == i``, so the router can find the owning node from an id alone.
+Users are created on node 0 and replicated to the other nodes with the same
+id, which keeps JWTs valid everywhere.
+"""
+
+from models import db
+
+def owner(entity_id, shard_count):
+    """Index of the node that owns entity_id"""
+    return int(entity_id) % shard_count
+
+def next_id(model, shard_index, shard_count):
+    """Smallest id above the current maximum that belongs to this shard"""
+    max_id = db.session.execute(db.select(db.func.max(model.id))).scalar() or 0
+    candidate = max_id + 1
+    return candidate + (shard_index - candidate) % shard_count
+
+def allocate_id(app, model):
+    """Id for a new row of model on this node, or None to let SQLite assign it"""
+    shard_count = app.config['SHARD_COUNT']
+    if shard_count <= 1:
+        return None
+    return next_id(model, app.config['SHARD_INDEX'], shard_count)
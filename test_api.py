@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Behaviour tests for sessions, bookings and search.
+
+Run against a local server started with ``python run_server.py`` (the
+admin / admin123 account must exist). Each test creates its own users
+and events, so the script can be run repeatedly.
+"""
+
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import requests
+import urllib3
+
+import config
+from ticket_client import TicketClient, APIError
+
+# Disable SSL warnings for self-signed certificates
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+SERVER_URL = "https://localhost:8443"
+BASE_URL = SERVER_URL + "/api"
+
+def api(method, path, token=None, headers=None, **kwargs):
+    """Send a request to the API with an optional bearer token, waiting out rate limits"""
+    headers = dict(headers or {})
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    while True:
+        response = requests.request(method, BASE_URL + path, headers=headers, verify=False, timeout=30, **kwargs)
+        if response.status_code != 429:
+            return response
+        time.sleep(float(response.headers.get('Retry-After', 1)))
+
+def check(condition, message):
+    print(f"{'✓' if condition else '✗'} {message}")
+    return condition
+
+def new_user():
+    """Register a fresh user and return (username, password, login response)"""
+    username = f"test_{uuid.uuid4().hex[:10]}"
+    password = "testpass123"
+    api('POST', '/register', json={'username': username, 'email': f'{username}@example.com',
+                                   'password': password}).raise_for_status()
+    response = api('POST', '/login', json={'username': username, 'password': password})
+    response.raise_for_status()
+    return username, password, response.json()
+
+def admin_token():
+    response = api('POST', '/login', json={'username': 'admin', 'password': 'admin123'})
+    response.raise_for_status()
+    return response.json()['token']
+
+def create_event(token, total_tickets=100, **fields):
+    event = {'name': f'Test event {uuid.uuid4().hex[:6]}', 'venue': 'Test Hall',
+             'event_date': (datetime.now() + timedelta(days=60)).isoformat(),
+             'total_tickets': total_tickets, 'price_per_ticket': 10}
+    event.update(fields)
+    response = api('POST', '/events', token, json=event)
+    response.raise_for_status()
+    return response.json()['event']['id']
+
+def expired_copy(token):
+    """The same claims as token, signed with the server's key but already expired"""
+    claims = jwt.decode(token, options={'verify_signature': False})
+    claims['exp'] = datetime.now(timezone.utc) - timedelta(minutes=1)
+    return jwt.encode(claims, config.SECRET_KEY, algorithm='HS256')
+
+def test_duplicate_accounts():
+    """Taken usernames and emails are reported on registration and skipped by bulk provisioning"""
+    username, _, _ = new_user()
+    taken_name = api('POST', '/register', json={'username': username, 'email': f'other_{username}@example.com',
+                                                'password': 'testpass123'})
+    ok = check(taken_name.status_code == 400 and taken_name.json()['message'] == 'Username already exists',
+               f"Taken username is refused ({taken_name.status_code} {taken_name.json().get('message')!r})")
+    taken_email = api('POST', '/register', json={'username': f'other_{username}', 'email': f'{username}@example.com',
+                                                 'password': 'testpass123'})
+    ok &= check(taken_email.status_code == 400 and taken_email.json()['message'] == 'Email already exists',
+                f"Taken email is refused ({taken_email.status_code} {taken_email.json().get('message')!r})")
+
+    fresh = f"bulk_{uuid.uuid4().hex[:10]}"
+    users = [{'username': fresh, 'email': f'{fresh}@example.com', 'password': 'testpass123'},
+             {'username': username, 'email': f'bulk_{username}@example.com', 'password': 'testpass123'}]
+    response = api('POST', '/users/bulk', admin_token(), json={'users': users})
+    ok &= check(response.status_code == 200, "Bulk provisioning succeeds")
+    if response.status_code == 200:
+        result = response.json()
+        ok &= check(result['created'] == 1 and [user['username'] for user in result['users']] == [fresh],
+                    "The new user is created")
+        ok &= check(result['skipped'] == [{'username': username, 'message': 'Username already exists'}],
+                    f"The existing user is skipped with a reason ({result['skipped']})")
+        login = api('POST', '/login', json={'username': fresh, 'password': 'testpass123'})
+        ok &= check(login.status_code == 200, "Provisioned user can log in")
+    return ok
+
+def test_refresh_rotation():
+    """A refresh token can be used once and yields a new pair"""
+    _, _, session = new_user()
+    first = api('POST', '/token/refresh', json={'refresh_token': session['refresh_token']})
+    ok = check(first.status_code == 200, "Refresh token is exchanged for a new pair")
+    if not ok:
+        return False
+    rotated = first.json()
+    ok &= check(rotated['refresh_token'] != session['refresh_token'], "Refresh token is rotated")
+    ok &= check(api('GET', '/bookings', rotated['token']).status_code == 200, "New access token works")
+    return ok
+
+def test_refresh_reuse_revokes():
+    """Presenting a rotated refresh token ends every session of the user"""
+    _, _, session = new_user()
+    rotated = api('POST', '/token/refresh', json={'refresh_token': session['refresh_token']}).json()
+    reused = api('POST', '/token/refresh', json={'refresh_token': session['refresh_token']})
+    ok = check(reused.status_code == 401, "Reused refresh token is refused")
+    ok &= check(api('GET', '/bookings', rotated['token']).status_code == 401,
+                "Access tokens issued before the reuse are revoked")
+    ok &= check(api('POST', '/token/refresh', json={'refresh_token': rotated['refresh_token']}).status_code == 401,
+                "Refresh tokens issued before the reuse are revoked")
+    return ok
+
+def test_concurrent_renewal():
+    """Concurrent requests with an expired access token refresh it only once"""
+    _, _, session = new_user()
+    event_id = create_event(admin_token())
+    # No password, so the client can only renew through the refresh token
+    client = TicketClient(SERVER_URL, verify=False)
+    client.token = expired_copy(session['token'])
+    client.refresh_token = session['refresh_token']
+    results = client.book_many([(event_id, 1)] * 8)
+    failures = [result for result in results if isinstance(result, APIError)]
+    ok = check(not failures, f"8 concurrent bookings with an expired token succeed ({len(failures)} failed)")
+    try:
+        client.bookings()
+        ok &= check(True, "Session is still valid after the concurrent renewal")
+    except APIError as e:
+        ok &= check(False, f"Session is still valid after the concurrent renewal ({e.message})")
+    return ok
+
+def test_idempotent_booking():
+    """A retried booking replays its response; the key cannot be reused for another booking"""
+    _, _, session = new_user()
+    token = session['token']
+    event_id = create_event(admin_token())
+    headers = {'Idempotency-Key': uuid.uuid4().hex}
+    first = api('POST', '/bookings', token, headers=headers, json={'event_id': event_id, 'quantity': 2})
+    retry = api('POST', '/bookings', token, headers=headers, json={'event_id': event_id, 'quantity': 2})
+    ok = check(first.status_code == 201 and retry.status_code == 201, "Booking and its retry succeed")
+    ok &= check(first.content == retry.content, "Retry replays the original response")
+    event = api('GET', f'/events/{event_id}').json()
+    ok &= check(event['available_tickets'] == event['total_tickets'] - 2, "Seats are reserved once")
+    other = api('POST', '/bookings', token, headers=headers, json={'event_id': event_id, 'quantity': 3})
+    ok &= check(other.status_code == 422, "Reusing the key for a different booking is refused")
+    return ok
+
+def test_purchase_limit():
+    """A user cannot hold more than the per-event limit, and cancelling frees it"""
+    limit = config.MAX_TICKETS_PER_USER_PER_EVENT
+    if limit is None:
+        return check(True, "No purchase limit configured")
+    _, _, session = new_user()
+    token = session['token']
+    event_id = create_event(admin_token(), total_tickets=limit * 3)
+    first = api('POST', '/bookings', token, json={'event_id': event_id, 'quantity': limit - 1})
+    ok = check(first.status_code == 201, f"Booking {limit - 1} tickets succeeds")
+    over = api('POST', '/bookings', token, json={'event_id': event_id, 'quantity': 2})
+    ok &= check(over.status_code == 400, "Booking past the limit is refused")
+    if first.status_code == 201:
+        api('DELETE', f"/bookings/{first.json()['booking']['id']}", token)
+    full = api('POST', '/bookings', token, json={'event_id': event_id, 'quantity': limit})
+    ok &= check(full.status_code == 201, "Cancelled tickets count against the limit no longer")
+    return ok
+
+def test_event_update():
+    """Event edits need a current ETag and move availability by the capacity change"""
+    token = admin_token()
+    _, _, session = new_user()
+    event_id = create_event(token, total_tickets=20)
+    api('POST', '/bookings', session['token'], json={'event_id': event_id, 'quantity': 5}).raise_for_status()
+    etag = api('GET', f'/events/{event_id}').headers.get('ETag')
+    ok = check(bool(etag), f"Event detail carries an ETag ({etag})")
+
+    def patch(fields, if_match=None):
+        headers = {'If-Match': if_match} if if_match is not None else {}
+        return api('PATCH', f'/events/{event_id}', token, headers=headers, json=fields)
+
+    ok &= check(patch({'total_tickets': 30}).status_code == 428, "Edit without If-Match is refused (428)")
+    ok &= check(patch({'total_tickets': 30}, f'W/{etag}').status_code == 412, "Weak ETag does not match (412)")
+    ok &= check(patch({'description': {'a': 1}}, etag).status_code == 400, "Non-string description is refused")
+    ok &= check(patch({'total_tickets': True}, etag).status_code == 400, "Boolean total_tickets is refused")
+    resized = patch({'total_tickets': 30}, etag)
+    ok &= check(resized.status_code == 200, "Edit with the current ETag succeeds")
+    if resized.status_code == 200:
+        event = resized.json()['event']
+        ok &= check(event['total_tickets'] == 30 and event['available_tickets'] == 25,
+                    f"Availability moves by the capacity change ({event['available_tickets']} available)")
+        ok &= check(patch({'venue': 'Elsewhere'}, etag).status_code == 412, "Stale ETag is refused (412)")
+        shrink = patch({'total_tickets': 4}, resized.headers.get('ETag'))
+        ok &= check(shrink.status_code == 400, "Capacity below the tickets sold is refused (400)")
+    return ok
+
+def test_tiered_pricing():
+    """Bookings are priced at the demand tier in force when they start"""
+    token = admin_token()
+    _, _, session = new_user()
+    event_id = create_event(token, total_tickets=50)
+    tiers = [{'name': 'standard', 'price': 12.5, 'min_sold': 0},
+             {'name': 'high demand', 'price': 20.1, 'min_sold': 3}]
+    ok = check(api('PUT', f'/events/{event_id}/pricing', token, json={'tiers': tiers}).status_code == 200,
+               "Price tiers are set")
+    # The second booking crosses the min_sold=3 boundary, so it is still priced as standard
+    for quantity, tier, amount in ((2, 'standard', 25.0), (2, 'standard', 25.0), (1, 'high demand', 20.1)):
+        booking = api('POST', '/bookings', session['token'],
+                      json={'event_id': event_id, 'quantity': quantity}).json()['booking']
+        ok &= check(booking['applied_tier'] == tier and booking['total_amount'] == amount,
+                    f"{quantity} ticket(s) cost {booking['total_amount']} at tier {booking['applied_tier']!r} "
+                    f"(expected {amount} at {tier!r})")
+    pricing = api('GET', f'/events/{event_id}/pricing').json()
+    ok &= check(pricing['current_tier'] == 'high demand' and pricing['current_price'] == 20.1,
+                "Current price reflects tickets sold")
+    return ok
+
+def test_gate_scanning():
+    """Signed ticket codes are admitted once; forged, misplaced and cancelled ones are refused"""
+    token = admin_token()
+    _, _, session = new_user()
+    event_id = create_event(token)
+    other_event_id = create_event(token)
+    kept = api('POST', '/bookings', session['token'], json={'event_id': event_id, 'quantity': 2}).json()
+    dropped = api('POST', '/bookings', session['token'], json={'event_id': event_id, 'quantity': 1}).json()
+    first, second = kept['tickets']
+
+    def scan(code, at=event_id):
+        return api('POST', f'/events/{at}/scan', token, json={'code': code})
+
+    admitted = scan(first)
+    ok = check(admitted.status_code == 200 and admitted.json()['result'] == 'accepted', "Valid ticket is admitted")
+    again = scan(first)
+    ok &= check(again.status_code == 409 and again.json()['result'] == 'already_used', "Second scan is refused (409)")
+    forged = second[:-1] + ('A' if second[-1] != 'A' else 'B')
+    ok &= check(scan(forged).json().get('result') == 'invalid', "Forged signature is refused")
+    ok &= check(scan(second, other_event_id).json().get('result') == 'wrong_event',
+                "Ticket for another event is refused")
+    api('DELETE', f"/bookings/{dropped['booking']['id']}", session['token']).raise_for_status()
+    cancelled = scan(dropped['tickets'][0])
+    ok &= check(cancelled.status_code == 404 and cancelled.json()['result'] == 'unknown',
+                "Ticket of a cancelled booking is refused (404)")
+    ok &= check(scan(second).status_code == 200, "Other tickets of the booking are still admitted")
+    return ok
+
+def test_bulk_cancellation():
+    """Cancelling an event's bookings cancels every one, frees the seats and updates stats"""
+    token = admin_token()
+    event_id = create_event(token, total_tickets=40)
+    sessions = [new_user()[2]['token'] for _ in range(2)]
+    for user_token, quantity in zip(sessions, (3, 2)):
+        api('POST', '/bookings', user_token, json={'event_id': event_id, 'quantity': quantity}).raise_for_status()
+    before = api('GET', '/stats', token).json()
+    response = api('DELETE', f'/events/{event_id}/bookings', token)
+    ok = check(response.status_code == 200, "Bulk cancellation succeeds")
+    if not ok:
+        return False
+    result = response.json()
+    ok &= check(result['cancelled_bookings'] == 2 and result['released_tickets'] == 5
+                and result['refunded_amount'] == 50.0, f"Both bookings are cancelled and refunded ({result})")
+    statuses = [booking['status'] for user_token in sessions
+                for booking in api('GET', '/bookings', user_token).json() if booking['event_id'] == event_id]
+    ok &= check(statuses == ['cancelled', 'cancelled'], f"Users see their bookings cancelled ({statuses})")
+    event = api('GET', f'/events/{event_id}').json()
+    ok &= check(event['available_tickets'] == 40, "Every seat is released")
+    after = api('GET', '/stats', token).json()
+    ok &= check(after['total_bookings'] == before['total_bookings'] - 2
+                and after['total_revenue_cents'] == before['total_revenue_cents'] - 5000,
+                "Stats drop the cancelled bookings and their revenue")
+    again = api('DELETE', f'/events/{event_id}/bookings', token).json()
+    ok &= check(again.get('cancelled_bookings') == 0, "Repeating the cancellation changes nothing")
+    return ok
+
+def test_search_totals():
+    """Search reports the number of matches and pages through them"""
+    token = admin_token()
+    word = f"zq{uuid.uuid4().hex[:8]}"
+    ids = {create_event(token, name=f'Concert {word} {i}') for i in range(3)}
+    first = api('GET', '/events/search', params={'q': word, 'per_page': 2})
+    ok = check(first.status_code == 200, "Search succeeds")
+    if not ok:
+        return False
+    first = first.json()
+    ok &= check(first['total'] == 3 and first['truncated'] is False,
+                f"Total counts every match ({first['total']}, truncated={first['truncated']})")
+    second = api('GET', '/events/search', params={'q': word, 'per_page': 2, 'page': 2}).json()
+    found = {event['id'] for event in first['events'] + second['events']}
+    ok &= check(len(first['events']) == 2 and found == ids, "Pages hold every match once")
+    return ok
+
+def test_archived_reads():
+    """Stats and archive-inclusive listings work whether or not anything was archived"""
+    token = admin_token()
+    stats = api('GET', '/stats', token)
+    ok = check(stats.status_code == 200, "Stats include the archive")
+    events = api('GET', '/events', params={'include_archived': 1})
+    ok &= check(events.status_code == 200, "Events with include_archived=1")
+    bookings = api('GET', '/bookings', token, params={'include_archived': 1})
+    ok &= check(bookings.status_code == 200, "Bookings with include_archived=1")
+    if ok:
+        ok &= check(stats.json()['total_events'] >= len(events.json()),
+                    "Stats count every live and archived event")
+    return ok
+
+def test_rate_limit():
+    """The login limiter answers 429 with Retry-After once its burst is used up"""
+    per_minute, burst = config.RATE_LIMITS['login']
+    if not config.RATE_LIMIT_ENABLED:
+        return check(True, "Rate limiting disabled")
+    credentials = {'username': f'nobody_{uuid.uuid4().hex[:8]}', 'password': 'wrong'}
+    statuses = []
+    # Sent without api(), which would wait out the 429
+    for _ in range(burst + 2):
+        response = requests.post(BASE_URL + '/login', json=credentials, verify=False, timeout=30)
+        statuses.append(response.status_code)
+        if response.status_code == 429:
+            break
+    ok = check(statuses[-1] == 429, f"Login is limited after its burst ({statuses})")
+    if ok:
+        retry_after = response.headers.get('Retry-After', '')
+        ok &= check(retry_after.isdigit() and 0 < int(retry_after) <= 60 / per_minute + 1,
+                    f"429 carries Retry-After ({retry_after!r} seconds)")
+    return ok
+
+TESTS = [
+    test_duplicate_accounts,
+    test_refresh_rotation,
+    test_refresh_reuse_revokes,
+    test_concurrent_renewal,
+    test_idempotent_booking,
+    test_purchase_limit,
+    test_event_update,
+    test_tiered_pricing,
+    test_gate_scanning,
+    test_bulk_cancellation,
+    test_search_totals,
+    test_archived_reads,
+    test_rate_limit,
+]
+
+def main():
+    """Run all tests; exit status 1 if any failed"""
+    print("=" * 50)
+    print("Ticket Reservation System - API Behaviour Tests")
+    print("=" * 50)
+    failed = 0
+    for index, test in enumerate(TESTS, 1):
+        print(f"\n{index}. {test.__doc__}")
+        try:
+            passed = test()
+        except Exception as e:
+            passed = check(False, f"{test.__name__} raised {e!r}")
+        failed += not passed
+    print(f"\n{len(TESTS) - failed} of {len(TESTS)} tests passed")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
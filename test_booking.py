@@ -5,11 +5,18 @@ Test booking functionality specifically
 
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Wait out the server's rate limits (429 + Retry-After) instead of failing
+session = requests.Session()
+session.mount('https://', HTTPAdapter(max_retries=Retry(total=10, connect=0, read=0, status_forcelist=[429],
+                                                        allowed_methods=None, raise_on_status=False)))
+
 def test_booking():
     """Test the booking functionality"""
     base_url = "https://localhost:8443/api"
@@ -17,7 +24,7 @@ def test_booking():
     # Login as admin
     print("1. Logging in as admin...")
     login_data = {"username": "admin", "password": "admin123"}
-    response = requests.post(f"{base_url}/login", json=login_data, verify=False)
+    response = session.post(f"{base_url}/login", json=login_data, verify=False)
     
     if response.status_code != 200:
         print(f"❌ Login failed: {response.text}")
@@ -29,7 +36,7 @@ def test_booking():
     
     # Get events
     print("\n2. Getting events...")
-    response = requests.get(f"{base_url}/events", verify=False)
+    response = session.get(f"{base_url}/events", verify=False)
     
     if response.status_code != 200:
         print(f"❌ Failed to get events: {response.text}")
@@ -55,7 +62,7 @@ def test_booking():
     }
     
     print(f"\n4. Attempting to book {booking_data['quantity']} ticket(s)...")
-    response = requests.post(f"{base_url}/bookings", json=booking_data, headers=headers, verify=False)
+    response = session.post(f"{base_url}/bookings", json=booking_data, headers=headers, verify=False)
     
     print(f"   Response status: {response.status_code}")
     print(f"   Response body: {response.text}")
@@ -73,14 +80,14 @@ def test_booking():
     # Test booking with invalid quantity
     print(f"\n5. Testing with invalid quantity (0)...")
     booking_data['quantity'] = 0
-    response = requests.post(f"{base_url}/bookings", json=booking_data, headers=headers, verify=False)
+    response = session.post(f"{base_url}/bookings", json=booking_data, headers=headers, verify=False)
     print(f"   Response status: {response.status_code}")
     print(f"   Response body: {response.text}")
     
     # Test booking with negative quantity
     print(f"\n6. Testing with negative quantity (-1)...")
     booking_data['quantity'] = -1
-    response = requests.post(f"{base_url}/bookings", json=booking_data, headers=headers, verify=False)
+    response = session.post(f"{base_url}/bookings", json=booking_data, headers=headers, verify=False)
     print(f"   Response status: {response.status_code}")
     print(f"   Response body: {response.text}")
 
@@ -5,16 +5,23 @@ Test script for Ticket Reservation System
 
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 from datetime import datetime
 
 # Disable SSL warnings for self-signed certificates
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Wait out the server's rate limits (429 + Retry-After) instead of failing
+session = requests.Session()
+session.mount('https://', HTTPAdapter(max_retries=Retry(total=10, connect=0, read=0, status_forcelist=[429],
+                                                        allowed_methods=None, raise_on_status=False)))
+
 def test_server_connection():
     """Test if server is running and accessible"""
     try:
-        response = requests.get("https://localhost:8443/api/events", verify=False, timeout=5)
+        response = session.get("https://localhost:8443/api/events", verify=False, timeout=5)
         if response.status_code == 200:
             print("✓ Server is running and accessible")
             return True
@@ -37,7 +44,7 @@ def test_user_registration():
             "password": "testpass123"
         }
         
-        response = requests.post("https://localhost:8443/api/register", 
+        response = session.post("https://localhost:8443/api/register", 
                                json=test_user, verify=False, timeout=5)
         
         if response.status_code == 201:
@@ -59,7 +66,7 @@ def test_user_login(user_data):
             "password": user_data["password"]
         }
         
-        response = requests.post("https://localhost:8443/api/login", 
+        response = session.post("https://localhost:8443/api/login", 
                                json=login_data, verify=False, timeout=5)
         
         if response.status_code == 200:
@@ -76,7 +83,7 @@ def test_user_login(user_data):
 def test_events_api():
     """Test events API"""
     try:
-        response = requests.get("https://localhost:8443/api/events", verify=False, timeout=5)
+        response = session.get("https://localhost:8443/api/events", verify=False, timeout=5)
         
         if response.status_code == 200:
             events = response.json()
@@ -97,7 +104,7 @@ def test_admin_login():
             "password": "admin123"
         }
         
-        response = requests.post("https://localhost:8443/api/login", 
+        response = session.post("https://localhost:8443/api/login", 
                                json=admin_data, verify=False, timeout=5)
         
         if response.status_code == 200:
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Command-line client for the Ticket Reservation System.
+
+Examples::
+
+    python ticket_cli.py events
+    python ticket_cli.py search "jazz lond"
+    python ticket_cli.py -u alice -p secret book 1 2
+    python ticket_cli.py -u alice -p secret cancel 7 8 9
+    python ticket_cli.py -u admin -p admin123 --json stats
+
+Credentials can also come from TICKET_USERNAME / TICKET_PASSWORD.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import config
+from ticket_client import TicketClient, APIError
+
+def print_events(events):
+    for event in events:
+        print(f"{event['id']:>6}  {event['name'][:30]:<30}  {event['venue'][:20]:<20}  "
+              f"{event['event_date'][:16]}  {event['available_tickets']:>6} left  "
+              f"${event['price_per_ticket']:.2f}")
+
+def print_search_results(result):
+    print_events(result['events'])
+    shown = len(result['events'])
+    first = (result['page'] - 1) * result['per_page']
+    print(f"{first + 1 if shown else 0}-{first + shown} of {result['total']} match(es)")
+
+def print_bookings(bookings):
+    for booking in bookings:
+        event = booking['event'] or {}
+        print(f"{booking['id']:>6}  {event.get('name', '?')[:30]:<30}  {booking['quantity']:>4} x  "
+              f"${booking['total_amount']:.2f}  {booking['status']}")
+
+def print_tickets(tickets):
+    for ticket in tickets:
+        print(f"{ticket['code']}  {ticket['status']}")
+
+def print_stats(stats):
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+
+def print_results(results, describe):
+    failed = 0
+    for item, result in results:
+        if isinstance(result, APIError):
+            failed += 1
+            print(f"{item}: failed ({result.status_code}): {result.message}")
+        else:
+            print(f"{item}: {describe(result)}")
+    return 1 if failed else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ticket Reservation command-line client')
+    parser.add_argument('--url', default=os.environ.get('TICKET_SERVER_URL', config.CLIENT_SERVER_URL))
+    parser.add_argument('-u', '--username', default=os.environ.get('TICKET_USERNAME'))
+    parser.add_argument('-p', '--password', default=os.environ.get('TICKET_PASSWORD'))
+    parser.add_argument('--json', action='store_true', help='print raw JSON responses')
+    commands = parser.add_subparsers(dest='command', required=True)
+    events = commands.add_parser('events', help='list events')
+    events.add_argument('--archived', action='store_true', help='include archived past events')
+    search = commands.add_parser('search', help='search events by name, description or venue')
+    search.add_argument('query')
+    search.add_argument('--page', type=int, default=1)
+    search.add_argument('--per-page', type=int, default=20)
+    bookings = commands.add_parser('bookings', help='list your bookings')
+    bookings.add_argument('--archived', action='store_true', help='include bookings of archived events')
+    book = commands.add_parser('book', help='book tickets')
+    book.add_argument('event_id', type=int)
+    book.add_argument('quantity', type=int)
+    book.add_argument('--count', type=int, default=1, help='number of separate bookings to make')
+    cancel = commands.add_parser('cancel', help='cancel bookings')
+    cancel.add_argument('booking_ids', type=int, nargs='+')
+    tickets = commands.add_parser('tickets', help='show the ticket codes of a booking')
+    tickets.add_argument('booking_id', type=int)
+    commands.add_parser('stats', help='show system statistics (admin)')
+    args = parser.parse_args(argv)
+
+    with TicketClient(args.url, args.username, args.password) as client:
+        try:
+            if args.command == 'events':
+                result = client.events(args.archived)
+                show = print_events
+            elif args.command == 'search':
+                result = client.search(args.query, args.page, args.per_page)
+                show = print_search_results
+            elif args.command == 'bookings':
+                result = client.bookings(args.archived)
+                show = print_bookings
+            elif args.command == 'book':
+                results = client.book_many([(args.event_id, args.quantity)] * args.count)
+                if args.json:
+                    print(json.dumps([getattr(r, 'message', r) for r in results], indent=2))
+                    return 0
+                return print_results(enumerate(results, 1),
+                                     lambda r: f"booking {r['booking']['id']}, tickets {', '.join(r['tickets'])}")
+            elif args.command == 'cancel':
+                results = client.cancel_many(args.booking_ids)
+                if args.json:
+                    print(json.dumps([getattr(r, 'message', r) for r in results], indent=2))
+                    return 0
+                return print_results(zip(args.booking_ids, results), lambda r: r['message'])
+            elif args.command == 'tickets':
+                result = client.tickets(args.booking_id)
+                show = print_tickets
+            else:
+                result = client.stats()
+                show = print_stats
+        except APIError as e:
+            print(f"Error ({e.status_code}): {e.message}", file=sys.stderr)
+            return 1
+
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            show(result)
+        return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
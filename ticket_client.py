@@ -0,0 +1,446 @@
+"""
+Client library for the Ticket Reservation API.
+
+``TicketClient`` (requests) and ``AsyncTicketClient`` (aiohttp, optional)
+expose the same methods. Both keep a pool of persistent TLS connections,
+retry connection failures, timeouts, 429 and 502-504 responses with
+jittered exponential backoff (honouring ``Retry-After``), renew the
+short-lived access token with the refresh token (or log in again) when it
+expires, and send bookings with an ``Idempotency-Key`` so a retried
+booking is never taken twice.
+
+Usage::
+
+    client = TicketClient('https://localhost:8443', 'alice', 'secret')
+    for event in client.events():
+        ...
+    booking = client.book(event_id=1, quantity=2)
+"""
+
+import asyncio
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+import config
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - depends on the environment
+    aiohttp = None
+
+RETRY_STATUSES = (429, 502, 503, 504)
+
+class APIError(Exception):
+    """A request the server answered with an error status"""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+def retry_delay(attempt, backoff, retry_after=None):
+    """Seconds to wait before retry number attempt (0-based), with full jitter"""
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return random.uniform(0, backoff * 2 ** attempt)
+
+def _error_message(status_code, body):
+    if isinstance(body, dict) and body.get('message'):
+        return body['message']
+    return f'HTTP {status_code}'
+
+def _archived_query(include_archived):
+    return '?include_archived=1' if include_archived else ''
+
+class _Endpoints:
+    """API methods shared by the sync and async clients.
+
+    Each returns whatever ``request`` returns: the decoded JSON body for
+    TicketClient, an awaitable of it for AsyncTicketClient.
+    """
+
+    def _remember(self, data):
+        """Keep the tokens of a login, refresh or password change response"""
+        self.token = data['token']
+        self.refresh_token = data.get('refresh_token')
+        self.user = data['user']
+        return data
+
+    def _forget(self):
+        self.token = None
+        self.refresh_token = None
+        self.user = None
+        self.username = None
+        self.password = None
+
+    def register(self, username, email, password):
+        return self.request('POST', '/register', {'username': username, 'email': email,
+                                                  'password': password}, authenticated=False)
+
+    def provision_users(self, users):
+        """Create many users (dicts with username, email and password or a bcrypt password_hash); admin only"""
+        return self.request('POST', '/users/bulk', {'users': users})
+
+    def events(self, include_archived=False):
+        return self.request('GET', '/events' + _archived_query(include_archived), authenticated=False)
+
+    def event(self, event_id, include_archived=False):
+        return self.request('GET', f'/events/{event_id}' + _archived_query(include_archived),
+                            authenticated=False)
+
+    def search(self, query, page=1, per_page=20):
+        """Ranked full-text search; every word matches as a prefix"""
+        return self.request('GET', '/events/search?' + urlencode({'q': query, 'page': page,
+                                                                  'per_page': per_page}),
+                            authenticated=False)
+
+    def create_event(self, name, venue, event_date, total_tickets, price_per_ticket, description=''):
+        return self.request('POST', '/events', {
+            'name': name, 'description': description, 'venue': venue,
+            'event_date': event_date, 'total_tickets': total_tickets,
+            'price_per_ticket': price_per_ticket
+        })
+
+    def update_event(self, event_id, if_match='*', **fields):
+        """Edit an event; pass the ETag of the version you read as if_match to fail on concurrent edits"""
+        return self.request('PATCH', f'/events/{event_id}', fields, headers={'If-Match': if_match})
+
+    def pricing(self, event_id):
+        return self.request('GET', f'/events/{event_id}/pricing', authenticated=False)
+
+    def set_pricing(self, event_id, tiers):
+        """Replace an event's tiers: dicts with name, price and min_sold or ends_at"""
+        return self.request('PUT', f'/events/{event_id}/pricing', {'tiers': tiers})
+
+    def book(self, event_id, quantity, idempotency_key=None):
+        """Book tickets; retries reuse one Idempotency-Key, so at most one booking is made"""
+        return self.request('POST', '/bookings', {'event_id': event_id, 'quantity': quantity},
+                            idempotency_key=idempotency_key or str(uuid.uuid4()))
+
+    def bookings(self, include_archived=False):
+        return self.request('GET', '/bookings' + _archived_query(include_archived))
+
+    def cancel(self, booking_id):
+        return self.request('DELETE', f'/bookings/{booking_id}', idempotent=True)
+
+    def tickets(self, booking_id):
+        return self.request('GET', f'/bookings/{booking_id}/tickets')
+
+    def scan(self, event_id, code):
+        return self.request('POST', f'/events/{event_id}/scan', {'code': code})
+
+    def stats(self):
+        return self.request('GET', '/stats')
+
+class TicketClient(_Endpoints):
+    """Synchronous client; safe to share between threads once logged in"""
+
+    def __init__(self, base_url=config.CLIENT_SERVER_URL, username=None, password=None,
+                 verify=config.CLIENT_VERIFY_SSL, pool_size=10, attempts=3, backoff=0.5, timeout=10):
+        self.base_url = base_url.rstrip('/') + '/api'
+        self.username = username
+        self.password = password
+        self.attempts = attempts
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.token = None
+        self.refresh_token = None
+        self.user = None
+        self._login_lock = threading.Lock()
+        self.session = requests.Session()
+        self.session.verify = verify
+        if not verify:
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        # Keep TLS connections alive between calls; batch threads share the pool
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def login(self, username=None, password=None):
+        """Log in and remember the credentials for automatic re-login"""
+        self.username = username or self.username
+        self.password = password or self.password
+        data = self.request('POST', '/login', {'username': self.username, 'password': self.password},
+                            authenticated=False)
+        return self._remember(data)
+
+    def refresh(self):
+        """Trade the refresh token for a new access token and refresh token"""
+        try:
+            return self._remember(self.request('POST', '/token/refresh',
+                                               {'refresh_token': self.refresh_token}, authenticated=False))
+        except APIError:
+            self.refresh_token = None
+            raise
+
+    def _renew(self, stale_token):
+        with self._login_lock:
+            # Another thread may already have renewed the token; refreshing
+            # again would present a rotated refresh token and end the session
+            if self.token != stale_token:
+                return
+            if self.refresh_token:
+                try:
+                    self.refresh()
+                    return
+                except APIError:
+                    if not (self.username and self.password):
+                        raise
+            self.login()
+
+    def change_password(self, current_password, new_password):
+        """Change the password; the server ends every other session"""
+        data = self._remember(self.request('POST', '/password', {'current_password': current_password,
+                                                                 'new_password': new_password}))
+        if self.password:
+            self.password = new_password
+        return data
+
+    def logout(self, everywhere=False):
+        """End this session on the server (every session with everywhere=True) and forget it"""
+        try:
+            if self.token:
+                self.request('POST', '/logout', {'refresh_token': self.refresh_token, 'all': everywhere})
+        finally:
+            self._forget()
+
+    def request(self, method, path, json=None, authenticated=True, idempotent=None,
+                idempotency_key=None, headers=None):
+        """Send a request with retries and re-login; return the decoded body or raise APIError"""
+        if idempotent is None:
+            idempotent = method == 'GET' or idempotency_key is not None
+        if authenticated and self.token is None and self.username:
+            self._renew(None)
+
+        relogged = False
+        attempt = 0
+        extra_headers = headers or {}
+        while True:
+            headers = dict(extra_headers)
+            token = self.token
+            if authenticated and token:
+                headers['Authorization'] = f'Bearer {token}'
+            if idempotency_key:
+                headers['Idempotency-Key'] = idempotency_key
+            try:
+                response = self.session.request(method, self.base_url + path, json=json,
+                                                headers=headers, timeout=self.timeout)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                if not idempotent or attempt + 1 >= self.attempts:
+                    raise
+                time.sleep(retry_delay(attempt, self.backoff))
+                attempt += 1
+                continue
+
+            if response.status_code in RETRY_STATUSES and idempotent and attempt + 1 < self.attempts:
+                time.sleep(retry_delay(attempt, self.backoff, response.headers.get('Retry-After')))
+                attempt += 1
+                continue
+            if (response.status_code == 401 and authenticated and not relogged
+                    and (self.refresh_token or (self.username and self.password))):
+                # Access token expired or revoked: renew it once and resend
+                self._renew(token)
+                relogged = True
+                continue
+
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            if response.status_code >= 400:
+                raise APIError(response.status_code, _error_message(response.status_code, body))
+            return body
+
+    def _batch(self, func, items):
+        """Run func over items on the shared connection pool; results or APIErrors in order"""
+        def call(item):
+            try:
+                return func(*item)
+            except APIError as e:
+                return e
+        with ThreadPoolExecutor(max_workers=self.pool_size) as pool:
+            return list(pool.map(call, items))
+
+    def book_many(self, orders):
+        """Book several (event_id, quantity) orders concurrently"""
+        return self._batch(self.book, [tuple(order) for order in orders])
+
+    def cancel_many(self, booking_ids):
+        """Cancel several bookings concurrently"""
+        return self._batch(self.cancel, [(booking_id,) for booking_id in booking_ids])
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class AsyncTicketClient(_Endpoints):
+    """asyncio client with the same methods as TicketClient, awaited"""
+
+    def __init__(self, base_url=config.CLIENT_SERVER_URL, username=None, password=None,
+                 verify=config.CLIENT_VERIFY_SSL, pool_size=10, attempts=3, backoff=0.5, timeout=10):
+        if aiohttp is None:
+            raise RuntimeError("The aiohttp package is required for AsyncTicketClient")
+        self.base_url = base_url.rstrip('/') + '/api'
+        self.username = username
+        self.password = password
+        self.verify = verify
+        self.attempts = attempts
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.token = None
+        self.refresh_token = None
+        self.user = None
+        self._session = None
+        self._login_lock = None
+
+    @property
+    def session(self):
+        # Created lazily so the client can be constructed outside a running loop
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, ssl=None if self.verify else False),
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._login_lock = asyncio.Lock()
+        return self._session
+
+    async def login(self, username=None, password=None):
+        """Log in and remember the credentials for automatic re-login"""
+        self.username = username or self.username
+        self.password = password or self.password
+        data = await self.request('POST', '/login', {'username': self.username, 'password': self.password},
+                                  authenticated=False)
+        return self._remember(data)
+
+    async def refresh(self):
+        """Trade the refresh token for a new access token and refresh token"""
+        try:
+            return self._remember(await self.request('POST', '/token/refresh',
+                                                     {'refresh_token': self.refresh_token},
+                                                     authenticated=False))
+        except APIError:
+            self.refresh_token = None
+            raise
+
+    async def change_password(self, current_password, new_password):
+        """Change the password; the server ends every other session"""
+        data = self._remember(await self.request('POST', '/password',
+                                                 {'current_password': current_password,
+                                                  'new_password': new_password}))
+        if self.password:
+            self.password = new_password
+        return data
+
+    async def logout(self, everywhere=False):
+        """End this session on the server (every session with everywhere=True) and forget it"""
+        try:
+            if self.token:
+                await self.request('POST', '/logout', {'refresh_token': self.refresh_token, 'all': everywhere})
+        finally:
+            self._forget()
+
+    async def _relogin(self, stale_token):
+        async with self._login_lock:
+            # Another task may already have renewed the token
+            if self.token != stale_token:
+                return
+            if self.refresh_token:
+                try:
+                    await self.refresh()
+                    return
+                except APIError:
+                    if not (self.username and self.password):
+                        raise
+            await self.login()
+
+    async def request(self, method, path, json=None, authenticated=True, idempotent=None,
+                      idempotency_key=None, headers=None):
+        """Send a request with retries and re-login; return the decoded body or raise APIError"""
+        if idempotent is None:
+            idempotent = method == 'GET' or idempotency_key is not None
+        session = self.session
+        if authenticated and self.token is None and self.username:
+            await self._relogin(None)
+
+        relogged = False
+        attempt = 0
+        extra_headers = headers or {}
+        while True:
+            headers = dict(extra_headers)
+            token = self.token
+            if authenticated and token:
+                headers['Authorization'] = f'Bearer {token}'
+            if idempotency_key:
+                headers['Idempotency-Key'] = idempotency_key
+            try:
+                async with session.request(method, self.base_url + path, json=json,
+                                           headers=headers) as response:
+                    status = response.status
+                    retry_after = response.headers.get('Retry-After')
+                    try:
+                        body = await response.json(content_type=None)
+                    except ValueError:
+                        body = None
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if not idempotent or attempt + 1 >= self.attempts:
+                    raise
+                await asyncio.sleep(retry_delay(attempt, self.backoff))
+                attempt += 1
+                continue
+
+            if status in RETRY_STATUSES and idempotent and attempt + 1 < self.attempts:
+                await asyncio.sleep(retry_delay(attempt, self.backoff, retry_after))
+                attempt += 1
+                continue
+            if (status == 401 and authenticated and not relogged
+                    and (self.refresh_token or (self.username and self.password))):
+                await self._relogin(token)
+                relogged = True
+                continue
+
+            if status >= 400:
+                raise APIError(status, _error_message(status, body))
+            return body
+
+    async def _batch(self, func, items):
+        async def call(item):
+            try:
+                return await func(*item)
+            except APIError as e:
+                return e
+        return await asyncio.gather(*(call(item) for item in items))
+
+    async def book_many(self, orders):
+        """Book several (event_id, quantity) orders concurrently"""
+        return await self._batch(self.book, [tuple(order) for order in orders])
+
+    async def cancel_many(self, booking_ids):
+        """Cancel several bookings concurrently"""
+        return await self._batch(self.cancel, [(booking_id,) for booking_id in booking_ids])
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
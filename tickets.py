@@ -0,0 +1,181 @@
+"""
+Signed per-seat ticket codes and gate scan validation.
+
+A ticket code is ``<event_id>.<ticket_id>.<signature>`` where the signature
+is a truncated HMAC of the ids, so a gate can reject forged codes without
+any lookup. ``GateValidator`` keeps a preloaded per-event set of valid and
+already-used ticket ids in memory, so a scan is an O(1) set check followed
+by one conditional UPDATE that also guards against double entry across
+server processes.
+"""
+
+import base64
+import hashlib
+import hmac
+import struct
+from datetime import datetime, timezone
+from threading import Lock
+
+from models import db, Ticket
+
+SIGNATURE_BYTES = 10
+
+def _signature(key, event_id, ticket_id):
+    digest = hmac.new(key.encode('utf-8'), f'{event_id}.{ticket_id}'.encode('ascii'),
+                      hashlib.sha256).digest()
+    return base64.b32encode(digest[:SIGNATURE_BYTES]).decode('ascii')
+
+def ticket_code(key, event_id, ticket_id):
+    """Signed code printed on the ticket (QR/barcode payload)"""
+    return f'{event_id}.{ticket_id}.{_signature(key, event_id, ticket_id)}'
+
+def parse_code(key, code):
+    """Return (event_id, ticket_id) for a correctly signed code, else None"""
+    try:
+        event_id, ticket_id, signature = code.split('.')
+        event_id, ticket_id = int(event_id), int(ticket_id)
+    except (AttributeError, ValueError):
+        return None
+    if not hmac.compare_digest(signature, _signature(key, event_id, ticket_id)):
+        return None
+    return event_id, ticket_id
+
+def code_digest(code):
+    """64-bit digest of a code as stored in gate exports"""
+    return struct.unpack('>Q', hashlib.blake2b(code.encode('ascii'), digest_size=8).digest())[0]
+
+def issue(booking_id, event_id, quantity):
+    """Insert one ticket per seat in the current transaction; returns the ticket ids"""
+    return db.session.execute(
+        db.insert(Ticket).returning(Ticket.id, sort_by_parameter_order=True),
+        [{'booking_id': booking_id, 'event_id': event_id} for _ in range(quantity)]
+    ).scalars().all()
+
+def void(booking_ids):
+    """Void the tickets of cancelled bookings; returns [(event_id, ticket_id)]"""
+    if not booking_ids:
+        return []
+    return db.session.execute(
+        db.update(Ticket)
+        .where(Ticket.booking_id.in_(booking_ids), Ticket.status == 'valid')
+        .values(status='void')
+        .returning(Ticket.event_id, Ticket.id)
+    ).all()
+
+def issue_for_existing_bookings(connection):
+    """Schema migration: issue one ticket per seat of every confirmed booking"""
+    connection.execute(db.text(
+        'WITH RECURSIVE seat(booking_id, event_id, remaining) AS ('
+        "SELECT id, event_id, quantity FROM booking WHERE status = 'confirmed' AND quantity > 0 "
+        'UNION ALL SELECT booking_id, event_id, remaining - 1 FROM seat WHERE remaining > 1) '
+        "INSERT INTO ticket (booking_id, event_id, status) "
+        "SELECT booking_id, event_id, 'valid' FROM seat ORDER BY booking_id"
+    ))
+
+# Scan outcomes
+ACCEPTED = 'accepted'
+ALREADY_USED = 'already_used'
+INVALID = 'invalid'
+WRONG_EVENT = 'wrong_event'
+UNKNOWN = 'unknown'
+
+class GateValidator:
+    """Per-event in-memory sets of valid and used ticket ids"""
+
+    def __init__(self, key):
+        self.key = key
+        self._events = {}  # event_id -> (valid set, used set)
+        self._lock = Lock()
+
+    def _load(self, event_id):
+        valid, used = set(), set()
+        for ticket_id, status in db.session.execute(
+                db.select(Ticket.id, Ticket.status)
+                .where(Ticket.event_id == event_id, Ticket.status != 'void')):
+            (used if status == 'used' else valid).add(ticket_id)
+        return valid, used
+
+    def sets(self, event_id):
+        """Preloaded (valid, used) sets for event_id"""
+        sets = self._events.get(event_id)
+        if sets is None:
+            loaded = self._load(event_id)
+            with self._lock:
+                sets = self._events.setdefault(event_id, loaded)
+        return sets
+
+    def added(self, event_id, ticket_ids):
+        """Make newly issued tickets admissible (if the event is loaded)"""
+        sets = self._events.get(event_id)
+        if sets is not None:
+            with self._lock:
+                sets[0].update(ticket_ids)
+
+    def voided(self, tickets):
+        """Forget voided (event_id, ticket_id) pairs"""
+        with self._lock:
+            for event_id, ticket_id in tickets:
+                sets = self._events.get(event_id)
+                if sets is not None:
+                    sets[0].discard(ticket_id)
+
+    def scan(self, event_id, code):
+        """Validate a code at the gate of event_id and mark it used.
+
+        Returns (outcome, ticket_id).
+        """
+        parsed = parse_code(self.key, code)
+        if parsed is None:
+            return INVALID, None
+        code_event_id, ticket_id = parsed
+        if code_event_id != event_id:
+            return WRONG_EVENT, ticket_id
+
+        valid, used = self.sets(event_id)
+        with self._lock:
+            if ticket_id in used:
+                return ALREADY_USED, ticket_id
+            known = ticket_id in valid
+        if not known:
+            # Possibly issued by another worker after this one preloaded the event
+            status = db.session.execute(
+                db.select(Ticket.status).where(Ticket.id == ticket_id, Ticket.event_id == event_id)
+            ).scalar()
+            if status == 'used':
+                with self._lock:
+                    used.add(ticket_id)
+                return ALREADY_USED, ticket_id
+            if status != 'valid':
+                return UNKNOWN, ticket_id
+        with self._lock:
+            if ticket_id in used:
+                return ALREADY_USED, ticket_id
+            # Claim in memory first so concurrent scans in this process cannot both pass
+            valid.discard(ticket_id)
+            used.add(ticket_id)
+
+        marked = db.session.execute(
+            db.update(Ticket)
+            .where(Ticket.id == ticket_id, Ticket.status == 'valid')
+            .values(status='used', used_at=datetime.now(timezone.utc))
+        ).rowcount
+        db.session.commit()
+        if marked:
+            return ACCEPTED, ticket_id
+
+        # Another process used or voided it first; resync from the database
+        status = db.session.execute(db.select(Ticket.status).where(Ticket.id == ticket_id)).scalar()
+        with self._lock:
+            used.discard(ticket_id)
+            if status == 'used':
+                used.add(ticket_id)
+        return (ALREADY_USED if status == 'used' else UNKNOWN), ticket_id
+
+    def export(self, event_id):
+        """Sorted packed big-endian uint64 digests of the admissible codes, for gate devices"""
+        valid, _ = self.sets(event_id)
+        with self._lock:
+            ticket_ids = list(valid)
+        digests = sorted(code_digest(ticket_code(self.key, event_id, ticket_id))
+                         for ticket_id in ticket_ids)
+        return struct.pack(f'>{len(digests)}Q', *digests)
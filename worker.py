@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Background job worker for the Ticket Reservation System
+
+Relays booking outbox messages into the job queue and runs the jobs
+(confirmation emails, receipts) outside the request path.
+"""
+
+import argparse
+import multiprocessing
+import time
+
+import config
+
+def work(drain=False):
+    """Process jobs until interrupted (or until the queue is empty when drain is set)"""
+    import jobs
+    import server
+
+    with server.app.app_context():
+        last_lease_check = 0
+        while True:
+            if time.monotonic() - last_lease_check > config.JOB_LEASE_SECONDS / 2:
+                jobs.requeue_abandoned()
+                last_lease_check = time.monotonic()
+
+            relayed = jobs.relay_outbox()
+            job = jobs.claim()
+            if job is not None:
+                jobs.run(job)
+                continue
+            if drain and not relayed:
+                return
+            if not relayed:
+                time.sleep(config.JOB_POLL_SECONDS)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=config.JOB_WORKERS, help='worker processes')
+    parser.add_argument('--drain', action='store_true', help='exit once no job is due')
+    parser.add_argument('--requeue-dead-letters', action='store_true',
+                        help='move dead-lettered jobs back to the queue and exit')
+    args = parser.parse_args()
+
+    if args.requeue_dead_letters:
+        import jobs
+        import server
+        with server.app.app_context():
+            print(f"Requeued {jobs.requeue_dead_letters()} dead-lettered job(s)")
+        return
+
+    if args.workers <= 1:
+        work(args.drain)
+        return
+
+    processes = [multiprocessing.Process(target=work, args=(args.drain,), name=f'worker-{i}')
+                 for i in range(args.workers)]
+    for process in processes:
+        process.start()
+    print(f"Started {len(processes)} worker process(es). Press Ctrl+C to stop")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+if __name__ == '__main__':
+    main()